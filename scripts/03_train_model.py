@@ -0,0 +1,6 @@
+# Step 3 of the pipeline. The code lives in train_model.py, which can be
+# imported like any other module.
+from train_model import main
+
+if __name__ == "__main__":
+    main()
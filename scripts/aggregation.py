@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+
+import features
+import instrumentation
+import schema
+
+# Fused aggregation engine. CustomerID is mapped once per table to a dense
+# integer code (the customer's row in the customers table); every
+# per-customer feature of a table is then computed in one vectorized pass
+# with np.bincount, and the output is assembled by array indexing instead of
+# hash merges. Produces the same table as feature_engineering() in
+# feature_engineering.py.
+
+
+# CustomerIDs are 36-character UUID strings, or 16-byte binary UUIDs when
+# loaded with the compact schema (schema.py)
+KEY_WIDTH = 36
+# Rows per block when packing keys, to bound the temporary copies
+KEY_BLOCK_ROWS = 4_000_000
+_MIX = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+                 0x27D4EB2F165667C5, 0xFF51AFD7ED558CCD], dtype=np.uint64)
+
+
+# Fixed-width byte view over the keys: (n, 16) for binary UUIDs, (n, KEY_WIDTH)
+# for an Arrow-backed string column, or None when the column is neither or
+# not all keys have that width
+def fixed_width_keys(keys):
+    import pyarrow as pa
+
+    if schema.is_uuid_column(keys):
+        array = pa.array(keys)
+        if isinstance(array, pa.ChunkedArray):
+            array = array.combine_chunks()
+        if array.null_count or len(array) == 0:
+            return None
+        data = np.frombuffer(array.buffers()[1], dtype=np.uint8)
+        return data[array.offset * 16:(array.offset + len(array)) * 16].reshape(-1, 16)
+
+    if not (isinstance(keys.dtype, pd.StringDtype) and keys.dtype.storage == "pyarrow"):
+        return None
+    array = pa.array(keys)
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    if array.null_count or len(array) == 0:
+        return None
+    offset_type = np.int64 if pa.types.is_large_string(array.type) else np.int32
+    offsets = np.frombuffer(array.buffers()[1], dtype=offset_type)[array.offset:array.offset + len(array) + 1]
+    if not (np.diff(offsets) == KEY_WIDTH).all():
+        return None
+    data = np.frombuffer(array.buffers()[2], dtype=np.uint8)
+    return data[offsets[0]:offsets[-1]].reshape(-1, KEY_WIDTH)
+
+
+# Pack each key into 64-bit words (zero padded; five for text UUIDs, two for
+# binary ones) plus a 64-bit mix of them
+def pack_keys(key_bytes):
+    width = -(-key_bytes.shape[1] // 8) * 8
+    padded = np.zeros((len(key_bytes), width), dtype=np.uint8)
+    padded[:, :key_bytes.shape[1]] = key_bytes
+    words = padded.view(np.uint64)
+    return words, (words * _MIX[:words.shape[1]]).sum(axis=1, dtype=np.uint64)
+
+
+# Maps CustomerIDs to rows of the customers table. UUID keys are also packed
+# once into 64-bit words with an index over their 64-bit mix, which is
+# reused for every table.
+class CustomerLookup:
+    def __init__(self, customer_ids):
+        self.index = pd.Index(customer_ids)
+        if not self.index.is_unique:
+            raise ValueError("CustomerID must be unique in the customers table")
+        self.words, self.mix_index = None, None
+
+        key_bytes = fixed_width_keys(pd.Series(customer_ids))
+        if key_bytes is not None:
+            words, mix = pack_keys(key_bytes)
+            mix_index = pd.Index(mix)
+            if mix_index.is_unique:
+                self.words, self.mix_index = words, mix_index
+
+    def __len__(self):
+        return len(self.index)
+
+    # Fast path for UUID keys: look rows up by the mix of their bytes and
+    # confirm every match against the full key, so the result is exact.
+    # Returns None (use the generic path) when it does not apply.
+    def packed_codes(self, keys):
+        key_bytes = fixed_width_keys(keys) if self.mix_index is not None else None
+        if key_bytes is None:
+            return None
+
+        codes = np.empty(len(key_bytes), dtype=np.int64)
+        for start in range(0, len(key_bytes), KEY_BLOCK_ROWS):
+            words, mix = pack_keys(key_bytes[start:start + KEY_BLOCK_ROWS])
+            block = self.mix_index.get_indexer(mix)
+            found = block >= 0
+            matched = np.take(self.words, np.where(found, block, 0), axis=0)
+            matched[~found] = words[~found]
+            if not np.array_equal(matched, words):
+                return None
+            codes[start:start + len(block)] = block
+        return codes
+
+    # Row of each key (-1 for unknown customers). The generic path hashes
+    # the keys once with factorize and only looks up the distinct keys.
+    def codes(self, keys):
+        codes = self.packed_codes(keys)
+        if codes is not None:
+            return codes
+        local_codes, uniques = pd.factorize(keys)
+        lookup = np.append(self.index.get_indexer(uniques), -1)
+        return lookup[local_codes]
+
+
+# Per-customer sums over the rows with a known customer
+def group_sum(codes, num_customers, weights=None):
+    known = codes >= 0
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)[known]
+    return np.bincount(codes[known], weights=weights, minlength=num_customers)
+
+
+# Per-customer count of non-missing values
+def group_count(codes, num_customers, values):
+    valid = pd.notna(values)
+    return group_sum(codes[valid], num_customers)
+
+
+# Per-customer mean of the non-missing values (NaN when there are none)
+def group_mean(codes, num_customers, values):
+    values = np.asarray(values, dtype=float)
+    valid = ~np.isnan(values)
+    total = group_sum(codes[valid], num_customers, values[valid])
+    count = group_sum(codes[valid], num_customers)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / np.where(count > 0, count, 1), np.nan)
+
+
+# A left-joined feature column. Customers absent from the source table get
+# NaN, which the final fill turns into 0; like a pandas merge, integer
+# columns only stay integer when no customer is missing.
+def joined(values, present, integer=False):
+    if integer and present.all():
+        return values.astype(np.int64)
+    values = values.astype(float)
+    values[~present] = np.nan
+    return values
+
+
+def product_features(codes, num_customers, products):
+    rows = group_sum(codes, num_customers)
+    present = rows > 0
+    product_count = group_count(codes, num_customers, products["ProductType"])
+    active = (products["ActiveStatus"] == "Active").to_numpy(dtype=bool)
+    active_count = group_count(codes[active], num_customers, products["ProductType"].to_numpy()[active])
+
+    # The pandas path fills a missing active count with 0, turning the column to float
+    active_integer = not (present & (active_count == 0)).any()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        engagement = np.where(product_count > 0, active_count / np.where(product_count > 0, product_count, 1), 0)
+    return {
+        "ProductCount": joined(product_count, present, integer=True),
+        "ActiveProductCount": joined(active_count, present, integer=active_integer),
+        "ProductEngagementScore": joined(engagement, present),
+    }
+
+
+def financial_features(codes, num_customers, transactions):
+    present = group_sum(codes, num_customers) > 0
+    return {
+        "AvgTransactionAmount": joined(group_mean(codes, num_customers, transactions["Amount"]), present),
+        "TransactionFrequency": joined(group_count(codes, num_customers, transactions["TransactionID"]),
+                                       present, integer=True),
+    }
+
+
+def loan_features(codes, num_customers, loans):
+    present = group_sum(codes, num_customers) > 0
+    avg_amount = group_mean(codes, num_customers, loans["Amount"])
+    avg_ratio = group_mean(codes, num_customers, features.emi_ratio(loans))
+    # The high-risk flag is 0/1, so its max is "any flagged loan"
+    high_risk = (group_sum(codes, num_customers, features.high_risk_flag(loans)) > 0).astype(np.int64)
+    return {
+        "AvgLoanAmount": joined(avg_amount, present),
+        "AvgEMItoIncomeRatio": joined(avg_ratio, present),
+        "HighRiskLoan": joined(high_risk, present, integer=True),
+        "LoanBurdenScore": joined(avg_amount * avg_ratio, present),
+    }
+
+
+def engagement_features(codes, num_customers, support_interactions):
+    present = group_sum(codes, num_customers) > 0
+    return {
+        "SupportFrequency": joined(group_count(codes, num_customers, support_interactions["InteractionID"]),
+                                   present, integer=True),
+    }
+
+
+@instrumentation.traced()
+def fused_feature_engineering(customers, products, transactions, loans, support_interactions):
+    customers = customers.copy()
+    lookup = CustomerLookup(customers["CustomerID"])
+    num_customers = len(lookup)
+
+    print("Generating customer profile features...")
+    features.add_profile_features(customers)
+
+    blocks = [
+        ("product", product_features, products),
+        ("financial", financial_features, transactions),
+        ("loan", loan_features, loans),
+        ("engagement", engagement_features, support_interactions),
+    ]
+    columns = {}
+    for label, build, table in blocks:
+        print(f"Generating {label} features...")
+        codes = lookup.codes(table["CustomerID"])
+        columns.update(build(codes, num_customers, table))
+
+    print("Assembling all features...")
+    enhanced_customers = pd.concat([customers, pd.DataFrame(columns, index=customers.index)], axis=1)
+    return features.fill_missing(enhanced_customers)
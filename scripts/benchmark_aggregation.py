@@ -0,0 +1,63 @@
+import argparse
+import contextlib
+import io
+import time
+
+import numpy as np
+import pandas as pd
+
+import aggregation
+import generator
+from feature_engineering import feature_engineering
+
+
+# In-memory tables shaped like the cleaned data, sized for the benchmark
+def synthetic_tables(num_customers, num_transactions, seed):
+    customers = generator.generate_customers(num_customers, seed=seed)
+    ids = customers["CustomerID"].to_numpy()
+    return {
+        "customers": customers,
+        "products": generator.generate_products(ids, seed=seed),
+        "transactions": generator.generate_transactions(num_transactions, ids, seed=seed),
+        "loans": generator.generate_loans(num_customers // 2, ids, seed=seed),
+        "support_interactions": generator.generate_support_interactions(num_customers * 2, ids, seed=seed),
+    }
+
+
+# Best wall time of a few runs; each run gets fresh copies since the pandas
+# path adds columns to its inputs
+def best_time(engine, tables, repeat):
+    timings, result = [], None
+    for _ in range(repeat):
+        inputs = {name: df.copy() for name, df in tables.items()}
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = engine(**inputs)
+            timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the pandas groupby+merge and fused feature engines")
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--transactions", type=int, default=100_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=generator.DEFAULT_SEED)
+    args = parser.parse_args()
+
+    print(f"Generating {args.customers:,} customers and {args.transactions:,} transactions...")
+    tables = synthetic_tables(args.customers, args.transactions, args.seed)
+
+    pandas_time, expected = best_time(feature_engineering, tables, args.repeat)
+    fused_time, actual = best_time(aggregation.fused_feature_engineering, tables, args.repeat)
+
+    numeric = expected.select_dtypes(include=[np.number]).columns
+    pd.testing.assert_frame_equal(actual[numeric], expected[numeric], check_dtype=False)
+
+    print(f"pandas groupby + merge: {pandas_time:8.3f}s")
+    print(f"fused bincount engine:  {fused_time:8.3f}s")
+    print(f"speedup:                {pandas_time / max(fused_time, 1e-9):8.1f}x (outputs match)")
+
+
+if __name__ == "__main__":
+    main()
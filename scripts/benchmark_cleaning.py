@@ -0,0 +1,64 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+import pandas as pd
+
+import data_cleaning
+import storage
+
+# Compare the serial and the parallel full clean of the current raw tables:
+# wall-clock time of each, and the cleaned tables must be identical (same
+# rows in the same order, same values and types).
+
+
+def run(tables, workers, partitions, partition_mb):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        data_cleaning.clean_tables(tables, workers, partitions, partition_mb)
+    elapsed = time.perf_counter() - start
+    cleaned = {table: storage.read_table(f"cleaned_{table}", "cleaned") for table in tables}
+    return elapsed, cleaned
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parallel against serial cleaning")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--partitions", type=int, default=None)
+    parser.add_argument("--partition-mb", type=float, default=data_cleaning.PARTITION_MB)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of each mode (best time is reported)")
+    args = parser.parse_args()
+
+    tables = list(data_cleaning.CLEANERS)
+    rows = sum(len(storage.read_table(table, "raw", columns=data_cleaning.PRIMARY_KEYS[table][:1]))
+               for table in tables)
+    print(f"Cleaning {len(tables)} tables, {rows:,} raw rows; parallel mode: {args.workers} workers, "
+          f"{args.partitions or args.workers} partitions for tables >= {args.partition_mb:g} MB")
+
+    serial_times, parallel_times = [], []
+    for _ in range(args.repeat):
+        elapsed, expected = run(tables, None, None, args.partition_mb)
+        serial_times.append(elapsed)
+        elapsed, actual = run(tables, args.workers, args.partitions, args.partition_mb)
+        parallel_times.append(elapsed)
+
+    failed = False
+    for table in tables:
+        try:
+            pd.testing.assert_frame_equal(actual[table], expected[table], check_exact=True)
+        except AssertionError as error:
+            failed = True
+            print(f"{table}: MISMATCH\n{error}")
+
+    serial, parallel = min(serial_times), min(parallel_times)
+    print(f"serial   {serial:8.2f}s  ({rows / serial:,.0f} rows/s)")
+    print(f"parallel {parallel:8.2f}s  ({rows / parallel:,.0f} rows/s)  speedup {serial / parallel:.2f}x")
+    print("outputs identical" if not failed else "outputs DIFFER")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
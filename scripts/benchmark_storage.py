@@ -0,0 +1,102 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+import storage
+
+# Tables compared, as (stage, name)
+TABLES = [
+    ("raw", "customers"),
+    ("raw", "products"),
+    ("raw", "transactions"),
+    ("raw", "loans"),
+    ("raw", "campaign_responses"),
+    ("raw", "support_interactions"),
+    ("cleaned", "cleaned_transactions"),
+    ("processed", "enhanced_customers"),
+]
+
+# Columns the Streamlit app needs from the processed table
+APP_COLUMNS = [
+    "LoanBurdenScore", "AvgLoanAmount", "AvgEMItoIncomeRatio",
+    "CreditScore", "Income", "Age", "HighRiskLoan",
+]
+
+
+# Best wall time of a few runs of fn
+def best_time(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def size_of(files):
+    return sum(os.path.getsize(f) for f in files)
+
+
+def benchmark_table(stage, name, workdir, repeat):
+    csv_files = storage.table_files(name, stage, "csv")
+    if not csv_files:
+        return None
+
+    # Convert the existing CSV into a Parquet copy in a scratch folder
+    df = storage.read_table(name, stage, fmt="csv", categorical=False)
+    parquet_path = os.path.join(workdir, f"{name}.parquet")
+    storage.apply_storage_types(df).to_parquet(parquet_path, index=False, engine="pyarrow")
+
+    csv_time = best_time(lambda: [pd.read_csv(f) for f in csv_files], repeat)
+    parquet_time = best_time(lambda: pd.read_parquet(parquet_path, engine="pyarrow"), repeat)
+    return {
+        "table": f"{stage}/{name}",
+        "rows": len(df),
+        "csv_mb": size_of(csv_files) / 1e6,
+        "parquet_mb": os.path.getsize(parquet_path) / 1e6,
+        "csv_s": csv_time,
+        "parquet_s": parquet_time,
+    }
+
+
+# Projection + predicate pushdown read used by the app
+def benchmark_app_read(repeat):
+    if not storage.table_exists("enhanced_customers", "processed"):
+        return None
+    fmt = storage.find_format("enhanced_customers", "processed")
+    return best_time(lambda: storage.read_table(
+        "enhanced_customers", "processed", columns=APP_COLUMNS,
+        filters=[("HighRiskLoan", "not null")], fmt=fmt), repeat), fmt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare CSV and Parquet load time and file size")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bankiq-storage-")
+    try:
+        print(f"{'table':<34}{'rows':>12}{'csv MB':>10}{'pq MB':>10}{'csv s':>10}{'pq s':>10}{'speedup':>9}")
+        for stage, name in TABLES:
+            result = benchmark_table(stage, name, workdir, args.repeat)
+            if result is None:
+                print(f"{stage}/{name:<27} (no CSV found, skipped)")
+                continue
+            print(f"{result['table']:<34}{result['rows']:>12,}{result['csv_mb']:>10.2f}"
+                  f"{result['parquet_mb']:>10.2f}{result['csv_s']:>10.3f}{result['parquet_s']:>10.3f}"
+                  f"{result['csv_s'] / max(result['parquet_s'], 1e-9):>8.1f}x")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    app_read = benchmark_app_read(args.repeat)
+    if app_read is not None:
+        seconds, fmt = app_read
+        print(f"App read (7 columns, HighRiskLoan not null, {fmt}): {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
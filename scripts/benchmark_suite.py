@@ -0,0 +1,368 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+# Pipeline benchmark suite. Each tier generates a synthetic dataset at a fixed
+# multiple of the generator's NUM_* constants and times every stage on it:
+# generation, each clean_* function, each feature block of the pandas
+# feature_engineering(), model training, batch predict_proba and the SHAP
+# values. A stage runs in a fresh Python process (this script with
+# --run-stage), so its peak RSS is its own; only the stage call itself is
+# timed, not the loading of its inputs or the saving of its outputs.
+#
+# Every run is appended to a JSON history and compared against a stored
+# baseline run: a stage is flagged when it got slower, or its peak RSS grew,
+# by more than the tolerance (and by more than a small absolute amount, so
+# the sub-millisecond stages of the 1x tier do not flag on noise).
+
+BENCHMARK_DIR = os.environ.get("BANKIQ_BENCHMARK_DIR", "benchmarks")
+HISTORY_FILE = "history.json"
+BASELINE_FILE = "baseline.json"
+
+TIERS = {"1x": 1, "10x": 10, "100x": 100}
+# Datasets are fixed for a given tier: same seed and reference date every run
+SEED = 42
+AS_OF = "2025-01-01"
+
+DEFAULT_TIME_TOLERANCE = 0.2
+DEFAULT_RSS_TOLERANCE = 0.2
+MIN_TIME_REGRESSION = 0.05
+MIN_RSS_REGRESSION_MB = 20
+
+CLEANED_TABLES = ["customers", "products", "transactions", "loans", "campaign_responses", "support_interactions"]
+# Feature block -> cleaned table it reads
+FEATURE_BLOCKS = {
+    "profile": "customers",
+    "products": "products",
+    "financial": "transactions",
+    "loans": "loans",
+    "engagement": "support_interactions",
+}
+
+STAGES = (["generate"] + [f"clean_{table}" for table in CLEANED_TABLES]
+          + [f"features_{block}" for block in FEATURE_BLOCKS]
+          + ["features_merge", "train", "predict_proba", "shap"])
+
+
+# ---------------------
+# Stages (run in a child process)
+# ---------------------
+
+# Times the body of a with block; rows is set inside the block
+class Timer:
+    def __init__(self):
+        self.rows = 0
+        self.wall_time = None
+        self.base_rss_mb = None
+
+    def __enter__(self):
+        self.base_rss_mb = peak_rss_mb()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall_time = time.perf_counter() - self.start
+
+
+# Peak resident set size of this process so far
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+def stage_generate(timer, scale):
+    import generator
+    import storage
+
+    activity = [
+        ("transactions", generator.generate_transactions, generator.NUM_TRANSACTIONS),
+        ("loans", generator.generate_loans, generator.NUM_LOANS),
+        ("campaign_responses", generator.generate_campaign_responses, generator.NUM_CAMPAIGNS),
+        ("support_interactions", generator.generate_support_interactions, generator.NUM_SUPPORT),
+    ]
+    with timer:
+        customers = generator.generate_customers(generator.scaled(generator.NUM_CUSTOMERS, scale), seed=SEED)
+        customer_ids = customers["CustomerID"].to_numpy()
+        products = generator.generate_products(customer_ids, seed=SEED, as_of=AS_OF)
+        storage.write_table(customers, "customers")
+        storage.write_table(products, "products")
+        timer.rows = len(customers) + len(products)
+        for table, generate, num_rows in activity:
+            df = generate(generator.scaled(num_rows, scale), customer_ids, seed=SEED, as_of=AS_OF)
+            storage.write_table(df, table)
+            timer.rows += len(df)
+
+
+def stage_clean(timer, table):
+    import data_cleaning
+
+    raw = data_cleaning.load_raw_data(table)
+    with timer:
+        cleaned = data_cleaning.CLEANERS[table](raw)
+    timer.rows = len(raw)
+    data_cleaning.save_cleaned_data(cleaned, f"cleaned_{table}")
+
+
+def load_cleaned(table):
+    import storage
+
+    return storage.read_table(f"cleaned_{table}", "cleaned", compact=True)
+
+
+def stage_feature_block(timer, block):
+    import feature_engineering as engineering
+    import features
+
+    blocks = {
+        "profile": features.add_profile_features,
+        "products": engineering.product_features,
+        "financial": engineering.financial_features,
+        "loans": engineering.loan_features,
+        "engagement": engineering.engagement_features,
+    }
+    df = load_cleaned(FEATURE_BLOCKS[block])
+    with timer:
+        blocks[block](df)
+    timer.rows = len(df)
+
+
+def stage_features_merge(timer):
+    import feature_engineering as engineering
+    import features
+    import schema
+    import storage
+
+    customers = load_cleaned("customers")
+    features.add_profile_features(customers)
+    blocks = [
+        engineering.product_features(load_cleaned("products")),
+        engineering.financial_features(load_cleaned("transactions")),
+        engineering.loan_features(load_cleaned("loans")),
+        engineering.engagement_features(load_cleaned("support_interactions")),
+    ]
+    with timer:
+        enhanced = features.assemble(customers, *blocks)
+    timer.rows = len(enhanced)
+    storage.write_table(schema.compact(enhanced, "enhanced_customers"), "enhanced_customers", "processed")
+
+
+def stage_train(timer):
+    import model_bundle
+    import train_model as training
+
+    X, y = training.load_training_data()
+    with timer:
+        booster, scale_pos_weight = training.train_model(X, y)
+    timer.rows = len(X)
+    version = model_bundle.save_bundle(booster, training.FEATURES, training.TARGET, scale_pos_weight,
+                                       training.expected_value(booster, X))
+    # The scoring stages that follow load the latest bundle
+    model_bundle.promote(version)
+
+
+def stage_predict_proba(timer):
+    import model_bundle
+    import storage
+
+    bundle = model_bundle.load_bundle()
+    X = storage.read_table("enhanced_customers", "processed", columns=bundle.features, compact=True)
+    with timer:
+        bundle.predict_proba(X)
+    timer.rows = len(X)
+
+
+def stage_shap(timer):
+    import explanations
+    import model_bundle
+    import storage
+
+    bundle = model_bundle.load_bundle()
+    X = storage.read_table("enhanced_customers", "processed", columns=bundle.features,
+                           filters=explanations.explained_filters(bundle), compact=True)
+    with timer:
+        bundle.contributions(X)
+    timer.rows = len(X)
+
+
+def run_stage(stage, scale):
+    timer = Timer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if stage == "generate":
+            stage_generate(timer, scale)
+        elif stage.startswith("clean_"):
+            stage_clean(timer, stage[len("clean_"):])
+        elif stage == "features_merge":
+            stage_features_merge(timer)
+        elif stage.startswith("features_"):
+            stage_feature_block(timer, stage[len("features_"):])
+        else:
+            {"train": stage_train, "predict_proba": stage_predict_proba, "shap": stage_shap}[stage](timer)
+    return {
+        "stage": stage,
+        "rows": timer.rows,
+        "wall_time": timer.wall_time,
+        "rows_per_s": timer.rows / timer.wall_time if timer.wall_time else None,
+        "peak_rss_mb": peak_rss_mb(),
+        # RSS high-water mark once the inputs were loaded, before the stage ran
+        "base_rss_mb": timer.base_rss_mb,
+    }
+
+
+# ---------------------
+# Tiers (parent process)
+# ---------------------
+
+# Run one stage of a tier in a child process with the tier's data folders
+def measure(stage, tier, work_dir):
+    env = dict(os.environ,
+               BANKIQ_DATA_DIR=os.path.join(work_dir, tier, "data"),
+               BANKIQ_MODEL_DIR=os.path.join(work_dir, tier, "models"))
+    command = [sys.executable, os.path.abspath(__file__), "--run-stage", stage, "--scale", str(TIERS[tier])]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"{tier} {stage} failed:\n{completed.stderr}")
+    return dict(json.loads(completed.stdout.strip().splitlines()[-1]), tier=tier)
+
+
+# Best wall time of the repeats, with the largest peak RSS
+def run_tier(tier, work_dir, repeat):
+    results = []
+    for stage in STAGES:
+        runs = [measure(stage, tier, work_dir) for _ in range(repeat)]
+        best = min(runs, key=lambda run: run["wall_time"])
+        best["peak_rss_mb"] = max(run["peak_rss_mb"] or 0 for run in runs) or None
+        results.append(best)
+        rate = f"{best['rows_per_s']:14,.0f} rows/s" if best["rows_per_s"] else ""
+        print(f"  {tier:>5} {stage:<28} {best['wall_time']:9.3f}s {rate}  "
+              f"peak {best['peak_rss_mb'] or 0:7.0f} MB")
+    return results
+
+
+def environment():
+    from importlib import metadata
+
+    import storage
+
+    versions = {}
+    for package in ["numpy", "pandas", "pyarrow", "xgboost"]:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "storage_format": storage.DEFAULT_FORMAT,
+        "versions": versions,
+    }
+
+
+# ---------------------
+# History and regressions
+# ---------------------
+
+def load_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+# (tier, stage, metric, baseline, current) of every stage that regressed
+def find_regressions(run, baseline, time_tolerance, rss_tolerance):
+    previous = {(r["tier"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for result in run["results"]:
+        base = previous.get((result["tier"], result["stage"]))
+        if base is None:
+            continue
+        if (result["wall_time"] > base["wall_time"] * (1 + time_tolerance)
+                and result["wall_time"] - base["wall_time"] > MIN_TIME_REGRESSION):
+            regressions.append((result["tier"], result["stage"], "wall_time", base["wall_time"], result["wall_time"]))
+        if (base["peak_rss_mb"] and result["peak_rss_mb"]
+                and result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + rss_tolerance)
+                and result["peak_rss_mb"] - base["peak_rss_mb"] > MIN_RSS_REGRESSION_MB):
+            regressions.append((result["tier"], result["stage"], "peak_rss_mb", base["peak_rss_mb"], result["peak_rss_mb"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on synthetic datasets of fixed sizes")
+    parser.add_argument("--tiers", nargs="+", choices=list(TIERS), default=list(TIERS))
+    parser.add_argument("--repeat", type=int, default=1, help="Runs of each stage (best time is kept)")
+    parser.add_argument("--work-dir", default=None, help="Keep the tier datasets here (default: a temporary folder)")
+    parser.add_argument("--history", default=os.path.join(BENCHMARK_DIR, HISTORY_FILE))
+    parser.add_argument("--baseline", default=os.path.join(BENCHMARK_DIR, BASELINE_FILE))
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=DEFAULT_TIME_TOLERANCE,
+                        help="Flag stages this much slower than the baseline (0.2 = 20%%)")
+    parser.add_argument("--rss-tolerance", type=float, default=DEFAULT_RSS_TOLERANCE,
+                        help="Flag stages whose peak RSS grew this much over the baseline")
+    parser.add_argument("--run-stage", choices=STAGES, help=argparse.SUPPRESS)
+    parser.add_argument("--scale", type=float, default=1, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        print(json.dumps(run_stage(args.run_stage, args.scale)))
+        return
+
+    run = {"run_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+           "environment": environment(), "results": []}
+    print(f"Benchmarking tiers {', '.join(args.tiers)} ({run['environment']['storage_format']} storage)...")
+    with contextlib.ExitStack() as stack:
+        work_dir = args.work_dir or stack.enter_context(tempfile.TemporaryDirectory(prefix="bankiq-benchmark-"))
+        for tier in args.tiers:
+            run["results"].extend(run_tier(tier, work_dir, args.repeat))
+
+    history = load_json(args.history, [])
+    history.append(run)
+    save_json(args.history, history)
+    print(f"Run appended to {args.history} ({len(history)} runs)")
+
+    baseline = load_json(args.baseline, None)
+    regressions = []
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; store one with --save-baseline")
+    else:
+        regressions = find_regressions(run, baseline, args.time_tolerance, args.rss_tolerance)
+        print(f"Compared with the baseline of {baseline['run_at']} (commit {baseline['environment']['commit']}):")
+        for tier, stage, metric, before, after in regressions:
+            print(f"  REGRESSION {tier} {stage} {metric}: {before:.3f} -> {after:.3f} ({after / before:.2f}x)")
+        if not regressions:
+            print("  no regressions")
+
+    if args.save_baseline:
+        save_json(args.baseline, run)
+        print(f"Baseline saved to {args.baseline}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
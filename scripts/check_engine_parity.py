@@ -0,0 +1,46 @@
+import argparse
+import contextlib
+import io
+import sys
+
+import pandas as pd
+
+import feature_engineering
+import schema
+
+
+# Run one engine on the cleaned data with its own loader, quietly, and give
+# the result the compact types it is saved with
+def run_engine(engine):
+    load = feature_engineering.LOADERS.get(engine, feature_engineering.load_cleaned_data)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return schema.compact(feature_engineering.ENGINES[engine](**load()), "enhanced_customers")
+
+
+# Compare every other engine against the pandas engine on the current cleaned
+# data: same rows in the same order, same columns and dtypes, and values equal
+# up to floating point summation order
+def main():
+    others = sorted(e for e in feature_engineering.ENGINES if e != "pandas")
+    parser = argparse.ArgumentParser(description="Check that every feature engine matches the pandas engine")
+    parser.add_argument("--engine", action="append", choices=others,
+                        help="Engine to check (repeatable; default: all)")
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    args = parser.parse_args()
+
+    expected = run_engine("pandas")
+    failed = False
+    for engine in args.engine or others:
+        actual = run_engine(engine)
+        try:
+            pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=args.rtol)
+        except AssertionError as error:
+            failed = True
+            print(f"{engine}: MISMATCH\n{error}")
+        else:
+            print(f"{engine}: matches pandas ({len(actual):,} rows)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+import storage
+
+# Indexed lookup over the processed (Parquet) customer table, so readers
+# fetch single customers and pages of filtered customers without loading the
+# table. Stored next to the table in <name>.index/:
+#   meta.json            source files, row groups, filter labels and the
+#                        generation of the arrays
+#   ids-<gen>.npy        CustomerIDs, sorted (fixed-width bytes)
+#   id_rows-<gen>.npy    row offset of each sorted CustomerID
+#   <column>-<gen>.npy   row offsets grouped by label (each group ascending),
+#                        with the group boundaries of every label in meta.json
+# The arrays are memory-mapped, so an open index costs almost no memory.
+# A rebuild writes a new generation of arrays next to the old one and then
+# swaps meta.json, so open readers keep their (unchanged) mapped files and
+# new readers only ever see a complete generation.
+
+KEY_COLUMN = "CustomerID"
+FILTER_COLUMNS = ["AgeGroup", "IncomeBracket", "RiskScore"]
+
+# Filtered row lists kept per open index
+FILTER_CACHE_SIZE = 32
+
+
+def index_dir(name="enhanced_customers", stage="processed"):
+    return os.path.join(storage.stage_dir(stage), f"{name}.index")
+
+
+def _parquet_files(name, stage):
+    files = storage.table_files(name, stage, "parquet")
+    if not files:
+        raise FileNotFoundError(f"The customer index needs the {stage} table {name!r} stored as Parquet")
+    return files
+
+
+# Identity of the source files: a rewritten table makes the index stale
+def _fingerprint(files):
+    return [[os.path.abspath(f), os.path.getsize(f), os.path.getmtime(f)] for f in files]
+
+
+def _array_path(directory, generation, stem):
+    # Indexes from before generations were introduced use plain names
+    return os.path.join(directory, f"{stem}-{generation}.npy" if generation else f"{stem}.npy")
+
+
+# Generation of the arrays meta.json currently points at (None if none)
+def _current_generation(directory):
+    try:
+        with open(os.path.join(directory, "meta.json")) as f:
+            return json.load(f).get("generation")
+    except FileNotFoundError:
+        return None
+
+
+# Delete the arrays of every generation but the given ones. Readers that
+# still map a deleted file keep their mapping.
+def _remove_old_arrays(directory, keep):
+    keep_suffixes = tuple(f"-{generation}.npy" for generation in keep if generation)
+    for entry in os.listdir(directory):
+        if entry.endswith(".npy") and not entry.endswith(keep_suffixes):
+            os.remove(os.path.join(directory, entry))
+
+
+def build_index(name="enhanced_customers", stage="processed"):
+    import pyarrow.parquet as pq
+
+    files = _parquet_files(name, stage)
+    row_groups, start = [], 0
+    for file_number, path in enumerate(files):
+        metadata = pq.ParquetFile(path).metadata
+        for group in range(metadata.num_row_groups):
+            row_groups.append([file_number, group, start])
+            start += metadata.row_group(group).num_rows
+
+    df = storage.read_files(files, columns=[KEY_COLUMN] + FILTER_COLUMNS)
+    if len(df) != start:
+        raise ValueError(f"Row count mismatch while indexing {name}")
+    if df[KEY_COLUMN].duplicated().any():
+        raise ValueError(f"{KEY_COLUMN} is not unique in {name}")
+
+    directory = index_dir(name, stage)
+    os.makedirs(directory, exist_ok=True)
+    previous = _current_generation(directory)
+    generation = uuid.uuid4().hex[:12]
+    ids = np.char.encode(df[KEY_COLUMN].to_numpy(dtype=str), "utf-8")
+    order = np.argsort(ids, kind="stable")
+    np.save(_array_path(directory, generation, "ids"), ids[order])
+    np.save(_array_path(directory, generation, "id_rows"), order.astype(np.int64))
+
+    filters = {}
+    for col in FILTER_COLUMNS:
+        labels = df[col].astype("category")
+        codes = labels.cat.codes.to_numpy()
+        rows = np.argsort(codes, kind="stable").astype(np.int64)
+        bounds = np.searchsorted(codes[rows], np.arange(len(labels.cat.categories) + 1))
+        np.save(_array_path(directory, generation, col), rows)
+        filters[col] = {"labels": [str(label) for label in labels.cat.categories],
+                        "bounds": bounds.tolist()}
+
+    meta = {"files": _fingerprint(files), "row_groups": row_groups, "num_rows": start, "filters": filters,
+            "generation": generation}
+    with open(os.path.join(directory, "meta.json.tmp"), "w") as f:
+        json.dump(meta, f)
+    os.replace(os.path.join(directory, "meta.json.tmp"), os.path.join(directory, "meta.json"))
+    # The previous generation stays for readers that loaded its meta.json
+    # just before the swap
+    _remove_old_arrays(directory, [generation, previous])
+    print(f"Index of {start:,} {name} rows saved to {directory}")
+    return directory
+
+
+class CustomerIndex:
+    def __init__(self, name="enhanced_customers", stage="processed"):
+        self.name, self.stage = name, stage
+        directory = index_dir(name, stage)
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.num_rows = self.meta["num_rows"]
+        generation = self.meta.get("generation")
+        self.ids = np.load(_array_path(directory, generation, "ids"), mmap_mode="r")
+        self.id_rows = np.load(_array_path(directory, generation, "id_rows"), mmap_mode="r")
+        self.filter_rows = {col: np.load(_array_path(directory, generation, col), mmap_mode="r")
+                            for col in self.meta["filters"]}
+        self.files = [path for path, _, _ in self.meta["files"]]
+        self.group_starts = np.array([start for _, _, start in self.meta["row_groups"]] + [self.num_rows])
+        # An open index is shared between threads (e.g. app sessions)
+        self._lock = threading.Lock()
+        self._filtered = OrderedDict()
+        self._readers = {}
+
+    def is_current(self):
+        return self.meta["files"] == _fingerprint(_parquet_files(self.name, self.stage))
+
+    def labels(self, col):
+        return self.meta["filters"][col]["labels"]
+
+    # Row offset of a customer, or None if unknown
+    def row_of(self, customer_id):
+        key = str(customer_id).encode()
+        position = np.searchsorted(self.ids, key)
+        if position < len(self.ids) and self.ids[position] == key:
+            return int(self.id_rows[position])
+        return None
+
+    # Ascending row offsets matching {column: [labels]} (all rows if empty)
+    def matching_rows(self, filters=None):
+        key = tuple(sorted((col, tuple(sorted(labels))) for col, labels in (filters or {}).items() if labels))
+        with self._lock:
+            if key in self._filtered:
+                self._filtered.move_to_end(key)
+                return self._filtered[key]
+
+        rows = None
+        for col, labels in key:
+            spec = self.meta["filters"][col]
+            positions = [spec["labels"].index(label) for label in labels if label in spec["labels"]]
+            matched = np.sort(np.concatenate(
+                [self.filter_rows[col][spec["bounds"][p]:spec["bounds"][p + 1]] for p in positions]
+                or [np.empty(0, dtype=np.int64)]))
+            rows = matched if rows is None else np.intersect1d(rows, matched, assume_unique=True)
+        if rows is None:
+            rows = np.arange(self.num_rows, dtype=np.int64)
+
+        with self._lock:
+            self._filtered[key] = rows
+            if len(self._filtered) > FILTER_CACHE_SIZE:
+                self._filtered.popitem(last=False)
+        return rows
+
+    def _reader(self, file_number):
+        import pyarrow.parquet as pq
+
+        if file_number not in self._readers:
+            self._readers[file_number] = pq.ParquetFile(self.files[file_number])
+        return self._readers[file_number]
+
+    # Rows at the given offsets, in that order; only the row groups holding
+    # them are read
+    def fetch(self, rows, columns=None):
+        import pyarrow as pa
+
+        rows = np.asarray(rows, dtype=np.int64)
+        groups = np.searchsorted(self.group_starts, rows, side="right") - 1
+        tables, order = [], []
+        with self._lock:
+            for group in np.unique(groups):
+                file_number, group_number, start = self.meta["row_groups"][group]
+                selected = np.flatnonzero(groups == group)
+                table = self._reader(file_number).read_row_group(group_number, columns=columns)
+                tables.append(table.take(rows[selected] - start))
+                order.append(selected)
+            schema = self._reader(0).schema_arrow
+        if not tables:
+            empty = schema.empty_table()
+            return storage.arrow_to_pandas(empty.select(columns) if columns else empty)
+        combined = storage.arrow_to_pandas(pa.concat_tables(tables, promote_options="permissive"))
+        positions = np.empty(len(rows), dtype=np.int64)
+        positions[np.concatenate(order)] = np.arange(len(rows))
+        return combined.iloc[positions].reset_index(drop=True)
+
+    def customer(self, customer_id, columns=None):
+        row = self.row_of(customer_id)
+        return None if row is None else self.fetch([row], columns)
+
+    # One page of the filtered customers, and the number of matching rows
+    def page(self, filters=None, page=0, page_size=50, columns=None):
+        rows = self.matching_rows(filters)
+        return self.fetch(rows[page * page_size:(page + 1) * page_size], columns), len(rows)
+
+
+# Open the index of a table, (re)building it when missing or stale
+def open_index(name="enhanced_customers", stage="processed"):
+    if os.path.exists(os.path.join(index_dir(name, stage), "meta.json")):
+        index = CustomerIndex(name, stage)
+        if index.is_current():
+            return index
+    build_index(name, stage)
+    return CustomerIndex(name, stage)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the CustomerID and filter indexes of the processed customers")
+    parser.add_argument("--name", default="enhanced_customers")
+    args = parser.parse_args()
+    build_index(args.name, "processed")
+
+
+if __name__ == "__main__":
+    main()
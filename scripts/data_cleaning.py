@@ -1,22 +1,50 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
-import os
 
-# Create a directory for cleaned data
-os.makedirs("data/cleaned", exist_ok=True)
+import instrumentation
+import schema
+import storage
+
+# Raw tables at least this large (in MB on disk) are split into hash
+# partitions by primary key when cleaning in parallel
+PARTITION_MB = 32
 
-def clean_customers(df):
+# Labels kept by the cleaning filters (rows with any other value are dropped)
+VALID_TRANSACTION_TYPES = ["Deposit", "Withdrawal", "Payment", "Transfer", "Fee"]
+VALID_RESPONSES = ["Positive", "Negative", "No Response"]
+VALID_RESOLUTIONS = ["Resolved", "Unresolved", "Pending"]
+
+# Statistics used to fill missing values, computed on the deduplicated rows.
+# fill_values overrides them (the incremental mode passes running statistics
+# over the whole history, the parallel mode statistics over the whole table).
+def customer_fill_values(df):
+    return {
+        "Age": df["Age"].median(),
+        "Income": df["Income"].mean(),
+        "CreditScore": df["CreditScore"].mean(),
+        "RelationshipLength": df["RelationshipLength"].median(),
+    }
+
+@instrumentation.traced()
+def clean_customers(df, fill_values=None):
     # Drop duplicates based on CustomerID
     df = df.drop_duplicates(subset=["CustomerID"])
+
+    if fill_values is None:
+        fill_values = customer_fill_values(df)
     
     # Handle missing values
     df["Name"] = df["Name"].fillna("Unknown")
-    df["Age"] = df["Age"].fillna(df["Age"].median())
+    df["Age"] = df["Age"].fillna(fill_values["Age"])
     df["Gender"] = df["Gender"].fillna("Other")
-    df["Income"] = df["Income"].fillna(df["Income"].mean())
-    df["CreditScore"] = df["CreditScore"].fillna(df["CreditScore"].mean())
+    df["Income"] = df["Income"].fillna(fill_values["Income"])
+    df["CreditScore"] = df["CreditScore"].fillna(fill_values["CreditScore"])
     df["RiskProfile"] = df["RiskProfile"].fillna("Medium")
-    df["RelationshipLength"] = df["RelationshipLength"].fillna(df["RelationshipLength"].median())
+    df["RelationshipLength"] = df["RelationshipLength"].fillna(fill_values["RelationshipLength"])
     df["MaritalStatus"] = df["MaritalStatus"].fillna("Single")
     
     # Standardize Gender values
@@ -24,52 +52,76 @@ def clean_customers(df):
     
     return df
 
-def clean_products(df):
+# The credit limit median is taken over the rows kept after the balance filter
+def product_fill_values(df):
+    median_balance = df["Balance"].median()
+    kept = df["Balance"].fillna(median_balance) >= 0
+    credit_cards = kept & (df["ProductType"] == "Credit Card")
+    return {"Balance": median_balance, "CreditLimit": df.loc[credit_cards, "CreditLimit"].median()}
+
+@instrumentation.traced()
+def clean_products(df, fill_values=None):
     # Drop duplicates based on CustomerID and ProductType
     df = df.drop_duplicates(subset=["CustomerID", "ProductType"])
+
+    if fill_values is None:
+        fill_values = product_fill_values(df)
     
     # Handle missing balances with the median balance
-    df["Balance"] = df["Balance"].fillna(df["Balance"].median())
+    df["Balance"] = df["Balance"].fillna(fill_values["Balance"])
     
     # Remove negative balances
     df = df[df["Balance"] >= 0]
 
     # Fill missing credit limits with the median of existing credit card limits
-    median_limit = df.loc[df["ProductType"] == "Credit Card", "CreditLimit"].median()
-    df["CreditLimit"] = df["CreditLimit"].fillna(median_limit)
+    df["CreditLimit"] = df["CreditLimit"].fillna(fill_values["CreditLimit"])
     
     return df
 
-def clean_transactions(df):
+def transaction_fill_values(df):
+    return {"Amount": df["Amount"].mean()}
+
+@instrumentation.traced()
+def clean_transactions(df, fill_values=None):
     # Drop duplicates based on TransactionID
     df = df.drop_duplicates(subset=["TransactionID"])
 
+    if fill_values is None:
+        fill_values = transaction_fill_values(df)
+
     # Handle missing values in transaction amount
-    df["Amount"] = df["Amount"].fillna(df["Amount"].mean())
+    df["Amount"] = df["Amount"].fillna(fill_values["Amount"])
 
     # Remove transactions with negative or zero amounts
     df = df[df["Amount"] > 0]
 
     # Standardize transaction types
-    valid_types = ["Deposit", "Withdrawal", "Payment", "Transfer", "Fee"]
-    df = df[df["TransactionType"].isin(valid_types)]
+    df = df[df["TransactionType"].isin(VALID_TRANSACTION_TYPES)]
     
     return df
 
-def clean_loans(df):
+def loan_fill_values(df):
+    return {"InterestRate": df["InterestRate"].median(), "EMI": df["EMI"].median()}
+
+@instrumentation.traced()
+def clean_loans(df, fill_values=None):
     # Drop duplicates based on LoanID
     df = df.drop_duplicates(subset=["LoanID"])
+
+    if fill_values is None:
+        fill_values = loan_fill_values(df)
     
     # Fill missing interest rates and EMIs with the median
-    df["InterestRate"] = df["InterestRate"].fillna(df["InterestRate"].median())
-    df["EMI"] = df["EMI"].fillna(df["EMI"].median())
+    df["InterestRate"] = df["InterestRate"].fillna(fill_values["InterestRate"])
+    df["EMI"] = df["EMI"].fillna(fill_values["EMI"])
     
     # Remove loans with unrealistic negative values
     df = df[(df["Amount"] > 0) & (df["InterestRate"] >= 0)]
     
     return df
 
-def clean_campaign_responses(df):
+@instrumentation.traced()
+def clean_campaign_responses(df, fill_values=None):
     # Drop duplicates based on CampaignID
     df = df.drop_duplicates(subset=["CampaignID"])
 
@@ -77,61 +129,164 @@ def clean_campaign_responses(df):
     df["Response"] = df["Response"].fillna("No Response")
 
     # Standardize response types
-    valid_responses = ["Positive", "Negative", "No Response"]
-    df = df[df["Response"].isin(valid_responses)]
+    df = df[df["Response"].isin(VALID_RESPONSES)]
     
     return df
 
-def clean_support_interactions(df):
+def support_fill_values(df):
+    return {"NPSScore": df["NPSScore"].median()}
+
+@instrumentation.traced()
+def clean_support_interactions(df, fill_values=None):
     # Drop duplicates based on InteractionID
     df = df.drop_duplicates(subset=["InteractionID"])
 
+    if fill_values is None:
+        fill_values = support_fill_values(df)
+
     # Handle missing NPS scores with median
-    df["NPSScore"] = df["NPSScore"].fillna(df["NPSScore"].median())
+    df["NPSScore"] = df["NPSScore"].fillna(fill_values["NPSScore"])
 
     # Standardize resolution statuses
-    valid_resolutions = ["Resolved", "Unresolved", "Pending"]
-    df = df[df["ResolutionStatus"].isin(valid_resolutions)]
+    df = df[df["ResolutionStatus"].isin(VALID_RESOLUTIONS)]
     
     return df
 
-def save_cleaned_data(df, filename):
-    filepath = os.path.join("data/cleaned", filename)
-    df.to_csv(filepath, index=False)
-    print(f"Cleaned data saved to {filepath}")
+# Raw tables are read with plain labels so missing values can be filled freely
+def load_raw_data(name):
+    return storage.read_table(name, "raw", categorical=False, compact=True)
+
+def save_cleaned_data(df, name):
+    storage.write_table(df, name, "cleaned")
+
+# Cleaning function, fill statistics and primary key of each raw table
+CLEANERS = {
+    "customers": clean_customers,
+    "products": clean_products,
+    "transactions": clean_transactions,
+    "loans": clean_loans,
+    "campaign_responses": clean_campaign_responses,
+    "support_interactions": clean_support_interactions,
+}
+
+FILL_VALUES = {
+    "customers": customer_fill_values,
+    "products": product_fill_values,
+    "transactions": transaction_fill_values,
+    "loans": loan_fill_values,
+    "campaign_responses": None,
+    "support_interactions": support_fill_values,
+}
+
+PRIMARY_KEYS = {
+    "customers": ["CustomerID"],
+    "products": ["CustomerID", "ProductType"],
+    "transactions": ["TransactionID"],
+    "loans": ["LoanID"],
+    "campaign_responses": ["CampaignID"],
+    "support_interactions": ["InteractionID"],
+}
+
+# Read, clean and save one table
+def clean_table(table):
+    save_cleaned_data(CLEANERS[table](load_raw_data(table)), f"cleaned_{table}")
+
+# ---------------------
+# Parallel cleaning
+# ---------------------
+# Tables are cleaned at the same time on a process pool. A large table is
+# split into hash partitions of its primary key, so every copy of a key lands
+# in the same partition and drop_duplicates stays exact within each one. The
+# fill statistics are computed once over the whole deduplicated table (as the
+# serial run does) and passed to every partition, and the cleaned partitions
+# are put back in the original row order, so the result is identical to the
+# serial run.
+
+def raw_table_mb(table):
+    files = storage.table_files(table, "raw", storage.find_format(table, "raw"))
+    return sum(os.path.getsize(f) for f in files) / 2 ** 20
+
+# Partition of each row: a 64-bit hash of its key columns modulo the number
+# of partitions. Binary UUIDs are hashed from their bytes directly (pandas
+# would hash them as Python objects).
+def partition_ids(df, keys, partitions):
+    hashes = np.zeros(len(df), dtype=np.uint64)
+    for col in keys:
+        if schema.is_uuid_column(df[col]) and not df[col].isna().any():
+            words = schema.uuid_words(df[col])
+            column_hashes = words[:, 0] * np.uint64(0x9E3779B97F4A7C15) ^ words[:, 1] * np.uint64(0xC2B2AE3D27D4EB4F)
+        else:
+            column_hashes = pd.util.hash_pandas_object(df[col], index=False).to_numpy()
+        hashes = hashes * np.uint64(31) + column_hashes
+    # Mix the high bits in so the modulo sees all of them
+    hashes ^= hashes >> np.uint64(29)
+    return hashes % np.uint64(partitions)
+
+# Clean one partition (in a worker); keys go back to text here so the parent
+# only has to concatenate
+def clean_partition(table, df, fill_values):
+    return schema.restore(CLEANERS[table](df, fill_values))
+
+# Split a raw table and submit its partitions; returns their futures
+def submit_partitions(pool, table, partitions):
+    raw = load_raw_data(table)
+    keys = PRIMARY_KEYS[table]
+    fill_values = None
+    if FILL_VALUES[table] is not None:
+        fill_values = FILL_VALUES[table](raw[~raw.duplicated(subset=keys)])
+    ids = partition_ids(raw, keys, partitions)
+    return [pool.submit(clean_partition, table, raw[ids == part], fill_values) for part in range(partitions)]
+
+def clean_parallel(tables, workers, partitions=None, partition_mb=PARTITION_MB):
+    partitions = partitions or workers
+    large = [t for t in tables if partitions > 1 and raw_table_mb(t) >= partition_mb]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        jobs = [pool.submit(clean_table, table) for table in tables if table not in large]
+        # Large tables are read and split here while the workers clean the others
+        partitioned = {table: submit_partitions(pool, table, partitions) for table in large}
+        for table, futures in partitioned.items():
+            cleaned = pd.concat([future.result() for future in futures]).sort_index(kind="stable")
+            save_cleaned_data(cleaned, f"cleaned_{table}")
+        for job in jobs:
+            job.result()
+
+# Clean whole tables, serially or on a process pool (see above)
+def clean_tables(tables, workers=None, partitions=None, partition_mb=PARTITION_MB):
+    import incremental_cleaning
+
+    if workers and workers > 1:
+        print(f"Cleaning {len(tables)} tables on {workers} processes...")
+        clean_parallel(tables, workers, partitions, partition_mb)
+    else:
+        for table in tables:
+            print(f"Cleaning {table.replace('_', ' ')} data...")
+            clean_table(table)
+
+    # The full rebuild supersedes any incremental state of the tables
+    for table in tables:
+        incremental_cleaning.reset_state(table)
 
 def main():
-    # Load and clean each dataset
-    print("Cleaning customer data...")
-    customers = pd.read_csv("data/customers.csv")
-    customers = clean_customers(customers)
-    save_cleaned_data(customers, "cleaned_customers.csv")
-
-    print("Cleaning product data...")
-    products = pd.read_csv("data/products.csv")
-    products = clean_products(products)
-    save_cleaned_data(products, "cleaned_products.csv")
-
-    print("Cleaning transaction data...")
-    transactions = pd.read_csv("data/transactions.csv")
-    transactions = clean_transactions(transactions)
-    save_cleaned_data(transactions, "cleaned_transactions.csv")
-
-    print("Cleaning loan data...")
-    loans = pd.read_csv("data/loans.csv")
-    loans = clean_loans(loans)
-    save_cleaned_data(loans, "cleaned_loans.csv")
-
-    print("Cleaning campaign response data...")
-    responses = pd.read_csv("data/campaign_responses.csv")
-    responses = clean_campaign_responses(responses)
-    save_cleaned_data(responses, "cleaned_campaign_responses.csv")
-
-    print("Cleaning support interaction data...")
-    interactions = pd.read_csv("data/support_interactions.csv")
-    interactions = clean_support_interactions(interactions)
-    save_cleaned_data(interactions, "cleaned_support_interactions.csv")
+    parser = argparse.ArgumentParser(description="Clean the raw BankIQ tables")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only clean new raw partitions of the append-only tables")
+    parser.add_argument("--table", action="append", choices=list(CLEANERS),
+                        help="Table to clean in full (repeatable; default: all)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Clean tables in parallel on this many processes (default: one at a time)")
+    parser.add_argument("--partitions", type=int, default=None,
+                        help="Hash partitions per large table in parallel mode (default: --workers)")
+    parser.add_argument("--partition-mb", type=float, default=PARTITION_MB,
+                        help="Raw tables from this size (MB) up are partitioned in parallel mode")
+    args = parser.parse_args()
+
+    if args.incremental:
+        import incremental_cleaning
+
+        incremental_cleaning.main()
+        return
 
+    clean_tables(args.table or list(CLEANERS), args.workers, args.partitions, args.partition_mb)
     print("Data cleaning completed successfully!")
 
 if __name__ == "__main__":
@@ -0,0 +1,312 @@
+import argparse
+import datetime
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+import data_cleaning
+import model_bundle
+import storage
+from sketches import QuantileSketch
+
+# Drift and data-quality monitor. One streaming pass over each raw table and
+# over the model features of enhanced_customers builds a profile per table:
+# row count, null counts per column, a quantile sketch per numeric column,
+# and counts of the rows data_cleaning.py drops for a bad value (the
+# negative/zero amount and balance filters, and the isin() label filters).
+# Profiles merge, so batches (or partitions) are profiled independently.
+#
+# The baseline profiles live in the model bundle and are recorded when it is
+# published (train_model.py): the model features of the training rows and
+# the raw tables the model was trained from. The monitor never takes the data
+# under test as its own baseline unless told to (--save-baseline).
+# Drift is scored from the sketches alone, so the baseline data is never
+# re-read: PSI over the baseline deciles and the KS distance between the two
+# sketched CDFs. Dropped-row and null rates are compared with the baseline
+# rates. A report goes to processed/drift_report.json.
+#
+# Duplicate keys are not counted: that needs an index of every key, not a
+# sketch (see incremental_cleaning.py).
+
+BASELINE_FILE = "drift_baseline.json"
+REPORT_FILE = "drift_report.json"
+FEATURE_TABLE = "enhanced_customers"
+RAW_TABLES = list(data_cleaning.CLEANERS)
+
+# Small sketches: about 3 * k values per column, ranks within ~2%
+SKETCH_K = 100
+BATCH_SIZE = 1_000_000
+
+# Population stability index: < 0.1 stable, 0.1-0.25 moderate shift, above
+# that a significant shift
+PSI_WARNING = 0.1
+PSI_ALERT = 0.25
+PSI_BINS = 10
+# Dropped-row and null rates may rise this much (absolute) over the baseline
+RATE_TOLERANCE = 0.01
+
+# Rows dropped by each value filter of data_cleaning.py, per raw table.
+# Missing amounts and rates are filled before those filters run, so only
+# present values count.
+QUALITY_CHECKS = {
+    "products": {
+        "negative_balance": lambda df: df["Balance"] < 0,
+    },
+    "transactions": {
+        "non_positive_amount": lambda df: df["Amount"] <= 0,
+        "invalid_transaction_type": lambda df: ~df["TransactionType"].isin(data_cleaning.VALID_TRANSACTION_TYPES),
+    },
+    "loans": {
+        "non_positive_amount": lambda df: df["Amount"] <= 0,
+        "negative_interest_rate": lambda df: df["InterestRate"] < 0,
+    },
+    "campaign_responses": {
+        "invalid_response": lambda df: df["Response"].notna() & ~df["Response"].isin(data_cleaning.VALID_RESPONSES),
+    },
+    "support_interactions": {
+        "invalid_resolution_status": lambda df: ~df["ResolutionStatus"].isin(data_cleaning.VALID_RESOLUTIONS),
+    },
+}
+
+
+# ---------------------
+# Profiles
+# ---------------------
+
+# Rows, nulls, sketched numeric columns and failed checks of one table
+class TableProfile:
+    def __init__(self, k=SKETCH_K):
+        self.k = k
+        self.rows = 0
+        self.nulls = {}
+        self.sketches = {}
+        self.checks = {}
+
+    def update(self, df, checks=None):
+        self.rows += len(df)
+        for col, count in df.isna().sum().items():
+            self.nulls[col] = self.nulls.get(col, 0) + int(count)
+        for col in df.columns:
+            dtype = df[col].dtype
+            if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+                values = df[col].to_numpy(dtype=float, na_value=np.nan)
+                values = np.where(np.isinf(values), np.nan, values)
+                self.sketches.setdefault(col, QuantileSketch(self.k)).update(values)
+        for name, check in (checks or {}).items():
+            self.checks[name] = self.checks.get(name, 0) + int(np.asarray(check(df), dtype=bool).sum())
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        for counts, other_counts in [(self.nulls, other.nulls), (self.checks, other.checks)]:
+            for name, count in other_counts.items():
+                counts[name] = counts.get(name, 0) + count
+        for col, sketch in other.sketches.items():
+            self.sketches.setdefault(col, QuantileSketch(self.k)).merge(sketch)
+        return self
+
+    def to_dict(self):
+        return {
+            "k": self.k,
+            "rows": self.rows,
+            "nulls": self.nulls,
+            "checks": self.checks,
+            "sketches": {col: sketch.to_dict() for col, sketch in self.sketches.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        profile = cls(state["k"])
+        profile.rows = state["rows"]
+        profile.nulls = dict(state["nulls"])
+        profile.checks = dict(state["checks"])
+        profile.sketches = {col: QuantileSketch.from_dict(s) for col, s in state["sketches"].items()}
+        return profile
+
+
+# Profile a stored table batch by batch
+def profile_table(name, stage="raw", columns=None, filters=None, checks=None):
+    profile = TableProfile()
+    for batch in storage.iter_table(name, stage, columns=columns, filters=filters, batch_size=BATCH_SIZE):
+        profile.update(batch, checks)
+    return profile
+
+
+# Raw tables as stored now, with their quality checks
+def profile_raw_tables():
+    return {table: profile_table(table, "raw", checks=QUALITY_CHECKS.get(table))
+            for table in RAW_TABLES if storage.table_exists(table, "raw")}
+
+
+# Model features of the rows the model is trained on
+def profile_features(bundle):
+    return profile_table(FEATURE_TABLE, "processed", columns=bundle.features,
+                         filters=[(bundle.target, "not null")])
+
+
+# ---------------------
+# Baselines
+# ---------------------
+
+def baseline_path(version):
+    return os.path.join(model_bundle.bundle_dir(version), BASELINE_FILE)
+
+
+def load_baseline(version):
+    path = baseline_path(version)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return {table: TableProfile.from_dict(state) for table, state in json.load(f).items()}
+
+
+def save_baseline(version, profiles):
+    path = baseline_path(version)
+    with open(path + ".tmp", "w") as f:
+        json.dump({table: profile.to_dict() for table, profile in profiles.items()}, f)
+    os.replace(path + ".tmp", path)
+    return path
+
+
+# Record the model features of the training rows as the bundle's baseline
+def save_feature_baseline(version, X):
+    profiles = load_baseline(version)
+    profiles[FEATURE_TABLE] = TableProfile().update(X)
+    return save_baseline(version, profiles)
+
+
+# Record the raw tables the bundle was trained from as its baseline
+def save_raw_baseline(version):
+    profiles = load_baseline(version)
+    profiles.update(profile_raw_tables())
+    return save_baseline(version, profiles)
+
+
+# ---------------------
+# Drift scores
+# ---------------------
+
+# PSI over the baseline deciles; both distributions come from sketch CDFs
+def psi(baseline, current, bins=PSI_BINS):
+    edges = np.unique(baseline.quantiles(np.arange(1, bins) / bins))
+    expected = np.diff(np.concatenate([[0.0], baseline.cdf(edges), [1.0]]))
+    actual = np.diff(np.concatenate([[0.0], current.cdf(edges), [1.0]]))
+    expected, actual = np.maximum(expected, 1e-4), np.maximum(actual, 1e-4)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+# Largest gap between the two sketched CDFs (two-sample KS statistic)
+def ks_distance(baseline, current):
+    points = np.unique(np.concatenate([baseline.weighted_values()[0], current.weighted_values()[0]]))
+    return float(np.max(np.abs(baseline.cdf(points) - current.cdf(points))))
+
+
+def psi_status(value):
+    if value >= PSI_ALERT:
+        return "alert"
+    return "warning" if value >= PSI_WARNING else "ok"
+
+
+def rate(count, rows):
+    return count / rows if rows else 0.0
+
+
+# Drift rows (table, column, PSI, KS, medians) and rate rows (table, metric,
+# baseline and current rate) of the current profiles against the baseline
+def compare(baseline, current, tolerance=RATE_TOLERANCE):
+    drift, rates = [], []
+    for table, profile in current.items():
+        base = baseline.get(table)
+        if base is None:
+            continue
+        for col, sketch in profile.sketches.items():
+            base_sketch = base.sketches.get(col)
+            if base_sketch is None or base_sketch.count == 0 or sketch.count == 0:
+                continue
+            value = psi(base_sketch, sketch)
+            drift.append({"table": table, "column": col, "psi": value, "ks": ks_distance(base_sketch, sketch),
+                          "baseline_median": base_sketch.median(), "median": sketch.median(),
+                          "status": psi_status(value)})
+        metrics = [(f"dropped:{name}", base.checks.get(name, 0), count) for name, count in profile.checks.items()]
+        metrics += [(f"null:{col}", base.nulls.get(col, 0), count) for col, count in profile.nulls.items()]
+        for metric, base_count, count in metrics:
+            base_rate, current_rate = rate(base_count, base.rows), rate(count, profile.rows)
+            rates.append({"table": table, "metric": metric, "baseline_rate": base_rate, "rate": current_rate,
+                          "status": "alert" if current_rate - base_rate > tolerance else "ok"})
+    return drift, rates
+
+
+def print_report(drift, rates):
+    print(f"{'table':<22} {'column':<22} {'PSI':>7} {'KS':>6} {'median base -> now':>26}  status")
+    for row in drift:
+        medians = f"{row['baseline_median']:.4g} -> {row['median']:.4g}"
+        print(f"{row['table']:<22} {row['column']:<22} {row['psi']:7.3f} {row['ks']:6.3f} {medians:>26}  {row['status']}")
+    flagged = [row for row in rates if row["status"] != "ok" or row["rate"] > 0]
+    if flagged:
+        print(f"\n{'table':<22} {'check':<36} {'baseline':>9} {'now':>9}  status")
+        for row in flagged:
+            print(f"{row['table']:<22} {row['metric']:<36} {row['baseline_rate']:9.2%} {row['rate']:9.2%}  {row['status']}")
+
+
+def save_report(model_version, current, drift, rates):
+    report_path = os.path.join(storage.stage_dir("processed"), REPORT_FILE)
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump({"created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                   "model_version": model_version,
+                   "rows": {table: profile.rows for table, profile in current.items()},
+                   "drift": drift, "rates": rates}, f, indent=2)
+    return report_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare today's data with the training snapshot of the model")
+    parser.add_argument("--version", default=None, help="Model bundle version (default: latest)")
+    parser.add_argument("--save-baseline", action="store_true",
+                        help="Replace the bundle's raw-table baseline with today's profiles (only when the "
+                             "data is known to be good)")
+    parser.add_argument("--tolerance", type=float, default=RATE_TOLERANCE,
+                        help="Allowed rise of a dropped-row or null rate over the baseline")
+    parser.add_argument("--fail-on-drift", action="store_true", help="Exit with status 1 on any alert")
+    args = parser.parse_args()
+
+    try:
+        bundle = model_bundle.load_bundle(args.version)
+    except FileNotFoundError as error:
+        # An empty report still marks the run as done (see pipeline.py)
+        path = save_report(None, {}, [], [])
+        print(f"{error}; nothing to monitor yet (empty report saved to {path})")
+        return
+
+    print("Profiling tables...")
+    current = profile_raw_tables()
+    current[FEATURE_TABLE] = profile_features(bundle)
+
+    baseline = load_baseline(bundle.version)
+    raw_tables = [t for t in current if t != FEATURE_TABLE]
+    if args.save_baseline:
+        baseline.update({t: current[t] for t in raw_tables})
+        path = save_baseline(bundle.version, baseline)
+        print(f"Baseline of {', '.join(raw_tables)} recorded in {path}")
+    missing = [t for t in raw_tables if t not in baseline]
+    if missing:
+        print(f"Bundle {bundle.version} has no baseline of {', '.join(missing)}; "
+              "retrain or pass --save-baseline to record one")
+    if FEATURE_TABLE not in baseline:
+        print(f"Bundle {bundle.version} has no feature baseline; retrain to record one")
+
+    drift, rates = compare(baseline, current, args.tolerance)
+    print_report(drift, rates)
+
+    report_path = save_report(bundle.version, current, drift, rates)
+    alerts = [row for row in drift + rates if row["status"] == "alert"]
+    print(f"{len(alerts)} alerts; report saved to {report_path}")
+    if alerts and args.fail_on_drift:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
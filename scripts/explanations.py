@@ -0,0 +1,261 @@
+import argparse
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import instrumentation
+import model_bundle
+import storage
+
+# Precomputed SHAP values. For each model bundle the exact tree SHAP values
+# (XGBoost pred_contribs) of every explained customer are stored next to the
+# model as a float32 matrix, so the app reads one row per interaction instead
+# of running an explainer:
+#   <bundle>/shap_values.npy      (customers x features), memory-mapped
+#   <bundle>/shap_customers.parquet   CustomerID of each row and a hash of
+#                                     the feature values it was computed on
+# A stored row only holds while the customer's features are unchanged:
+# rebuilding enhanced_customers without retraining (feature_store.py,
+# 02_feature_engineering.py) makes it stale, which the hash detects.
+# and a global summary (mean |SHAP| importances and a beeswarm sample) in
+#   <bundle>/shap_global.npz
+
+SHAP_VALUES_FILE = "shap_values.npy"
+SHAP_CUSTOMERS_FILE = "shap_customers.parquet"
+# Global explanation: mean |SHAP| over every customer plus a stratified sample
+# for the beeswarm plot
+GLOBAL_SUMMARY_FILE = "shap_global.npz"
+
+DEFAULT_CHUNK_SIZE = 500_000
+DEFAULT_SAMPLE_SIZE = 5_000
+# Share of the beeswarm sample drawn from positive (high-risk) customers, far
+# above their share of the population so the rare class stays visible
+DEFAULT_POSITIVE_SHARE = 0.5
+# Rendered force plots kept in memory
+DEFAULT_HTML_CACHE_SIZE = 512
+
+
+# Customers the app explains: those with a known target
+def explained_filters(bundle):
+    return [(bundle.target, "not null")]
+
+
+# Hash of each row of feature values, independent of the column dtypes
+# (values are compared as float64)
+def feature_hashes(X, features):
+    values = pd.DataFrame(X[features].to_numpy(dtype=np.float64, na_value=np.nan))
+    return pd.util.hash_pandas_object(values, index=False).to_numpy()
+
+
+# Compute and store the SHAP matrix of a bundle, chunk by chunk
+@instrumentation.traced(category="explain")
+def build_shap_matrix(bundle, chunk_size=DEFAULT_CHUNK_SIZE):
+    directory = model_bundle.bundle_dir(bundle.version)
+    chunks = storage.iter_table("enhanced_customers", "processed",
+                                columns=["CustomerID"] + bundle.features,
+                                filters=explained_filters(bundle), batch_size=chunk_size)
+    customer_ids, hashes, values = [], [], []
+    for chunk in chunks:
+        customer_ids.append(chunk["CustomerID"])
+        hashes.append(feature_hashes(chunk, bundle.features))
+        values.append(bundle.contributions(chunk).astype(np.float32))
+    values = np.concatenate(values) if values else np.empty((0, len(bundle.features)), dtype=np.float32)
+    customer_ids = pd.concat(customer_ids, ignore_index=True) if customer_ids else pd.Series([], dtype=str)
+    hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+
+    # Both files are written aside and swapped in, so readers never see a
+    # partly written one
+    path = os.path.join(directory, SHAP_VALUES_FILE)
+    customers_path = os.path.join(directory, SHAP_CUSTOMERS_FILE)
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, values)
+    pd.DataFrame({"CustomerID": customer_ids, "FeatureHash": hashes}).to_parquet(
+        customers_path + ".tmp", index=False, engine="pyarrow")
+    os.replace(customers_path + ".tmp", customers_path)
+    os.replace(path + ".tmp", path)
+    print(f"SHAP values of {len(values):,} customers saved to {path}")
+    return path
+
+
+# (CustomerIDs, feature hashes, memory-mapped SHAP matrix) of a bundle, or
+# None if not built. Matrices built before the hashes were stored have no
+# hashes (None) and are treated as stale.
+def load_shap_matrix(bundle):
+    directory = model_bundle.bundle_dir(bundle.version)
+    path = os.path.join(directory, SHAP_VALUES_FILE)
+    if not os.path.exists(path):
+        return None
+    customers = pd.read_parquet(os.path.join(directory, SHAP_CUSTOMERS_FILE))
+    hashes = customers["FeatureHash"].to_numpy() if "FeatureHash" in customers else None
+    return customers["CustomerID"], hashes, np.load(path, mmap_mode="r")
+
+
+# ---------------------
+# Global explanation
+# ---------------------
+
+# Streaming global summary: sums |SHAP| over every row and keeps a uniform
+# random sample of each class (bottom-k of a random key per row), so memory
+# stays bounded by the sample size however many rows go through it
+class GlobalSummary:
+    def __init__(self, num_features, sample_size=DEFAULT_SAMPLE_SIZE, seed=0):
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        self.abs_sum = np.zeros(num_features)
+        self.rows = 0
+        self.positives = 0
+        # Per class: (random keys, SHAP values, feature values)
+        self.reservoirs = {
+            label: (np.empty(0), np.empty((0, num_features), dtype=np.float32),
+                    np.empty((0, num_features)))
+            for label in (0, 1)
+        }
+
+    def update(self, values, data, target):
+        values = np.asarray(values, dtype=np.float32)
+        data = np.asarray(data, dtype=float)
+        positive = np.asarray(target) == 1
+        self.abs_sum += np.abs(values).sum(axis=0, dtype=float)
+        self.rows += len(values)
+        self.positives += int(positive.sum())
+
+        for label, rows in ((1, positive), (0, ~positive)):
+            keys, kept_values, kept_data = self.reservoirs[label]
+            keys = np.concatenate([keys, self.rng.random(int(rows.sum()))])
+            kept_values = np.concatenate([kept_values, values[rows]])
+            kept_data = np.concatenate([kept_data, data[rows]])
+            if len(keys) > self.sample_size:
+                keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+                keys, kept_values, kept_data = keys[keep], kept_values[keep], kept_data[keep]
+            self.reservoirs[label] = (keys, kept_values, kept_data)
+        return self
+
+    def importances(self):
+        return self.abs_sum / max(self.rows, 1)
+
+    # Stratified sample: up to positive_share of the rows are positives, the
+    # rest negatives (either class tops up when the other runs short)
+    def sample(self, positive_share=DEFAULT_POSITIVE_SHARE):
+        positives = self.reservoirs[1][0]
+        negatives = self.reservoirs[0][0]
+        num_positive = min(len(positives), int(round(self.sample_size * positive_share)))
+        num_negative = min(len(negatives), self.sample_size - num_positive)
+        num_positive = min(len(positives), self.sample_size - num_negative)
+
+        parts = []
+        for label, count in ((1, num_positive), (0, num_negative)):
+            keys, values, data = self.reservoirs[label]
+            order = np.argsort(keys)[:count]
+            parts.append((values[order], data[order], np.full(count, label, dtype=np.int8)))
+        return tuple(np.concatenate(arrays) for arrays in zip(*parts))
+
+
+# Stream the explained customers once and write the global summary of a
+# bundle. SHAP values come from the precomputed matrix when its customers and
+# feature values still match the processed table, and are computed otherwise.
+@instrumentation.traced(category="explain")
+def build_global_summary(bundle, sample_size=DEFAULT_SAMPLE_SIZE, positive_share=DEFAULT_POSITIVE_SHARE,
+                         chunk_size=DEFAULT_CHUNK_SIZE, seed=0):
+    matrix = load_shap_matrix(bundle)
+    summary = GlobalSummary(len(bundle.features), sample_size, seed)
+    chunks = storage.iter_table("enhanced_customers", "processed",
+                                columns=["CustomerID"] + bundle.features + [bundle.target],
+                                filters=explained_filters(bundle), batch_size=chunk_size)
+    offset = 0
+    for chunk in chunks:
+        values = None
+        if matrix is not None and matrix[1] is not None:
+            customer_ids, hashes, stored = matrix
+            stored_ids = customer_ids.iloc[offset:offset + len(chunk)].to_numpy()
+            stored_hashes = hashes[offset:offset + len(chunk)]
+            if (len(stored_ids) == len(chunk) and (stored_ids == chunk["CustomerID"].to_numpy()).all()
+                    and (stored_hashes == feature_hashes(chunk, bundle.features)).all()):
+                values = stored[offset:offset + len(chunk)]
+        if values is None:
+            values = bundle.contributions(chunk)
+        summary.update(values, chunk[bundle.features], chunk[bundle.target])
+        offset += len(chunk)
+
+    sample_values, sample_data, sample_target = summary.sample(positive_share)
+    path = os.path.join(model_bundle.bundle_dir(bundle.version), GLOBAL_SUMMARY_FILE)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, importances=summary.importances(), rows=summary.rows, positives=summary.positives,
+                 sample_values=sample_values, sample_data=sample_data, sample_target=sample_target)
+    os.replace(path + ".tmp", path)
+    print(f"Global SHAP summary of {summary.rows:,} customers saved to {path}")
+    return path
+
+
+# Stored global summary of a bundle as a dict of arrays, or None if not built
+def load_global_summary(bundle):
+    path = os.path.join(model_bundle.bundle_dir(bundle.version), GLOBAL_SUMMARY_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path) as summary:
+        return {name: summary[name] for name in summary.files}
+
+
+# ---------------------
+# Local explanation
+# ---------------------
+
+# Standalone force plot page (JavaScript included), rendered in memory
+@instrumentation.traced(category="explain")
+def force_plot_html(base_value, shap_values, features):
+    import shap
+
+    plot = shap.force_plot(base_value=base_value, shap_values=shap_values,
+                           features=features, matplotlib=False)
+    out = io.StringIO()
+    shap.save_html(out, plot)
+    return out.getvalue()
+
+
+# Least-recently-used cache of rendered HTML, keyed by e.g.
+# (model version, CustomerID). Rendering happens outside the lock, so two
+# sessions may render the same entry once each.
+class HtmlCache:
+    def __init__(self, maxsize=DEFAULT_HTML_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        # The cache is shared between threads (app sessions)
+        self._lock = threading.Lock()
+
+    def get(self, key, render):
+        with self._lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+        html = render()
+        with self._lock:
+            self.entries[key] = html
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return html
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the local and global SHAP explanations of a model bundle")
+    parser.add_argument("--version", default=None, help="Model bundle version (default: latest)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--sample-size", type=int, default=DEFAULT_SAMPLE_SIZE,
+                        help="Customers drawn for the beeswarm plot")
+    parser.add_argument("--positive-share", type=float, default=DEFAULT_POSITIVE_SHARE,
+                        help="Share of the beeswarm sample drawn from high-risk customers")
+    parser.add_argument("--global-only", action="store_true",
+                        help="Only rebuild the global summary (from the stored SHAP matrix)")
+    args = parser.parse_args()
+
+    bundle = model_bundle.load_bundle(args.version)
+    if not args.global_only:
+        build_shap_matrix(bundle, args.chunk_size)
+    build_global_summary(bundle, args.sample_size, args.positive_share, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import argparse
+
+import pandas as pd
+import numpy as np
+
+import aggregation
+import features
+import instrumentation
+import lazy_aggregation
+import schema
+import storage
+
+# Load cleaned data
+def load_cleaned_data():
+    tables = {
+        "customers": storage.read_table("cleaned_customers", "cleaned", compact=True),
+        "products": storage.read_table("cleaned_products", "cleaned", compact=True),
+        "transactions": storage.read_table("cleaned_transactions", "cleaned", compact=True),
+        "loans": storage.read_table("cleaned_loans", "cleaned", compact=True),
+        "support_interactions": storage.read_table("cleaned_support_interactions", "cleaned", compact=True),
+    }
+    print("Cleaned data loaded successfully!")
+    return tables
+
+# ---------------------
+# Product Usage Features
+# ---------------------
+@instrumentation.traced()
+def product_features(products):
+    product_count = products.groupby("CustomerID")["ProductType"].count().reset_index()
+    product_count.columns = ["CustomerID", "ProductCount"]
+
+    active_count = products[products["ActiveStatus"] == "Active"].groupby("CustomerID")["ProductType"].count().reset_index()
+    active_count.columns = ["CustomerID", "ActiveProductCount"]
+
+    product_features = product_count.merge(active_count, on="CustomerID", how="left")
+    product_features["ActiveProductCount"] = product_features["ActiveProductCount"].fillna(0)
+
+    # New Feature: Product Engagement Score
+    product_features["ProductEngagementScore"] = np.where(
+        product_features["ProductCount"] > 0,
+        product_features["ActiveProductCount"] / product_features["ProductCount"],
+        0
+    )
+    return product_features
+
+# ---------------------
+# Financial Features
+# ---------------------
+@instrumentation.traced()
+def financial_features(transactions):
+    avg_transaction = transactions.groupby("CustomerID")["Amount"].mean().reset_index()
+    avg_transaction.columns = ["CustomerID", "AvgTransactionAmount"]
+
+    trans_count = transactions.groupby("CustomerID")["TransactionID"].count().reset_index()
+    trans_count.columns = ["CustomerID", "TransactionFrequency"]
+
+    return avg_transaction.merge(trans_count, on="CustomerID", how="left")
+
+# ---------------------
+# Loan Features
+# ---------------------
+@instrumentation.traced()
+def loan_features(loans):
+    loans["EMItoIncomeRatio"] = features.emi_ratio(loans)
+    loans["HighRiskLoan"] = features.high_risk_flag(loans)
+
+    avg_loan = loans.groupby("CustomerID").agg(
+        AvgLoanAmount=("Amount", "mean"),
+        AvgEMItoIncomeRatio=("EMItoIncomeRatio", "mean"),
+        HighRiskLoan=("HighRiskLoan", "max")
+    ).reset_index()
+
+    # New Feature: Loan Burden Score
+    avg_loan["LoanBurdenScore"] = avg_loan["AvgLoanAmount"] * avg_loan["AvgEMItoIncomeRatio"]
+    return avg_loan
+
+# ---------------------
+# Engagement Features
+# ---------------------
+@instrumentation.traced()
+def engagement_features(support_interactions):
+    interaction_count = support_interactions.groupby("CustomerID")["InteractionID"].count().reset_index()
+    interaction_count.columns = ["CustomerID", "SupportFrequency"]
+
+    support_interactions["NPSBucket"] = pd.cut(support_interactions["NPSScore"], bins=[0, 3, 7, 10], labels=["Low", "Medium", "High"])
+    return interaction_count
+
+@instrumentation.traced()
+def feature_engineering(customers, products, transactions, loans, support_interactions):
+    print("Generating customer profile features...")
+    features.add_profile_features(customers)
+
+    print("Generating product features...")
+    products_block = product_features(products)
+
+    print("Generating financial features...")
+    financial_block = financial_features(transactions)
+
+    print("Generating loan features...")
+    loan_block = loan_features(loans)
+
+    print("Generating engagement features...")
+    engagement_block = engagement_features(support_interactions)
+
+    print("Merging all features...")
+    return features.assemble(customers, products_block, financial_block, loan_block, engagement_block)
+
+# Feature engineering implementations selectable with --engine
+ENGINES = {
+    "pandas": feature_engineering,
+    "fused": aggregation.fused_feature_engineering,
+    "lazy": lazy_aggregation.lazy_feature_engineering,
+}
+
+# The lazy engine scans the cleaned tables instead of loading them
+LOADERS = {
+    "lazy": lazy_aggregation.scan_cleaned_data,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the enhanced customer table")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="pandas",
+                        help="pandas: groupby + merge; fused: single-pass array aggregation; "
+                             "lazy: out-of-core Polars streaming over the partition files")
+    args = parser.parse_args()
+
+    print("Starting feature engineering...")
+    load = LOADERS.get(args.engine, load_cleaned_data)
+    enhanced_customers = schema.compact(ENGINES[args.engine](**load()), "enhanced_customers")
+    storage.write_table(enhanced_customers, "enhanced_customers", "processed")
+    print("Feature engineering completed successfully!")
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
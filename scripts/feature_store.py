@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import features
+import schema
+import storage
+
+# Mergeable per-customer partial aggregates. "sum" columns add up across
+# batches and "max" columns keep the largest value seen.
+AGGREGATES = {
+    # Transactions
+    "TxnRows": "sum",
+    "TxnAmountSum": "sum",
+    "TxnAmountCount": "sum",
+    "TxnCount": "sum",
+    # Loans
+    "LoanRows": "sum",
+    "LoanAmountSum": "sum",
+    "LoanAmountCount": "sum",
+    "EMIRatioSum": "sum",
+    "EMIRatioCount": "sum",
+    "HighRiskLoan": "max",
+    # Support interactions
+    "SupportRows": "sum",
+    "SupportCount": "sum",
+}
+
+# Products are a small reference table rewritten on every clean, so their
+# aggregates are recomputed in full rather than merged
+PRODUCT_AGGREGATES = ["ProductRows", "ProductCount", "ActiveProductCount"]
+
+# Append-only cleaned tables the store consumes partition by partition
+APPEND_ONLY_TABLES = ["cleaned_transactions", "cleaned_loans", "cleaned_support_interactions"]
+
+
+def store_dir():
+    return os.path.join(storage.stage_dir("processed"), "feature_store")
+
+
+# ---------------------
+# Partial aggregates of a batch of cleaned rows
+# ---------------------
+
+def transaction_partials(transactions):
+    grouped = transactions.groupby("CustomerID")
+    return pd.DataFrame({
+        "TxnRows": grouped.size(),
+        "TxnAmountSum": grouped["Amount"].sum(),
+        "TxnAmountCount": grouped["Amount"].count(),
+        "TxnCount": grouped["TransactionID"].count(),
+    })
+
+
+def loan_partials(loans):
+    loans = loans.assign(EMItoIncomeRatio=features.emi_ratio(loans),
+                         HighRiskLoan=features.high_risk_flag(loans))
+    grouped = loans.groupby("CustomerID")
+    return pd.DataFrame({
+        "LoanRows": grouped.size(),
+        "LoanAmountSum": grouped["Amount"].sum(),
+        "LoanAmountCount": grouped["Amount"].count(),
+        "EMIRatioSum": grouped["EMItoIncomeRatio"].sum(),
+        "EMIRatioCount": grouped["EMItoIncomeRatio"].count(),
+        "HighRiskLoan": grouped["HighRiskLoan"].max(),
+    })
+
+
+def support_partials(support_interactions):
+    grouped = support_interactions.groupby("CustomerID")
+    return pd.DataFrame({
+        "SupportRows": grouped.size(),
+        "SupportCount": grouped["InteractionID"].count(),
+    })
+
+
+def product_partials(products):
+    grouped = products.groupby("CustomerID")
+    active = products[products["ActiveStatus"] == "Active"].groupby("CustomerID")["ProductType"].count()
+    return pd.DataFrame({
+        "ProductRows": grouped.size(),
+        "ProductCount": grouped["ProductType"].count(),
+        "ActiveProductCount": active,
+    }).fillna({"ActiveProductCount": 0})
+
+
+PARTIALS = {
+    "cleaned_transactions": transaction_partials,
+    "cleaned_loans": loan_partials,
+    "cleaned_support_interactions": support_partials,
+}
+
+
+# Combine partial aggregates keyed by CustomerID (index)
+def merge_partials(*frames):
+    frames = [f.reindex(columns=list(AGGREGATES)) for f in frames if f is not None and len(f)]
+    if not frames:
+        return pd.DataFrame(columns=list(AGGREGATES), dtype=float).rename_axis("CustomerID")
+    grouped = pd.concat(frames).groupby(level=0)
+    merged = pd.DataFrame({
+        # max() of a customer without any loans stays NaN rather than 0
+        col: grouped[col].max() if rule == "max" else grouped[col].sum()
+        for col, rule in AGGREGATES.items()
+    })
+    return merged.rename_axis("CustomerID")
+
+
+# ---------------------
+# Persisted store
+# ---------------------
+
+def load_store():
+    state_path = os.path.join(store_dir(), "state.json")
+    if not os.path.exists(state_path):
+        return None, None
+    with open(state_path) as f:
+        state = json.load(f)
+    aggregates = pd.read_parquet(os.path.join(store_dir(), "aggregates.parquet"))
+    # Keyed by compact CustomerIDs, like the tables they are merged with
+    return state, schema.compact(aggregates, "customers").set_index("CustomerID")
+
+
+def save_store(state, aggregates):
+    os.makedirs(store_dir(), exist_ok=True)
+    path = os.path.join(store_dir(), "aggregates.parquet")
+    schema.restore(aggregates.reset_index()).to_parquet(path + ".tmp", index=False, engine="pyarrow")
+    os.replace(path + ".tmp", path)
+
+    state_path = os.path.join(store_dir(), "state.json")
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def partition_key(path):
+    return f"{os.path.relpath(path, storage.stage_dir('cleaned'))}:{os.path.getsize(path)}"
+
+
+# Per-customer fingerprint of the profile columns, to spot edited customers.
+# Keyed by the compact CustomerIDs (.array keeps them binary; to_numpy()
+# would turn them into Python bytes and the joined store index with them).
+def profile_hashes(customers):
+    return pd.Series(pd.util.hash_pandas_object(customers, index=False).to_numpy(),
+                     index=pd.Index(customers["CustomerID"].array, name="CustomerID"))
+
+
+# ---------------------
+# Refresh
+# ---------------------
+
+# Fold newly cleaned partitions into the store. Returns the store and the
+# CustomerIDs whose features may have changed. If a partition the store
+# already consumed was removed or rewritten (e.g. by a full re-clean), the
+# store is rebuilt from scratch.
+def refresh(rebuild=False):
+    state, aggregates = (None, None) if rebuild else load_store()
+    if state is not None:
+        current = {table: {partition_key(p) for p in storage.list_partitions(table, "cleaned")}
+                   for table in APPEND_ONLY_TABLES}
+        if any(not set(state["partitions"].get(table, [])) <= current[table] for table in APPEND_ONLY_TABLES):
+            print("Cleaned tables were rewritten; rebuilding the feature store...")
+            state, aggregates = None, None
+    if state is None:
+        state = {"partitions": {table: [] for table in APPEND_ONLY_TABLES}}
+        aggregates = pd.DataFrame(columns=list(AGGREGATES) + PRODUCT_AGGREGATES + ["ProfileHash"],
+                                  index=pd.Index([], dtype=schema.uuid_dtype(), name="CustomerID"))
+
+    changed = set()
+    deltas = [aggregates]
+    for table in APPEND_ONLY_TABLES:
+        for path in storage.list_partitions(table, "cleaned"):
+            key = partition_key(path)
+            if key in state["partitions"][table]:
+                continue
+            print(f"Aggregating {key}...")
+            delta = PARTIALS[table](storage.read_files([path], compact=table))
+            deltas.append(delta)
+            changed.update(delta.index)
+            state["partitions"][table].append(key)
+    merged = merge_partials(*deltas)
+
+    # Reference tables: products are re-aggregated, customers are fingerprinted
+    products = product_partials(storage.read_table("cleaned_products", "cleaned", compact=True))
+    customers = storage.read_table("cleaned_customers", "cleaned", compact=True)
+    hashes = profile_hashes(customers)
+
+    previous = aggregates.reindex(columns=PRODUCT_AGGREGATES + ["ProfileHash"])
+    merged = merged.join(products, how="outer").join(hashes.rename("ProfileHash"), how="outer")
+    before = previous.reindex(merged.index)
+    product_changed = ~(before[PRODUCT_AGGREGATES].fillna(-1) == merged[PRODUCT_AGGREGATES].fillna(-1)).all(axis=1)
+    profile_changed = before["ProfileHash"].ne(merged["ProfileHash"])
+    changed.update(merged.index[product_changed | profile_changed])
+
+    save_store(state, merged)
+    return merged, changed
+
+
+# ---------------------
+# Materialization
+# ---------------------
+
+# Rebuild the feature blocks of feature_engineering.py from the aggregates
+def feature_blocks(aggregates):
+    products = aggregates[aggregates["ProductRows"].fillna(0) > 0]
+    active = products["ActiveProductCount"].astype("int64")
+    if (active == 0).any():
+        # A customer without active products gets a filled NaN on the pandas path
+        active = active.astype(float)
+    product_features = pd.DataFrame({
+        "CustomerID": products.index,
+        "ProductCount": products["ProductCount"].astype("int64").to_numpy(),
+        "ActiveProductCount": active.to_numpy(),
+    })
+    product_features["ProductEngagementScore"] = np.where(
+        product_features["ProductCount"] > 0,
+        product_features["ActiveProductCount"] / product_features["ProductCount"],
+        0
+    )
+
+    txns = aggregates[aggregates["TxnRows"].fillna(0) > 0]
+    financial_features = pd.DataFrame({
+        "CustomerID": txns.index,
+        "AvgTransactionAmount": (txns["TxnAmountSum"] / txns["TxnAmountCount"].replace(0, np.nan)).to_numpy(),
+        "TransactionFrequency": txns["TxnCount"].astype("int64").to_numpy(),
+    })
+
+    loans = aggregates[aggregates["LoanRows"].fillna(0) > 0]
+    avg_loan = pd.DataFrame({
+        "CustomerID": loans.index,
+        "AvgLoanAmount": (loans["LoanAmountSum"] / loans["LoanAmountCount"].replace(0, np.nan)).to_numpy(),
+        "AvgEMItoIncomeRatio": (loans["EMIRatioSum"] / loans["EMIRatioCount"].replace(0, np.nan)).to_numpy(),
+        "HighRiskLoan": loans["HighRiskLoan"].astype("int64").to_numpy(),
+    })
+    avg_loan["LoanBurdenScore"] = avg_loan["AvgLoanAmount"] * avg_loan["AvgEMItoIncomeRatio"]
+
+    support = aggregates[aggregates["SupportRows"].fillna(0) > 0]
+    interaction_count = pd.DataFrame({
+        "CustomerID": support.index,
+        "SupportFrequency": support["SupportCount"].astype("int64").to_numpy(),
+    })
+    return product_features, financial_features, avg_loan, interaction_count
+
+
+# Build the enhanced customer table (optionally only for some customers)
+def materialize(aggregates, customer_ids=None):
+    customers = storage.read_table("cleaned_customers", "cleaned", compact=True)
+    if customer_ids is not None:
+        # Typed like the keys: isin() with a set of Python bytes misses
+        # binary keys that contain a zero byte
+        customer_ids = pd.Index(list(customer_ids), dtype=customers["CustomerID"].dtype)
+        customers = customers[customers["CustomerID"].isin(customer_ids)].reset_index(drop=True)
+        aggregates = aggregates[aggregates.index.isin(customer_ids)]
+    features.add_profile_features(customers)
+    return features.assemble(customers, *feature_blocks(aggregates))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the per-customer feature store")
+    parser.add_argument("--rebuild", action="store_true", help="Ignore the stored aggregates and start over")
+    parser.add_argument("--changed-only", action="store_true",
+                        help="Only materialize customers whose rows changed (to enhanced_customers_changes)")
+    args = parser.parse_args()
+
+    print("Refreshing feature store...")
+    aggregates, changed = refresh(rebuild=args.rebuild)
+    print(f"{len(changed):,} customers changed")
+
+    if args.changed_only:
+        enhanced_customers, name = materialize(aggregates, changed), "enhanced_customers_changes"
+    else:
+        enhanced_customers, name = materialize(aggregates), "enhanced_customers"
+    storage.write_table(schema.compact(enhanced_customers, name), name, "processed")
+    print("Feature store refresh completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+import instrumentation
+
+# Customer profile buckets
+AGE_BINS = [0, 25, 35, 50, 65, 100]
+AGE_LABELS = ["Youth", "Young Adult", "Middle Aged", "Senior", "Elderly"]
+INCOME_BINS = [0, 30000, 70000, 120000, 200000]
+INCOME_LABELS = ["Low", "Medium", "High", "Very High"]
+
+
+# ---------------------
+# Customer Profile Features
+# ---------------------
+@instrumentation.traced()
+def add_profile_features(customers):
+    customers["AgeGroup"] = pd.cut(customers["Age"], bins=AGE_BINS, labels=AGE_LABELS)
+    customers["IncomeBracket"] = pd.cut(customers["Income"], bins=INCOME_BINS, labels=INCOME_LABELS)
+    customers["RiskScore"] = np.where(customers["CreditScore"] >= 700, "Low",
+                                      np.where(customers["CreditScore"] >= 500, "Medium", "High"))
+    return customers
+
+
+# ---------------------
+# Loan Features
+# ---------------------
+# EMI relative to the loan amount (NaN when the amount is missing or zero)
+def emi_ratio(loans):
+    ratio = np.where(
+        (loans["Amount"].isnull()) | (loans["Amount"] == 0),
+        np.nan,
+        loans["EMI"] / loans["Amount"]
+    )
+    return pd.Series(ratio, index=loans.index).replace([np.inf, -np.inf], np.nan)
+
+
+# Loans above 10% interest count as high risk
+def high_risk_flag(loans):
+    return np.where(loans["InterestRate"] > 10, 1, 0)
+
+
+# ---------------------
+# Merging All Features
+# ---------------------
+# Left-join every per-customer feature block onto the customers and fill the
+# gaps: 0 for numbers, "Unknown" for labels
+@instrumentation.traced()
+def assemble(customers, product_features, financial_features, avg_loan, interaction_count):
+    enhanced_customers = customers.merge(product_features, on="CustomerID", how="left")
+    enhanced_customers = enhanced_customers.merge(financial_features, on="CustomerID", how="left")
+    enhanced_customers = enhanced_customers.merge(avg_loan, on="CustomerID", how="left")
+    enhanced_customers = enhanced_customers.merge(interaction_count, on="CustomerID", how="left")
+    return fill_missing(enhanced_customers)
+
+
+def fill_missing(enhanced_customers):
+    numeric_cols = enhanced_customers.select_dtypes(include=[np.number]).columns
+    categorical_cols = enhanced_customers.select_dtypes(include=["category", "object"]).columns
+
+    enhanced_customers[numeric_cols] = enhanced_customers[numeric_cols].fillna(0)
+
+    for col in categorical_cols:
+        if isinstance(enhanced_customers[col].dtype, pd.CategoricalDtype):
+            if "Unknown" not in enhanced_customers[col].cat.categories:
+                enhanced_customers[col] = enhanced_customers[col].cat.add_categories(["Unknown"])
+        enhanced_customers[col] = enhanced_customers[col].fillna("Unknown")
+    return enhanced_customers
@@ -0,0 +1,308 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+import loan_math
+import schema
+import storage
+
+# Seed used when none is given on the command line
+DEFAULT_SEED = 42
+
+# Baseline table sizes (scaled with --scale)
+NUM_CUSTOMERS = 1000
+NUM_TRANSACTIONS = 10000
+NUM_LOANS = 500
+NUM_CAMPAIGNS = 50
+NUM_SUPPORT = 2000
+
+# Customer attributes
+GENDERS = ["Male", "Female", "Other"]
+RISK_PROFILES = ["Low", "Medium", "High"]
+MARITAL_STATUS = ["Single", "Married", "Divorced"]
+
+# Product types and statuses
+PRODUCTS = ["Savings Account", "Credit Card", "Mortgage", "Investment Account", "Fixed Deposit"]
+ACTIVE_STATUS = ["Active", "Inactive"]
+
+# Transaction categories
+TRANSACTION_TYPES = ["Deposit", "Withdrawal", "Payment", "Transfer", "Fee"]
+TRANSACTION_CATEGORIES = ["Shopping", "Bills", "Salary", "EMI", "Entertainment", "Groceries", "Insurance", "Miscellaneous"]
+TRANSACTION_CHANNELS = ["App", "Branch", "ATM", "Online"]
+
+# Loan types and statuses
+LOAN_TYPES = ["Home Loan", "Car Loan", "Personal Loan", "Education Loan"]
+LOAN_STATUS = ["Active", "Closed", "Default"]
+
+# Support interaction types
+INTERACTION_TYPES = ["Call", "Email", "Chat", "Branch Visit"]
+ISSUE_TYPES = ["General Inquiry", "Complaint", "Technical Issue", "Billing Issue"]
+RESOLUTION_STATUS = ["Resolved", "Unresolved", "Pending"]
+
+# Campaign channels
+CHANNELS = ["Email", "SMS", "Push Notification"]
+RESPONSE_TYPES = ["Positive", "Negative", "No Response"]
+
+# Faker is only used to build a pool of names and cities that rows sample from
+NAME_POOL_SIZE = 5000
+
+# Stable keys so every table gets its own random stream for a given seed
+TABLE_KEYS = {
+    "customers": 1,
+    "products": 2,
+    "transactions": 3,
+    "loans": 4,
+    "campaign_responses": 5,
+    "support_interactions": 6,
+}
+
+# Independent random stream for one table (and optionally one chunk of it)
+def table_rng(seed, table, *keys):
+    return np.random.default_rng([seed, TABLE_KEYS[table], *keys])
+
+
+# Resolve the reference date that relative date ranges ("-2y") are based on
+def resolve_as_of(as_of=None):
+    if as_of is None:
+        return np.datetime64("today", "D")
+    return np.datetime64(pd.Timestamp(as_of).date(), "D")
+
+
+# Random version 4 UUID strings drawn in bulk from the generator
+def random_uuids(rng, n):
+    raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+    raw[:, 6] = (raw[:, 6] & 0x0F) | 0x40
+    raw[:, 8] = (raw[:, 8] & 0x3F) | 0x80
+    return schema.uuid_text(raw).view("S36").ravel().astype(str).astype(object)
+
+
+# Random dates between two offsets (in days before as_of), both ends inclusive
+def random_dates(rng, n, start_days_ago, end_days_ago, as_of):
+    offsets = rng.integers(end_days_ago, start_days_ago + 1, size=n)
+    return as_of - offsets.astype("timedelta64[D]")
+
+
+# Format datetime64[D] values the way the CSVs store them (YYYY-MM-DD)
+# Only the distinct days are formatted; rows pick their label by index
+def format_dates(dates):
+    days, inverse = np.unique(dates, return_inverse=True)
+    return np.datetime_as_string(days, unit="D").astype(object)[inverse]
+
+
+# Random pick from a list of labels, returned as a categorical column
+def random_choice(rng, values, n):
+    return pd.Categorical.from_codes(rng.integers(0, len(values), size=n), categories=values)
+
+
+# Random float in [low, high] rounded to cents, like round(random.uniform(...), 2)
+def random_amounts(rng, low, high, n):
+    return rng.uniform(low, high, size=n).round(2)
+
+
+# Pool of fake names and cities sampled once per seed
+def fake_pools(seed, size=NAME_POOL_SIZE):
+    from faker import Faker
+
+    fake = Faker()
+    fake.seed_instance(seed)
+    names = np.array([fake.name() for _ in range(size)], dtype=object)
+    cities = np.array([fake.city() for _ in range(size)], dtype=object)
+    return names, cities
+
+
+# Generate synthetic customer data
+def generate_customers(num_customers, seed=DEFAULT_SEED):
+    rng = table_rng(seed, "customers")
+    names, cities = fake_pools(seed)
+
+    return pd.DataFrame({
+        "CustomerID": random_uuids(rng, num_customers),
+        "Name": names[rng.integers(0, len(names), size=num_customers)],
+        "Age": rng.integers(18, 71, size=num_customers),
+        "Gender": random_choice(rng, GENDERS, num_customers),
+        "Income": rng.integers(20000, 200001, size=num_customers),
+        "Location": cities[rng.integers(0, len(cities), size=num_customers)],
+        "CreditScore": rng.integers(300, 851, size=num_customers),
+        "RiskProfile": random_choice(rng, RISK_PROFILES, num_customers),
+        "RelationshipLength": rng.integers(1, 21, size=num_customers),
+        "MaritalStatus": random_choice(rng, MARITAL_STATUS, num_customers),
+    })
+
+
+# Generate product ownership data (1 to len(PRODUCTS) distinct products per customer)
+def generate_products(customer_ids, seed=DEFAULT_SEED, as_of=None):
+    rng = table_rng(seed, "products")
+    as_of = resolve_as_of(as_of)
+    customer_ids = np.asarray(customer_ids, dtype=object)
+    num_customers = len(customer_ids)
+
+    # A random permutation of the products per customer, keeping the first k
+    num_products = rng.integers(1, len(PRODUCTS) + 1, size=num_customers)
+    order = rng.random((num_customers, len(PRODUCTS))).argsort(axis=1)
+    owner, slot = np.nonzero(np.arange(len(PRODUCTS)) < num_products[:, None])
+    product_codes = order[owner, slot]
+    n = len(owner)
+
+    credit_limit = rng.integers(1000, 50001, size=n).astype(float)
+    credit_limit[product_codes != PRODUCTS.index("Credit Card")] = np.nan
+
+    return pd.DataFrame({
+        "CustomerID": customer_ids[owner],
+        "ProductType": pd.Categorical.from_codes(product_codes, categories=PRODUCTS),
+        "OpenDate": format_dates(random_dates(rng, n, 20 * 365, 0, as_of)),
+        "ActiveStatus": random_choice(rng, ACTIVE_STATUS, n),
+        "CreditLimit": credit_limit,
+        "Balance": random_amounts(rng, 1000, 50000, n),
+        "UsageScore": random_amounts(rng, 0, 1, n),
+    })
+
+
+# Generate transaction data
+def generate_transactions(num_transactions, customer_ids, seed=DEFAULT_SEED, as_of=None, rng=None):
+    rng = rng if rng is not None else table_rng(seed, "transactions")
+    as_of = resolve_as_of(as_of)
+    customer_ids = np.asarray(customer_ids, dtype=object)
+    n = num_transactions
+
+    return pd.DataFrame({
+        "TransactionID": random_uuids(rng, n),
+        "CustomerID": customer_ids[rng.integers(0, len(customer_ids), size=n)],
+        "Date": format_dates(random_dates(rng, n, 2 * 365, 0, as_of)),
+        "Amount": random_amounts(rng, 10, 5000, n),
+        "TransactionType": random_choice(rng, TRANSACTION_TYPES, n),
+        "Category": random_choice(rng, TRANSACTION_CATEGORIES, n),
+        "Channel": random_choice(rng, TRANSACTION_CHANNELS, n),
+    })
+
+
+# Generate loan data
+def generate_loans(num_loans, customer_ids, seed=DEFAULT_SEED, as_of=None, rng=None):
+    rng = rng if rng is not None else table_rng(seed, "loans")
+    as_of = resolve_as_of(as_of)
+    customer_ids = np.asarray(customer_ids, dtype=object)
+    n = num_loans
+
+    customer = customer_ids[rng.integers(0, len(customer_ids), size=n)]
+    loan_ids = random_uuids(rng, n)
+    loan_type = random_choice(rng, LOAN_TYPES, n)
+    amount = rng.integers(10000, 1000001, size=n)
+    interest_rate = random_amounts(rng, 2, 12, n)
+    term_years = rng.integers(1, 31, size=n)
+    start_date = random_dates(rng, n, 10 * 365, 365, as_of)
+    end_date = start_date + (term_years * 365).astype("timedelta64[D]")
+
+    return pd.DataFrame({
+        "LoanID": loan_ids,
+        "CustomerID": customer,
+        "LoanType": loan_type,
+        "Amount": amount,
+        "InterestRate": interest_rate,
+        "TermYears": term_years,
+        "EMI": loan_math.annuity_emi(amount, interest_rate, term_years * 12).round(2),
+        "StartDate": format_dates(start_date),
+        "EndDate": format_dates(end_date),
+        "Status": random_choice(rng, LOAN_STATUS, n),
+    })
+
+
+# Generate campaign response data
+def generate_campaign_responses(num_campaigns, customer_ids, seed=DEFAULT_SEED, as_of=None, rng=None):
+    rng = rng if rng is not None else table_rng(seed, "campaign_responses")
+    as_of = resolve_as_of(as_of)
+    customer_ids = np.asarray(customer_ids, dtype=object)
+    n = num_campaigns
+
+    return pd.DataFrame({
+        "CustomerID": customer_ids[rng.integers(0, len(customer_ids), size=n)],
+        "CampaignID": random_uuids(rng, n),
+        "Date": format_dates(random_dates(rng, n, 365, 0, as_of)),
+        "Channel": random_choice(rng, CHANNELS, n),
+        "Response": random_choice(rng, RESPONSE_TYPES, n),
+    })
+
+
+# Generate support interaction data
+def generate_support_interactions(num_support, customer_ids, seed=DEFAULT_SEED, as_of=None, rng=None):
+    rng = rng if rng is not None else table_rng(seed, "support_interactions")
+    as_of = resolve_as_of(as_of)
+    customer_ids = np.asarray(customer_ids, dtype=object)
+    n = num_support
+
+    return pd.DataFrame({
+        "InteractionID": random_uuids(rng, n),
+        "CustomerID": customer_ids[rng.integers(0, len(customer_ids), size=n)],
+        "Date": format_dates(random_dates(rng, n, 365, 0, as_of)),
+        "InteractionType": random_choice(rng, INTERACTION_TYPES, n),
+        "IssueType": random_choice(rng, ISSUE_TYPES, n),
+        "ResolutionStatus": random_choice(rng, RESOLUTION_STATUS, n),
+        "NPSScore": rng.integers(1, 11, size=n),
+    })
+
+
+# Number of rows for a table at a given scale factor
+def scaled(num_rows, scale):
+    return max(1, int(round(num_rows * scale)))
+
+
+# Command line options shared by the generation scripts
+def add_generation_args(parser):
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Multiply the NUM_* table sizes by this factor (1 to 1000)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="Seed for the random generator")
+    parser.add_argument("--as-of", default=None, help="Reference date for relative date ranges (default: today)")
+    return parser
+
+
+# Validate the parsed --scale option
+def check_scale(parser, args):
+    if not 1 <= args.scale <= 1000:
+        parser.error("--scale must be between 1 and 1000")
+
+
+# Generate every table in one go
+def main():
+    import stream_generation
+
+    parser = add_generation_args(argparse.ArgumentParser(description="Generate the full synthetic BankIQ dataset"))
+    stream_generation.add_streaming_args(parser)
+    args = parser.parse_args()
+    check_scale(parser, args)
+
+    print("Generating customer data...")
+    customers = generate_customers(scaled(NUM_CUSTOMERS, args.scale), seed=args.seed)
+    customer_ids = customers["CustomerID"].to_numpy()
+    storage.write_table(customers, "customers")
+
+    print("Generating product ownership data...")
+    storage.write_table(generate_products(customer_ids, seed=args.seed, as_of=args.as_of), "products")
+
+    if args.stream:
+        stream_generation.stream_all(args, customer_ids)
+        print("Data generation completed successfully!")
+        return
+
+    print("Generating transaction data...")
+    transactions = generate_transactions(scaled(NUM_TRANSACTIONS, args.scale), customer_ids,
+                                         seed=args.seed, as_of=args.as_of)
+    storage.write_table(transactions, "transactions")
+
+    print("Generating loan data...")
+    loans = generate_loans(scaled(NUM_LOANS, args.scale), customer_ids, seed=args.seed, as_of=args.as_of)
+    storage.write_table(loans, "loans")
+
+    print("Generating campaign response data...")
+    responses = generate_campaign_responses(scaled(NUM_CAMPAIGNS, args.scale), customer_ids,
+                                            seed=args.seed, as_of=args.as_of)
+    storage.write_table(responses, "campaign_responses")
+
+    print("Generating support interaction data...")
+    interactions = generate_support_interactions(scaled(NUM_SUPPORT, args.scale), customer_ids,
+                                                 seed=args.seed, as_of=args.as_of)
+    storage.write_table(interactions, "support_interactions")
+
+    print("Data generation completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
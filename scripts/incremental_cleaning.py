@@ -0,0 +1,206 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+import schema
+import storage
+from data_cleaning import (
+    clean_campaign_responses,
+    clean_customers,
+    clean_loans,
+    clean_products,
+    clean_support_interactions,
+    clean_transactions,
+    load_raw_data,
+    save_cleaned_data,
+)
+from sketches import QuantileSketch
+
+# Append-only feeds: primary key, cleaning function and the statistic used
+# to fill each column with missing values
+APPEND_ONLY_TABLES = {
+    "transactions": (["TransactionID"], clean_transactions, {"Amount": "mean"}),
+    "loans": (["LoanID"], clean_loans, {"InterestRate": "median", "EMI": "median"}),
+    "campaign_responses": (["CampaignID"], clean_campaign_responses, {}),
+    "support_interactions": (["InteractionID"], clean_support_interactions, {"NPSScore": "median"}),
+}
+
+# Reference tables are small and get updated in place, so they are re-cleaned in full
+FULL_REFRESH_TABLES = {
+    "customers": clean_customers,
+    "products": clean_products,
+}
+
+
+def state_dir():
+    return os.path.join(storage.stage_dir("cleaned"), "_state")
+
+
+# ---------------------
+# Persisted state
+# ---------------------
+# Per table: <table>.json holds the processed raw partitions, the batch
+# counter and the running fill statistics; <table>_ids.npy holds the sorted
+# 64-bit hashes of every primary key cleaned so far.
+
+# Forget everything (or everything about one table); called after a full
+# clean rewrote the cleaned tables
+def reset_state(table=None):
+    if table is None:
+        shutil.rmtree(state_dir(), ignore_errors=True)
+        return
+    for path in [os.path.join(state_dir(), f"{table}.json"), os.path.join(state_dir(), f"{table}_ids.npy")]:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def new_state(fill_stats):
+    stats = {}
+    for col, stat in fill_stats.items():
+        stats[col] = {"sum": 0.0, "count": 0} if stat == "mean" else QuantileSketch().to_dict()
+    return {"partitions": {}, "batches": 0, "stats": stats}
+
+
+def load_state(table):
+    path = os.path.join(state_dir(), f"{table}.json")
+    if not os.path.exists(path):
+        return None, np.empty(0, dtype=np.uint64)
+    with open(path) as f:
+        state = json.load(f)
+    seen = np.load(os.path.join(state_dir(), f"{table}_ids.npy"))
+    return state, seen
+
+
+# Write to a temporary file first so an interrupted run never leaves half a state
+def save_state(table, state, seen):
+    os.makedirs(state_dir(), exist_ok=True)
+    ids_path = os.path.join(state_dir(), f"{table}_ids.npy")
+    with open(ids_path + ".tmp", "wb") as f:
+        np.save(f, seen)
+    os.replace(ids_path + ".tmp", ids_path)
+
+    path = os.path.join(state_dir(), f"{table}.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+# ---------------------
+# Dedup index
+# ---------------------
+
+# Keys are hashed as text, so the index does not depend on how they are held
+# in memory
+def hash_keys(df, keys):
+    return pd.util.hash_pandas_object(schema.restore(df[keys]), index=False).to_numpy(dtype=np.uint64)
+
+
+# Membership test against the sorted hash index
+def is_seen(hashes, seen):
+    if len(seen) == 0:
+        return np.zeros(len(hashes), dtype=bool)
+    positions = np.minimum(np.searchsorted(seen, hashes), len(seen) - 1)
+    return seen[positions] == hashes
+
+
+# Insert new (unseen) hashes into the sorted index with a single merge pass
+def add_to_index(seen, hashes):
+    hashes = np.unique(hashes)
+    return np.insert(seen, np.searchsorted(seen, hashes), hashes)
+
+
+# ---------------------
+# Running fill statistics
+# ---------------------
+
+def update_stats(stats, fill_stats, df):
+    for col, stat in fill_stats.items():
+        values = df[col].to_numpy(dtype=float, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        if stat == "mean":
+            stats[col]["sum"] += float(values.sum())
+            stats[col]["count"] += int(len(values))
+        else:
+            stats[col] = QuantileSketch.from_dict(stats[col]).update(values).to_dict()
+
+
+def fill_values_from(stats, fill_stats):
+    values = {}
+    for col, stat in fill_stats.items():
+        if stat == "mean":
+            count = stats[col]["count"]
+            values[col] = stats[col]["sum"] / count if count else np.nan
+        else:
+            values[col] = QuantileSketch.from_dict(stats[col]).median()
+    return values
+
+
+# Raw partitions are identified by path and size, so a partition that grew is
+# read again (rows already cleaned are dropped by the dedup index)
+def partition_key(path):
+    return f"{os.path.relpath(path, storage.stage_dir('raw'))}:{os.path.getsize(path)}"
+
+
+# ---------------------
+# Incremental cleaning
+# ---------------------
+
+def clean_table_incrementally(table):
+    keys, clean, fill_stats = APPEND_ONLY_TABLES[table]
+    cleaned_name = f"cleaned_{table}"
+
+    state, seen = load_state(table)
+    if state is None:
+        # First run: start the cleaned table from scratch so it matches the state
+        storage.remove_table(cleaned_name, "cleaned")
+        state = new_state(fill_stats)
+
+    new_partitions = [p for p in storage.list_partitions(table, "raw")
+                      if partition_key(p) not in state["partitions"]]
+    if not new_partitions:
+        print(f"No new {table} partitions")
+        return 0
+
+    added = 0
+    for path in new_partitions:
+        raw = storage.read_files([path], categorical=False, compact=table)
+
+        # Drop rows cleaned in earlier batches, then duplicates inside this one
+        raw = raw[~is_seen(hash_keys(raw, keys), seen)]
+        raw = raw.drop_duplicates(subset=keys)
+
+        update_stats(state["stats"], fill_stats, raw)
+        cleaned = clean(raw, fill_values_from(state["stats"], fill_stats))
+
+        state["batches"] += 1
+        if len(cleaned):
+            storage.write_part(cleaned, cleaned_name, "cleaned", f"{state['batches']:06d}")
+        seen = add_to_index(seen, hash_keys(raw, keys))
+        state["partitions"][partition_key(path)] = len(cleaned)
+        added += len(cleaned)
+
+    # Parts are numbered from the saved batch counter, so a run interrupted
+    # before this point rewrites the same parts when it is repeated
+    save_state(table, state, seen)
+
+    print(f"Cleaned {added:,} new {table} rows from {len(new_partitions)} partition(s)")
+    return added
+
+
+def main():
+    for table, clean in FULL_REFRESH_TABLES.items():
+        print(f"Cleaning {table} data...")
+        save_cleaned_data(clean(load_raw_data(table)), f"cleaned_{table}")
+
+    for table in APPEND_ONLY_TABLES:
+        print(f"Cleaning new {table} data...")
+        clean_table_incrementally(table)
+
+    print("Incremental data cleaning completed successfully!")
+
+
+if __name__ == "__main__":
+    main()
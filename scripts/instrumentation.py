@@ -0,0 +1,351 @@
+import argparse
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Timing spans for the pipeline hot paths. Stage functions are wrapped with
+# @traced() and ad-hoc blocks with `with span(name) as s: ... s.set(rows_out=n)`;
+# every finished span records its wall time, rows in and out (the length of
+# the first DataFrame/array argument and of the result), and the RSS before
+# and after it. Spans nest per thread, and processes started by the pipeline
+# (or forked by a process pool) append to the same output file.
+#
+# Switched on by environment variables, read once at import:
+#   BANKIQ_TRACE=trace.jsonl       one JSON object per span
+#   BANKIQ_TRACE=trace.json        Chrome trace (chrome://tracing, Perfetto)
+#   BANKIQ_TRACE_FORMAT            jsonl or chrome, to override the extension
+#   BANKIQ_PROFILE=cprofile        profile every outermost span with cProfile
+#   BANKIQ_PROFILE=sample          ... or with a stack sampler (folded stacks,
+#                                  for flamegraph.pl / speedscope)
+#   BANKIQ_PROFILE_DIR             where profiles go (default: profiles)
+#   BANKIQ_PROFILE_INTERVAL_MS     sampling interval (default: 5)
+# When none is set, traced() returns the function itself and span() a shared
+# no-op object, so instrumented code runs as if it were not.
+
+TRACE_PATH = os.environ.get("BANKIQ_TRACE") or None
+TRACE_FORMAT = os.environ.get("BANKIQ_TRACE_FORMAT") or (
+    "jsonl" if TRACE_PATH is None or TRACE_PATH.endswith(".jsonl") else "chrome")
+PROFILE_MODE = os.environ.get("BANKIQ_PROFILE") or None
+PROFILE_DIR = os.environ.get("BANKIQ_PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("BANKIQ_PROFILE_INTERVAL_MS", 5))
+
+TRACE_FORMATS = ["jsonl", "chrome"]
+PROFILE_MODES = ["cprofile", "sample"]
+
+if TRACE_FORMAT not in TRACE_FORMATS:
+    raise ValueError(f"BANKIQ_TRACE_FORMAT must be one of {TRACE_FORMATS}, not {TRACE_FORMAT!r}")
+if PROFILE_MODE is not None and PROFILE_MODE not in PROFILE_MODES:
+    raise ValueError(f"BANKIQ_PROFILE must be one of {PROFILE_MODES}, not {PROFILE_MODE!r}")
+
+ENABLED = TRACE_PATH is not None or PROFILE_MODE is not None
+
+
+# ---------------------
+# Measurements
+# ---------------------
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+# Current resident set size; falls back to the peak where /proc is missing
+def rss_mb():
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2 ** 20
+    except OSError:
+        return peak_rss_mb()
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+# Rows of a DataFrame, Series or array (None for anything else)
+def row_count(value):
+    shape = getattr(value, "shape", None)
+    if shape:
+        return int(shape[0])
+    if isinstance(value, tuple):
+        for item in value:
+            rows = row_count(item)
+            if rows is not None:
+                return rows
+    return None
+
+
+# ---------------------
+# Output
+# ---------------------
+
+# Appends events to the trace file. Each event is one os.write on a file
+# opened with O_APPEND, so processes sharing the file do not interleave. The
+# Chrome trace is a JSON array left open at the end, which the viewers accept.
+class _TraceWriter:
+    def __init__(self, path, fmt):
+        self.path = path
+        self.format = fmt
+        self.pid = None
+        self.fd = None
+        self.lock = threading.Lock()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self.pid = os.getpid()
+        if self.format == "chrome":
+            if os.fstat(self.fd).st_size == 0:
+                os.write(self.fd, b"[\n")
+            self._write({"name": "process_name", "ph": "M", "pid": self.pid,
+                         "args": {"name": f"{process_label()} ({self.pid})"}})
+
+    def _write(self, event):
+        line = json.dumps(event, default=str) + (",\n" if self.format == "chrome" else "\n")
+        os.write(self.fd, line.encode())
+
+    def write(self, record):
+        with self.lock:
+            # Forked workers open their own descriptor
+            if self.pid != os.getpid():
+                self._open()
+            if self.format == "jsonl":
+                self._write(record)
+            else:
+                args = {k: v for k, v in record.items()
+                        if k not in ("name", "category", "pid", "tid", "start", "duration")}
+                self._write({"name": record["name"], "cat": record["category"], "ph": "X",
+                             "ts": record["start"] * 1e6, "dur": record["duration"] * 1e6,
+                             "pid": record["pid"], "tid": record["tid"], "args": args})
+
+
+_writer = _TraceWriter(TRACE_PATH, TRACE_FORMAT) if TRACE_PATH else None
+
+
+# Name of the running script, e.g. data_cleaning
+def process_label():
+    main = sys.modules.get("__main__")
+    path = getattr(main, "__file__", None) or (sys.argv[0] if sys.argv else "")
+    return os.path.splitext(os.path.basename(path))[0] or "python"
+
+
+# ---------------------
+# Profilers
+# ---------------------
+
+_profile_counter = 0
+
+
+def _profile_path(name, extension):
+    global _profile_counter
+    _profile_counter += 1
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    safe = "".join(c if c.isalnum() or c in "._-" else "_" for c in name)
+    return os.path.join(PROFILE_DIR, f"{os.getpid()}-{_profile_counter:04d}-{safe}.{extension}")
+
+
+class _CProfiler:
+    def __init__(self):
+        import cProfile
+
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def stop(self, name):
+        self.profile.disable()
+        path = _profile_path(name, "prof")
+        self.profile.dump_stats(path)
+        return path
+
+
+# Samples the stack of one thread at a fixed interval from a helper thread and
+# counts each distinct stack (root first, ';'-separated)
+class _StackSampler:
+    def __init__(self):
+        self.thread_id = threading.get_ident()
+        self.counts = collections.Counter()
+        self.done = threading.Event()
+        self.sampler = threading.Thread(target=self._run, daemon=True)
+        self.sampler.start()
+
+    def _run(self):
+        interval = PROFILE_INTERVAL_MS / 1000
+        while not self.done.wait(interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def stop(self, name):
+        self.done.set()
+        self.sampler.join()
+        path = _profile_path(name, "folded")
+        with open(path, "w") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+_PROFILERS = {"cprofile": _CProfiler, "sample": _StackSampler}
+
+
+# ---------------------
+# Spans
+# ---------------------
+
+_local = threading.local()
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class Span:
+    def __init__(self, name, category, attrs):
+        self.name = name
+        self.category = category
+        self.attrs = attrs
+
+    # Add attributes, e.g. rows_out once the result is known
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1].name if stack else None
+        self.depth = len(stack)
+        stack.append(self)
+        # Only outermost spans are profiled: profilers do not nest
+        self.profiler = _PROFILERS[PROFILE_MODE]() if PROFILE_MODE and self.depth == 0 else None
+        self.rss_start = rss_mb()
+        self.start = time.time()
+        self.clock = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.clock
+        rss_end = rss_mb()
+        _stack().pop()
+        record = {
+            "name": self.name,
+            "category": self.category,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "start": self.start,
+            "duration": duration,
+            "depth": self.depth,
+            "parent": self.parent,
+            **self.attrs,
+            "rss_start_mb": self.rss_start,
+            "rss_delta_mb": rss_end - self.rss_start,
+            "peak_rss_mb": peak_rss_mb(),
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.profiler is not None:
+            record["profile"] = self.profiler.stop(self.name)
+        if _writer is not None:
+            _writer.write(record)
+        return False
+
+
+# Stand-in returned by span() while instrumentation is off
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, category="pipeline", **attrs):
+    if not ENABLED:
+        return _NULL_SPAN
+    return Span(name, category, attrs)
+
+
+# Decorator recording a span per call, named module.function; rows_in is the
+# length of the first DataFrame/array argument, rows_out that of the result
+def traced(name=None, category="pipeline"):
+    def decorate(func):
+        if not ENABLED:
+            return func
+        module = func.__module__ if func.__module__ != "__main__" else process_label()
+        span_name = name or f"{module}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            rows_in = next((rows for rows in map(row_count, (*args, *kwargs.values())) if rows is not None), None)
+            with Span(span_name, category, {"rows_in": rows_in}) as current:
+                result = func(*args, **kwargs)
+                current.set(rows_out=row_count(result))
+            return result
+
+        return wrapper
+
+    return decorate
+
+
+# ---------------------
+# Summary of a trace file
+# ---------------------
+
+def read_trace(path):
+    with open(path) as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        body = text.strip().lstrip("[").rstrip("]").strip().rstrip(",")
+        events = json.loads(f"[{body}]") if body else []
+        return [{"name": e["name"], "duration": e["dur"] / 1e6, **e.get("args", {})}
+                for e in events if e.get("ph") == "X"]
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a trace written with BANKIQ_TRACE")
+    parser.add_argument("trace", help="JSON lines or Chrome trace file")
+    parser.add_argument("--top", type=int, default=30, help="Spans to show, by total time")
+    args = parser.parse_args()
+
+    totals = {}
+    for record in read_trace(args.trace):
+        total = totals.setdefault(record["name"], {"calls": 0, "time": 0.0, "max": 0.0, "rows_in": 0, "rss": 0.0})
+        total["calls"] += 1
+        total["time"] += record["duration"]
+        total["max"] = max(total["max"], record["duration"])
+        total["rows_in"] += record.get("rows_in") or 0
+        total["rss"] = max(total["rss"], record.get("rss_delta_mb") or 0.0)
+
+    print(f"{'span':<48} {'calls':>7} {'total s':>9} {'max s':>8} {'rows in':>12} {'max +RSS MB':>12}")
+    for span_name, total in sorted(totals.items(), key=lambda item: -item[1]["time"])[:args.top]:
+        print(f"{span_name:<48} {total['calls']:>7,} {total['time']:>9.3f} {total['max']:>8.3f} "
+              f"{total['rows_in']:>12,} {total['rss']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import numpy as np
+
+import features
+import instrumentation
+import storage
+
+# Out-of-core engine. The cleaned transactions, loans, support interactions
+# and products are scanned lazily from their partition files with Polars and
+# aggregated per customer by its streaming engine, which reads the files in
+# batches on all cores (POLARS_MAX_THREADS) and spills to POLARS_TEMP_DIR when
+# the group state outgrows memory. Only the per-customer results are brought
+# into pandas, where they are assembled exactly like feature_engineering() in
+# feature_engineering.py. Polars is an optional dependency, imported when
+# the engine runs.
+
+# Cleaned tables read lazily; customers hold one row per output row and are
+# loaded with pandas
+LAZY_TABLES = {
+    "products": "cleaned_products",
+    "transactions": "cleaned_transactions",
+    "loans": "cleaned_loans",
+    "support_interactions": "cleaned_support_interactions",
+}
+
+
+def _scan(name, stage="cleaned"):
+    import polars as pl
+
+    fmt = storage.find_format(name, stage)
+    files = storage.table_files(name, stage, fmt)
+    if fmt == "parquet":
+        return pl.scan_parquet(files)
+    return pl.scan_csv(files, try_parse_dates=False, infer_schema_length=10_000)
+
+
+# Same tables as load_cleaned_data(), but lazy scans of the big ones
+def scan_cleaned_data():
+    tables = {"customers": storage.read_table("cleaned_customers", "cleaned")}
+    for table, name in LAZY_TABLES.items():
+        tables[table] = _scan(name)
+    print("Cleaned data scanned successfully!")
+    return tables
+
+
+def _collect(query):
+    frame = query.collect(engine="streaming").to_pandas()
+    frame["CustomerID"] = frame["CustomerID"].astype(str)
+    return frame
+
+
+# Rows without a customer are dropped, as pandas groupby does
+def _by_customer(table):
+    import polars as pl
+
+    return table.filter(pl.col("CustomerID").is_not_null()).group_by("CustomerID")
+
+
+def product_features(products):
+    import polars as pl
+
+    product_count = _collect(_by_customer(products).agg(
+        ProductCount=pl.col("ProductType").count().cast(pl.Int64)))
+    active_count = _collect(_by_customer(products.filter(pl.col("ActiveStatus") == "Active")).agg(
+        ActiveProductCount=pl.col("ProductType").count().cast(pl.Int64)))
+
+    product_features = product_count.merge(active_count, on="CustomerID", how="left")
+    product_features["ActiveProductCount"] = product_features["ActiveProductCount"].fillna(0)
+    product_features["ProductEngagementScore"] = np.where(
+        product_features["ProductCount"] > 0,
+        product_features["ActiveProductCount"] / product_features["ProductCount"],
+        0
+    )
+    return product_features
+
+
+def financial_features(transactions):
+    import polars as pl
+
+    return _collect(_by_customer(transactions).agg(
+        AvgTransactionAmount=pl.col("Amount").cast(pl.Float64).fill_nan(None).mean(),
+        TransactionFrequency=pl.col("TransactionID").count().cast(pl.Int64),
+    ))
+
+
+def loan_features(loans):
+    import polars as pl
+
+    # Polars versions of features.emi_ratio and features.high_risk_flag
+    amount = pl.col("Amount").cast(pl.Float64).fill_nan(None)
+    ratio = pl.when(amount.is_null() | (amount == 0)).then(None).otherwise(
+        pl.col("EMI").cast(pl.Float64) / amount)
+    ratio = pl.when(ratio.is_infinite()).then(None).otherwise(ratio).fill_nan(None)
+    high_risk = (pl.col("InterestRate").cast(pl.Float64) > 10).fill_null(False).cast(pl.Int64)
+
+    avg_loan = _collect(_by_customer(loans).agg(
+        AvgLoanAmount=amount.mean(),
+        AvgEMItoIncomeRatio=ratio.mean(),
+        HighRiskLoan=high_risk.max(),
+    ))
+    avg_loan["LoanBurdenScore"] = avg_loan["AvgLoanAmount"] * avg_loan["AvgEMItoIncomeRatio"]
+    return avg_loan
+
+
+def engagement_features(support_interactions):
+    import polars as pl
+
+    return _collect(_by_customer(support_interactions).agg(
+        SupportFrequency=pl.col("InteractionID").count().cast(pl.Int64)))
+
+
+@instrumentation.traced()
+def lazy_feature_engineering(customers, products, transactions, loans, support_interactions):
+    customers = customers.copy()
+    print("Generating customer profile features...")
+    features.add_profile_features(customers)
+
+    print("Generating product features...")
+    product_block = product_features(products)
+    print("Generating financial features...")
+    financial_block = financial_features(transactions)
+    print("Generating loan features...")
+    loan_block = loan_features(loans)
+    print("Generating engagement features...")
+    engagement_block = engagement_features(support_interactions)
+
+    print("Merging all features...")
+    return features.assemble(customers, product_block, financial_block, loan_block, engagement_block)
@@ -0,0 +1,189 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import aggregation
+import instrumentation
+import storage
+
+# Amortization of the loans table with array arithmetic. Every loan is a
+# fixed-rate annuity: InterestRate is the yearly rate in percent, compounded
+# monthly, and one instalment is paid per whole month since StartDate. For
+# each loan, as of a date:
+#   AnnuityEMI        instalment repaying Amount over TermYears * 12 months
+#   PaymentsMade      instalments due so far (capped at the term)
+#   MonthsRemaining   instalments still to pay
+#   RemainingBalance  principal still owed after PaymentsMade instalments
+# Closed loans owe nothing. Per customer the loans sum up to the debt
+# features; EMItoIncomeRatio relates the instalments to the monthly income
+# (Income / 12), unlike AvgEMItoIncomeRatio of the model features, which is
+# EMI / Amount.
+#
+# Balances use the closed form B_k = P * ((1+r)^n - (1+r)^k) / ((1+r)^n - 1),
+# with the powers taken as expm1(k * log1p(r)) so small rates keep their
+# precision. No per-loan Python: the whole table is a handful of ufunc passes.
+
+MONTHS_PER_YEAR = 12
+CLOSED_STATUSES = ["Closed"]
+
+LOAN_COLUMNS = ["CustomerID", "LoanID", "Amount", "InterestRate", "TermYears", "StartDate", "Status"]
+
+
+# Monthly rate of a yearly percentage
+def monthly_rate(annual_rate_pct):
+    return np.asarray(annual_rate_pct, dtype=float) / (100 * MONTHS_PER_YEAR)
+
+
+# Level monthly instalment repaying principal over term_months months
+# (principal / term_months without interest; NaN for empty terms)
+def annuity_emi(principal, annual_rate_pct, term_months):
+    principal = np.asarray(principal, dtype=float)
+    rate = monthly_rate(annual_rate_pct)
+    term_months = np.asarray(term_months, dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # 1 - (1+r)^-n
+        discount = -np.expm1(-term_months * np.log1p(rate))
+        emi = np.where(rate > 0, principal * rate / discount, principal / term_months)
+    return np.where(term_months > 0, emi, np.nan)
+
+
+# Days since the epoch of a datetime column (NaT: the smallest int64)
+def epoch_days(dates):
+    values = pd.to_datetime(dates).to_numpy()
+    unit, _ = np.datetime_data(values.dtype)
+    days = values.view(np.int64) // int(np.timedelta64(1, "D") / np.timedelta64(1, unit))
+    return np.where(np.isnat(values), np.iinfo(np.int64).min, days)
+
+
+# Whole months from each start day (days since the epoch) to the as-of day,
+# negative before the start. Calendar conversions of datetime64 are slow per
+# element, so month number and day of month are looked up in tables over the
+# span of distinct days instead.
+def months_between(start_days, as_of_day):
+    start_days = np.asarray(start_days, dtype=np.int64)
+    as_of = int(np.datetime64(as_of_day, "D").astype(np.int64))
+    if len(start_days) == 0:
+        return np.zeros(0, dtype=np.int64)
+    # The calendar covers the starts and the as-of day, whichever comes first
+    first = min(int(start_days.min()), as_of)
+    calendar = np.arange(first, max(int(start_days.max()), as_of) + 1).astype("datetime64[D]")
+    month = calendar.astype("datetime64[M]")
+    month_number = month.astype(np.int64)
+    day_of_month = (calendar - month.astype("datetime64[D]")).astype(np.int64)
+
+    offsets = start_days - first
+    months = month_number[as_of - first] - np.take(month_number, offsets)
+    # A month only counts once its day of the month is reached
+    return months - (day_of_month[as_of - first] < np.take(day_of_month, offsets))
+
+
+# Principal still owed after payments_made instalments
+def remaining_balance(principal, annual_rate_pct, term_months, payments_made):
+    principal = np.asarray(principal, dtype=float)
+    rate = monthly_rate(annual_rate_pct)
+    term_months = np.asarray(term_months, dtype=float)
+    paid = np.clip(np.asarray(payments_made, dtype=float), 0, term_months)
+    log_growth = np.log1p(rate)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        growth_term = np.expm1(term_months * log_growth)
+        balance = np.where(
+            rate > 0,
+            principal * (growth_term - np.expm1(paid * log_growth)) / growth_term,
+            principal * (term_months - paid) / term_months,
+        )
+    return np.where(term_months > 0, balance, np.nan)
+
+
+# Amortization state of every loan as of a date: arrays of AnnuityEMI,
+# PaymentsMade, MonthsRemaining and RemainingBalance in loan order
+def amortize(loans, as_of):
+    term_months = loans["TermYears"].to_numpy(dtype=float, na_value=np.nan) * MONTHS_PER_YEAR
+    amount = loans["Amount"].to_numpy(dtype=float, na_value=np.nan)
+    rate = loans["InterestRate"].to_numpy(dtype=float, na_value=np.nan)
+    start = epoch_days(loans["StartDate"])
+    started = start != np.iinfo(np.int64).min
+
+    open_loan = ~loans["Status"].isin(CLOSED_STATUSES).to_numpy(dtype=bool)
+    whole_term = np.nan_to_num(term_months)
+    # Loans without a start date are taken as not yet started
+    elapsed = np.zeros(len(loans), dtype=np.int64)
+    elapsed[started] = months_between(start[started], as_of)
+    payments_made = np.clip(elapsed, 0, whole_term).astype(np.int32)
+    return {
+        "AnnuityEMI": annuity_emi(amount, rate, term_months),
+        "PaymentsMade": payments_made,
+        "MonthsRemaining": np.where(open_loan, whole_term - payments_made, 0).astype(np.int32),
+        "RemainingBalance": np.where(open_loan, remaining_balance(amount, rate, term_months, payments_made), 0.0),
+    }
+
+
+# Per-loan amortization table (LoanID, CustomerID and the amortize() columns)
+@instrumentation.traced()
+def loan_schedule(loans, as_of):
+    return pd.DataFrame({
+        "LoanID": loans["LoanID"].array,
+        "CustomerID": loans["CustomerID"].array,
+        **amortize(loans, as_of),
+    })
+
+
+# Debt features of every customer as of a date, one row per customer:
+# OpenLoans, MonthlyDebtPayment (instalments of the loans still running),
+# EMItoIncomeRatio, OutstandingDebt, DebtToIncomeRatio and AvgMonthsRemaining
+# (over the running loans). Customers without income get NaN ratios.
+@instrumentation.traced()
+def customer_debt_features(customers, loans, as_of):
+    lookup = aggregation.CustomerLookup(customers["CustomerID"])
+    num_customers = len(lookup)
+    codes = lookup.codes(loans["CustomerID"])
+    schedule = amortize(loans, as_of)
+
+    running = schedule["MonthsRemaining"] > 0
+    emi = np.where(running, np.nan_to_num(schedule["AnnuityEMI"]), 0.0)
+    open_loans = aggregation.group_sum(codes, num_customers, running)
+    monthly_payment = aggregation.group_sum(codes, num_customers, emi)
+    outstanding = aggregation.group_sum(codes, num_customers, np.nan_to_num(schedule["RemainingBalance"]))
+    months_remaining = aggregation.group_sum(codes, num_customers, schedule["MonthsRemaining"])
+
+    income = customers["Income"].to_numpy(dtype=float, na_value=np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        emi_to_income = np.where(income > 0, monthly_payment / (income / MONTHS_PER_YEAR), np.nan)
+        debt_to_income = np.where(income > 0, outstanding / income, np.nan)
+        avg_months_remaining = np.where(open_loans > 0, months_remaining / np.maximum(open_loans, 1), 0.0)
+
+    return pd.DataFrame({
+        "CustomerID": customers["CustomerID"].array,
+        "OpenLoans": open_loans.astype(np.int32),
+        "MonthlyDebtPayment": monthly_payment,
+        "EMItoIncomeRatio": emi_to_income,
+        "OutstandingDebt": outstanding,
+        "DebtToIncomeRatio": debt_to_income,
+        "AvgMonthsRemaining": avg_months_remaining,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Annuity EMI, remaining balances and debt features as of a date")
+    parser.add_argument("--as-of", default=None, help="Valuation date, YYYY-MM-DD (default: today)")
+    parser.add_argument("--output", default="customer_debt_features", help="Name of the processed output table")
+    parser.add_argument("--schedule", default=None,
+                        help="Also write the per-loan amortization state to this processed table")
+    args = parser.parse_args()
+
+    as_of = np.datetime64(args.as_of or "today", "D")
+    customers = storage.read_table("cleaned_customers", "cleaned", columns=["CustomerID", "Income"], compact=True)
+    loans = storage.read_table("cleaned_loans", "cleaned", columns=LOAN_COLUMNS, compact=True)
+
+    start = time.perf_counter()
+    result = customer_debt_features(customers, loans, as_of)
+    print(f"{len(loans):,} loans of {len(customers):,} customers as of {as_of} "
+          f"in {time.perf_counter() - start:.2f}s")
+    storage.write_table(result, args.output, "processed")
+    if args.schedule:
+        storage.write_table(loan_schedule(loans, as_of), args.schedule, "processed")
+
+
+if __name__ == "__main__":
+    main()
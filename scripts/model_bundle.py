@@ -0,0 +1,158 @@
+import datetime
+import hashlib
+import json
+import os
+
+import instrumentation
+
+# Versioned model bundles. Each training run writes
+#   <MODEL_DIR>/<version>/model.ubj     XGBoost booster, native binary format
+#   <MODEL_DIR>/<version>/bundle.json   feature list, target, scale_pos_weight,
+#                                       expected_value and training metadata
+# and, once every artifact of the version is written (promote()), points
+# <MODEL_DIR>/LATEST at it. Serving code loads a
+# bundle instead of training, so starting the app is a file read. With the
+# flat engine the booster (and xgboost, slow to import) is only loaded when
+# something needs it, e.g. SHAP contributions or a large batch.
+
+# Root folder of the bundles; override with BANKIQ_MODEL_DIR
+MODEL_DIR = os.environ.get("BANKIQ_MODEL_DIR", "models")
+
+# Probability above which a customer is flagged high risk (notebooks 03/04)
+DEFAULT_THRESHOLD = 0.3
+
+# Scoring engine: "xgboost" (the booster) or "flat", the flattened trees of
+# tree_inference.py for low per-call latency; override with
+# BANKIQ_INFERENCE_ENGINE
+INFERENCE_ENGINE = os.environ.get("BANKIQ_INFERENCE_ENGINE", "xgboost")
+INFERENCE_ENGINES = ["xgboost", "flat"]
+# Larger batches go to the booster, which spreads them over every core
+FLAT_MAX_ROWS = 1024
+
+MODEL_FILE = "model.ubj"
+METADATA_FILE = "bundle.json"
+LATEST_FILE = "LATEST"
+
+
+class ModelBundle:
+    def __init__(self, booster, metadata, forest=None):
+        # None until first used when the bundle is opened with the flat engine
+        self._booster = booster
+        # Flattened trees (tree_inference.FlatForest), None with the xgboost engine
+        self.forest = forest
+        self.metadata = metadata
+        self.version = metadata["version"]
+        self.features = list(metadata["features"])
+        self.target = metadata["target"]
+        self.scale_pos_weight = metadata["scale_pos_weight"]
+        # Log-odds the SHAP contributions of a row add up from
+        self.expected_value = metadata["expected_value"]
+        self.threshold = metadata.get("threshold", DEFAULT_THRESHOLD)
+
+    @property
+    def booster(self):
+        if self._booster is None:
+            self._booster = load_booster(self.version, self.features)
+        return self._booster
+
+    # Probability of the positive class for each row of X
+    @instrumentation.traced(category="model")
+    def predict_proba(self, X):
+        # Selecting columns costs more than scoring one row with the flat
+        # engine, so frames already in model order are passed as they are
+        if list(X.columns) != self.features:
+            X = X[self.features]
+        return self.predict_rows(X)
+
+    # Same for a 2-D array (or DataFrame) of the features in bundle order
+    def predict_rows(self, rows):
+        if self.forest is not None and len(rows) <= FLAT_MAX_ROWS:
+            return self.forest.predict_proba(rows)
+        return self.booster.inplace_predict(rows)
+
+    # 0/1 high-risk decision for each probability
+    def decide(self, probabilities, threshold=None):
+        threshold = self.threshold if threshold is None else threshold
+        return (probabilities > threshold).astype("int8")
+
+    # Exact per-feature SHAP values (tree path algorithm) of each row of X;
+    # the bias column is dropped since it equals expected_value
+    @instrumentation.traced(category="model")
+    def contributions(self, X):
+        import xgboost as xgb
+
+        matrix = xgb.DMatrix(X[self.features], feature_names=self.features)
+        return self.booster.predict(matrix, pred_contribs=True)[:, :-1]
+
+
+def bundle_dir(version):
+    return os.path.join(MODEL_DIR, version)
+
+
+def latest_version():
+    path = os.path.join(MODEL_DIR, LATEST_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No model bundle in {MODEL_DIR}; run scripts/03_train_model.py first")
+    with open(path) as f:
+        return f.read().strip()
+
+
+# Write a trained booster and its metadata as a new version. Serving code
+# does not see it until it is promoted.
+def save_bundle(booster, features, target, scale_pos_weight, expected_value, **extra):
+    model_bytes = bytes(booster.save_raw(raw_format="ubj"))
+    trained_at = datetime.datetime.now(datetime.timezone.utc)
+    version = f"{trained_at:%Y%m%d-%H%M%S}-{hashlib.sha256(model_bytes).hexdigest()[:8]}"
+
+    directory = bundle_dir(version)
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, MODEL_FILE), "wb") as f:
+        f.write(model_bytes)
+    metadata = {
+        "version": version,
+        "trained_at": trained_at.isoformat(),
+        "features": list(features),
+        "target": target,
+        "scale_pos_weight": float(scale_pos_weight),
+        "expected_value": float(expected_value),
+        **extra,
+    }
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump(metadata, f, indent=2)
+    print(f"Model bundle saved to {directory}")
+    return version
+
+
+# Point LATEST at a version. Call it only once the bundle is complete
+# (explanations, drift baselines), since serving code loads LATEST.
+def promote(version):
+    latest = os.path.join(MODEL_DIR, LATEST_FILE)
+    with open(latest + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(latest + ".tmp", latest)
+    print(f"Model bundle {version} is now the latest")
+
+
+def load_booster(version, features):
+    import xgboost as xgb
+
+    booster = xgb.Booster()
+    booster.load_model(os.path.join(bundle_dir(version), MODEL_FILE))
+    booster.feature_names = list(features)
+    return booster
+
+
+def load_bundle(version=None, engine=None):
+    engine = engine or INFERENCE_ENGINE
+    if engine not in INFERENCE_ENGINES:
+        raise ValueError(f"Unknown inference engine {engine!r}; expected one of {INFERENCE_ENGINES}")
+
+    version = version or latest_version()
+    directory = bundle_dir(version)
+    with open(os.path.join(directory, METADATA_FILE)) as f:
+        metadata = json.load(f)
+    if engine == "flat":
+        import tree_inference
+
+        return ModelBundle(None, metadata, tree_inference.load_forest(version))
+    return ModelBundle(load_booster(version, metadata["features"]), metadata)
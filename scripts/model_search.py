@@ -0,0 +1,260 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import precision_recall_curve, precision_score, recall_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+import model_bundle
+import train_model as training
+
+# Hyper-parameter search with k-fold CV for the two models of notebooks 03/04.
+# Random candidates go through successive halving: every rung scores the
+# surviving candidates by cross-validation on a growing stratified sample of
+# the training split and keeps the best 1/eta of them, so most candidates are
+# only ever fit on a small fraction of the rows. Each (candidate, fold) fit
+# is one trial on a process pool, with XGBoost threads split between the
+# workers. The winner's decision threshold is picked from its out-of-fold
+# predictions to meet a recall target, then it is refit and checked on a
+# held-out test split.
+
+MODELS = ["logistic", "xgboost"]
+DEFAULT_CANDIDATES = 27
+DEFAULT_ETA = 3
+DEFAULT_FOLDS = 5
+DEFAULT_RECALL = 0.8
+# Smallest rung sample, in positive rows per fold
+MIN_POSITIVES_PER_FOLD = 20
+# XGBoost trees are capped here and cut short by early stopping
+MAX_TREES = 2000
+EARLY_STOPPING_ROUNDS = 30
+# Share of each training fold held back to early-stop on
+EARLY_STOPPING_SHARE = 0.1
+
+
+# ---------------------
+# Search spaces
+# ---------------------
+
+def log_uniform(rng, low, high):
+    return float(math.exp(rng.uniform(math.log(low), math.log(high))))
+
+
+def sample_params(model, rng):
+    if model == "logistic":
+        return {"C": log_uniform(rng, 1e-3, 1e2)}
+    return {
+        "max_depth": int(rng.integers(2, 9)),
+        "learning_rate": log_uniform(rng, 0.01, 0.3),
+        "subsample": float(rng.uniform(0.6, 1.0)),
+        "colsample_bytree": float(rng.uniform(0.6, 1.0)),
+        "min_child_weight": log_uniform(rng, 1, 20),
+        "reg_lambda": log_uniform(rng, 0.1, 10),
+    }
+
+
+# ---------------------
+# Trials (run in worker processes)
+# ---------------------
+
+_DATA = {}
+
+
+def _init_worker(X, y):
+    _DATA["X"], _DATA["y"] = X, y
+
+
+def build_model(model, params, y_train, threads, n_estimators=MAX_TREES, early_stopping=True):
+    if model == "logistic":
+        return make_pipeline(StandardScaler(),
+                             LogisticRegression(max_iter=1000, class_weight="balanced", **params))
+    from xgboost import XGBClassifier
+
+    scale_pos_weight = (y_train == 0).sum() / max((y_train == 1).sum(), 1)
+    return XGBClassifier(n_estimators=n_estimators, scale_pos_weight=scale_pos_weight,
+                         eval_metric="logloss", tree_method="hist", n_jobs=threads,
+                         early_stopping_rounds=EARLY_STOPPING_ROUNDS if early_stopping else None,
+                         **params)
+
+
+def fit(model, params, X, y, threads, seed):
+    estimator = build_model(model, params, y, threads)
+    if model == "logistic":
+        estimator.fit(X, y)
+        return estimator, None
+    fit_rows, stop_rows = train_test_split(np.arange(len(y)), test_size=EARLY_STOPPING_SHARE,
+                                           stratify=y, random_state=seed)
+    estimator.fit(X[fit_rows], y[fit_rows], eval_set=[(X[stop_rows], y[stop_rows])], verbose=False)
+    return estimator, int(estimator.best_iteration) + 1
+
+
+# One fold of one candidate: fit on train_rows, score on valid_rows
+def run_trial(trial):
+    start = time.perf_counter()
+    X, y = _DATA["X"], _DATA["y"]
+    train_rows, valid_rows = trial["train_rows"], trial["valid_rows"]
+    estimator, trees = fit(trial["model"], trial["params"], X[train_rows], y[train_rows],
+                           trial["threads"], trial["seed"])
+    probabilities = estimator.predict_proba(X[valid_rows])[:, 1]
+    return {
+        "candidate": trial["candidate"],
+        "fold": trial["fold"],
+        "score": float(roc_auc_score(y[valid_rows], probabilities)),
+        "trees": trees,
+        "valid_rows": valid_rows,
+        "probabilities": probabilities,
+        "wall_time": time.perf_counter() - start,
+    }
+
+
+# ---------------------
+# Successive halving
+# ---------------------
+
+# Fraction of the training rows used at each rung, ending with all of them
+def rung_fractions(num_candidates, eta, y, folds):
+    num_rungs = max(1, int(math.floor(math.log(num_candidates, eta) + 1e-9)) + 1)
+    smallest = min(1.0, MIN_POSITIVES_PER_FOLD * folds / max(int((y == 1).sum()), 1))
+    return [max(smallest, eta ** (rung - num_rungs + 1)) for rung in range(num_rungs)]
+
+
+def stratified_sample(rows, y, fraction, seed):
+    if fraction >= 1:
+        return rows
+    sample, _ = train_test_split(rows, train_size=fraction, stratify=y[rows], random_state=seed)
+    return np.sort(sample)
+
+
+def search_model(pool, model, X, y, train_rows, args, threads, log):
+    rng = np.random.default_rng([args.seed, MODELS.index(model)])
+    # Logistic regression has a single parameter, so fewer candidates suffice
+    num_candidates = args.candidates if model == "xgboost" else max(args.eta, args.candidates // args.eta)
+    candidates = {i: sample_params(model, rng) for i in range(num_candidates)}
+
+    fractions = rung_fractions(num_candidates, args.eta, y[train_rows], args.folds)
+    results = {}
+    for rung, fraction in enumerate(fractions):
+        rows = stratified_sample(train_rows, y, fraction, args.seed + rung)
+        folds = list(StratifiedKFold(args.folds, shuffle=True, random_state=args.seed).split(rows, y[rows]))
+        trials = [{"model": model, "params": params, "candidate": candidate, "fold": fold,
+                   "train_rows": rows[fit_idx], "valid_rows": rows[valid_idx],
+                   "threads": threads, "seed": args.seed + fold}
+                  for candidate, params in candidates.items()
+                  for fold, (fit_idx, valid_idx) in enumerate(folds)]
+
+        start = time.perf_counter()
+        results = {}
+        for result in pool.map(run_trial, trials):
+            results.setdefault(result["candidate"], []).append(result)
+            log.append({"model": model, "rung": rung, "fraction": fraction, "rows": len(rows),
+                        "candidate": result["candidate"], "params": candidates[result["candidate"]],
+                        "fold": result["fold"], "score": result["score"], "trees": result["trees"],
+                        "wall_time": result["wall_time"]})
+        scores = {c: float(np.mean([r["score"] for r in rs])) for c, rs in results.items()}
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        print(f"  {model} rung {rung}: {len(candidates)} candidates on {len(rows):,} rows, "
+              f"best ROC AUC {scores[ranked[0]]:.4f} ({time.perf_counter() - start:.1f}s)")
+
+        if rung < len(fractions) - 1:
+            keep = max(1, len(candidates) // args.eta)
+            candidates = {c: candidates[c] for c in ranked[:keep]}
+
+    best = ranked[0]
+    best_results = results[best]
+    trees = [r["trees"] for r in best_results if r["trees"] is not None]
+    return {
+        "model": model,
+        "params": candidates[best],
+        "cv_roc_auc": float(np.mean([r["score"] for r in best_results])),
+        "trees": int(np.median(trees)) if trees else None,
+        # Out-of-fold predictions of the winner on the full training split
+        "oof_rows": np.concatenate([r["valid_rows"] for r in best_results]),
+        "oof_probabilities": np.concatenate([r["probabilities"] for r in best_results]),
+    }
+
+
+# Highest threshold whose recall still meets the target (best precision)
+def threshold_for_recall(y_true, probabilities, target_recall):
+    precision, recall, thresholds = precision_recall_curve(y_true, probabilities)
+    meets = np.flatnonzero(recall[:-1] >= target_recall)
+    if len(meets) == 0:
+        return float(thresholds[0])
+    # precision_recall_curve predicts positive for probability >= threshold;
+    # decisions use >, so step just below the chosen threshold
+    return float(np.nextafter(thresholds[meets[-1]], -np.inf))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validated hyper-parameter search for the loan risk models")
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=MODELS)
+    parser.add_argument("--candidates", type=int, default=DEFAULT_CANDIDATES, help="Random candidates per model")
+    parser.add_argument("--eta", type=int, default=DEFAULT_ETA, help="Successive halving: keep 1/eta per rung")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS)
+    parser.add_argument("--recall", type=float, default=DEFAULT_RECALL, help="Recall target for the threshold")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--save-bundle", action="store_true",
+                        help="Save the tuned XGBoost model, with its threshold, as the latest model bundle")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count() or 1
+    # Split the cores between the workers so XGBoost never oversubscribes them
+    threads = max(1, (os.cpu_count() or 1) // workers)
+
+    X_df, y_series = training.load_training_data()
+    X, y = X_df.to_numpy(dtype=float), y_series.to_numpy(dtype=int)
+    train_rows, test_rows = train_test_split(np.arange(len(y)), test_size=0.2, stratify=y, random_state=args.seed)
+
+    start = time.perf_counter()
+    log, summary, winners = [], {}, {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(X, y)) as pool:
+        for model in args.models:
+            print(f"Searching {model} ({workers} workers x {threads} threads)...")
+            winner = search_model(pool, model, X, y, train_rows, args, threads, log)
+            threshold = threshold_for_recall(y[winner["oof_rows"]], winner["oof_probabilities"], args.recall)
+
+            # Refit the winner on the whole training split and check it on the test split
+            estimator = build_model(model, winner["params"], y[train_rows], os.cpu_count() or 1,
+                                    n_estimators=winner["trees"] or MAX_TREES, early_stopping=False)
+            estimator.fit(X[train_rows], y[train_rows])
+            probabilities = estimator.predict_proba(X[test_rows])[:, 1]
+            decisions = (probabilities > threshold).astype(int)
+            summary[model] = {
+                "params": winner["params"],
+                "trees": winner["trees"],
+                "cv_roc_auc": winner["cv_roc_auc"],
+                "threshold": threshold,
+                "test_roc_auc": float(roc_auc_score(y[test_rows], probabilities)),
+                "test_recall": float(recall_score(y[test_rows], decisions, zero_division=0)),
+                "test_precision": float(precision_score(y[test_rows], decisions, zero_division=0)),
+            }
+            winners[model] = estimator
+            print(f"  {model}: CV ROC AUC {winner['cv_roc_auc']:.4f}, threshold {threshold:.3f}, "
+                  f"test ROC AUC {summary[model]['test_roc_auc']:.4f}, "
+                  f"recall {summary[model]['test_recall']:.2f}, precision {summary[model]['test_precision']:.2f}")
+    elapsed = time.perf_counter() - start
+
+    os.makedirs(model_bundle.MODEL_DIR, exist_ok=True)
+    path = os.path.join(model_bundle.MODEL_DIR, f"search-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(path, "w") as f:
+        json.dump({"args": vars(args), "workers": workers, "threads_per_worker": threads,
+                   "wall_time": elapsed, "summary": summary, "trials": log}, f, indent=2)
+    print(f"{len(log)} trials in {elapsed:.1f}s; results saved to {path}")
+
+    if args.save_bundle and "xgboost" in winners:
+        estimator = winners["xgboost"]
+        training.publish(estimator.get_booster(), estimator.get_params()["scale_pos_weight"],
+                         X_df.iloc[train_rows], y_series.iloc[train_rows],
+                         threshold=summary["xgboost"]["threshold"], params=summary["xgboost"]["params"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import drift_monitor
+import model_bundle
+import storage
+
+# End-to-end pipeline runner. Every stage is one of the pipeline scripts run
+# as a subprocess, declared with the tables and files it reads and writes.
+# A stage is skipped when the fingerprint of its inputs (the content of the
+# input tables, the source of the script and of every local module it
+# imports, and its arguments) matches the last successful run and its outputs
+# are still the ones that run wrote. Stages whose inputs are ready run
+# concurrently, e.g. the six table cleaning jobs.
+# File hashes are cached by (size, mtime), so an unchanged rerun only stats
+# the files.
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = "pipeline_state.json"
+
+RAW_TABLES = ["customers", "products", "transactions", "loans", "campaign_responses", "support_interactions"]
+FEATURE_TABLES = ["customers", "products", "transactions", "loans", "support_interactions"]
+
+
+# ---------------------
+# Artifacts
+# ---------------------
+
+# A stored table: its files in the format the next stage reads
+def table(name, stage):
+    return ("table", name, stage)
+
+
+# A file or a folder of files
+def path(location):
+    return ("path", location)
+
+
+def artifact_files(artifact):
+    if artifact[0] == "table":
+        name, stage = artifact[1], artifact[2]
+        if not storage.table_exists(name, stage):
+            return []
+        return storage.table_files(name, stage, storage.find_format(name, stage))
+    location = artifact[1]
+    if os.path.isdir(location):
+        return sorted(os.path.join(root, name) for root, _, names in os.walk(location) for name in names)
+    return [location] if os.path.exists(location) else []
+
+
+def artifact_label(artifact):
+    return f"{artifact[2]}/{artifact[1]}" if artifact[0] == "table" else artifact[1]
+
+
+# ---------------------
+# Stages
+# ---------------------
+
+class Stage:
+    def __init__(self, name, script, args=(), inputs=(), outputs=(), after=(), check_outputs=True):
+        self.name = name
+        self.script = script
+        self.args = list(args)
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        # Stages that must finish first besides the producers of the inputs
+        self.after = list(after)
+        # Outputs edited by hand (e.g. generated raw data) are not checked
+        self.check_outputs = check_outputs
+
+    def command(self):
+        return [sys.executable, os.path.join(SCRIPTS_DIR, self.script)] + self.args
+
+
+def build_stages(engine="pandas", generate=None):
+    stages = []
+    if generate is not None:
+        generation_args = ["--scale", str(generate["scale"]), "--seed", str(generate["seed"])]
+        if generate.get("as_of"):
+            generation_args += ["--as-of", generate["as_of"]]
+        stages.append(Stage("generate_customers", "data_generation.py", generation_args,
+                            outputs=[table("customers", "raw"), table("products", "raw")], check_outputs=False))
+        stages.append(Stage("generate_activity", "01_data_generation.py", generation_args,
+                            outputs=[table(name, "raw") for name in RAW_TABLES[2:]],
+                            after=["generate_customers"], check_outputs=False))
+
+    for name in RAW_TABLES:
+        stages.append(Stage(f"clean_{name}", "data_cleaning.py", ["--table", name],
+                            inputs=[table(name, "raw")], outputs=[table(f"cleaned_{name}", "cleaned")]))
+
+    stages.append(Stage("features", "02_feature_engineering.py", ["--engine", engine],
+                        inputs=[table(f"cleaned_{name}", "cleaned") for name in FEATURE_TABLES],
+                        outputs=[table("enhanced_customers", "processed")]))
+    # Today's data against the bundle in service, before training replaces it
+    stages.append(Stage("monitor", "drift_monitor.py",
+                        inputs=[table(name, "raw") for name in RAW_TABLES] + [table("enhanced_customers", "processed")],
+                        outputs=[path(os.path.join(storage.stage_dir("processed"), drift_monitor.REPORT_FILE))],
+                        check_outputs=False))
+    latest = path(os.path.join(model_bundle.MODEL_DIR, model_bundle.LATEST_FILE))
+    stages.append(Stage("train", "03_train_model.py",
+                        inputs=[table("enhanced_customers", "processed")], outputs=[latest], after=["monitor"]))
+    stages.append(Stage("score", "04_score_customers.py",
+                        inputs=[table("enhanced_customers", "processed"), latest],
+                        outputs=[table("loan_risk_scores", "processed")]))
+    if storage.DEFAULT_FORMAT == "parquet":
+        import customer_index
+
+        stages.append(Stage("index", "customer_index.py",
+                            inputs=[table("enhanced_customers", "processed")],
+                            outputs=[path(customer_index.index_dir())]))
+    return stages
+
+
+# Stages in dependency order: producers of a stage's inputs (and its explicit
+# "after" stages) come before it
+def dependencies(stages):
+    producers = {}
+    for stage in stages:
+        for artifact in stage.outputs:
+            producers[artifact] = stage.name
+    return {stage.name: sorted({producers[a] for a in stage.inputs if a in producers} | set(stage.after))
+            for stage in stages}
+
+
+# A stage and everything it depends on
+def upstream(names, depends_on):
+    selected, pending = set(), list(names)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(depends_on[name])
+    return selected
+
+
+# ---------------------
+# Fingerprints
+# ---------------------
+
+# Local modules a script imports, followed recursively
+def local_sources(script, seen=None):
+    seen = seen if seen is not None else set()
+    source = os.path.join(SCRIPTS_DIR, script)
+    if script in seen or not os.path.exists(source):
+        return seen
+    seen.add(script)
+    with open(source) as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        modules = []
+        if isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules = [node.module]
+        elif (isinstance(node, ast.Call) and getattr(node.func, "attr", None) == "import_module"
+              and node.args and isinstance(node.args[0], ast.Constant)):
+            modules = [node.args[0].value]
+        for module in modules:
+            local_sources(f"{module.split('.')[0]}.py", seen)
+    return seen
+
+
+class Fingerprinter:
+    def __init__(self, file_cache):
+        # path -> [size, mtime_ns, sha256]
+        self.file_cache = file_cache
+
+    def file_hash(self, location):
+        stat = os.stat(location)
+        cached = self.file_cache.get(location)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+        digest = hashlib.sha256()
+        with open(location, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        self.file_cache[location] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        return digest.hexdigest()
+
+    # Hash of each artifact's files (None when it has no files)
+    def artifacts(self, artifacts):
+        hashes = {}
+        for artifact in artifacts:
+            files = artifact_files(artifact)
+            if not files:
+                hashes[artifact_label(artifact)] = None
+                continue
+            digest = hashlib.sha256()
+            for location in files:
+                digest.update(os.path.basename(location).encode())
+                digest.update(self.file_hash(location).encode())
+            hashes[artifact_label(artifact)] = digest.hexdigest()
+        return hashes
+
+    def inputs(self, stage):
+        code = {script: self.file_hash(os.path.join(SCRIPTS_DIR, script))
+                for script in sorted(local_sources(stage.script))}
+        fingerprint = {
+            "code": code,
+            "args": stage.args,
+            "inputs": self.artifacts(stage.inputs),
+            "environment": {"format": storage.DEFAULT_FORMAT},
+        }
+        return hashlib.sha256(json.dumps(fingerprint, sort_keys=True).encode()).hexdigest()
+
+
+# ---------------------
+# Persisted state
+# ---------------------
+
+def state_path():
+    return os.path.join(storage.DATA_DIR, STATE_FILE)
+
+
+def load_state():
+    if not os.path.exists(state_path()):
+        return {"stages": {}, "files": {}}
+    with open(state_path()) as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(storage.DATA_DIR, exist_ok=True)
+    with open(state_path() + ".tmp", "w") as f:
+        json.dump(state, f, indent=1)
+    os.replace(state_path() + ".tmp", state_path())
+
+
+# ---------------------
+# Runner
+# ---------------------
+
+def run_stage(stage):
+    start = time.perf_counter()
+    result = subprocess.run(stage.command(), capture_output=True, text=True)
+    return result, time.perf_counter() - start
+
+
+def is_current(stage, key, fingerprints, state):
+    recorded = state["stages"].get(stage.name)
+    if recorded is None or recorded["key"] != key:
+        return False
+    outputs = fingerprints.artifacts(stage.outputs)
+    if any(value is None for value in outputs.values()):
+        return False
+    return not stage.check_outputs or recorded["outputs"] == outputs
+
+
+# force: names of the stages to run even if they are current (their upstream
+# stages still only run when stale)
+def run_pipeline(stages, workers=None, force=(), dry_run=False, verbose=False):
+    state = load_state()
+    fingerprints = Fingerprinter(state["files"])
+    depends_on = dependencies(stages)
+    by_name = {stage.name: stage for stage in stages}
+    summary = {}
+    pending = [stage.name for stage in stages]
+    running = {}
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        while pending or running:
+            for name in list(pending):
+                waiting_on = [d for d in depends_on[name] if d in by_name and d not in summary]
+                if waiting_on:
+                    continue
+                pending.remove(name)
+                stage = by_name[name]
+                if any(summary.get(d, {}).get("status") in ("failed", "blocked") for d in depends_on[name]):
+                    summary[name] = {"status": "blocked", "seconds": 0.0}
+                    continue
+                # A dry run cannot tell whether a stale stage would change its
+                # outputs, so everything downstream of one is reported stale
+                upstream_stale = any(summary[d]["status"] == "stale" for d in depends_on[name] if d in summary)
+                key = fingerprints.inputs(stage)
+                if name not in force and not upstream_stale and is_current(stage, key, fingerprints, state):
+                    summary[name] = {"status": "cached", "seconds": 0.0}
+                    continue
+                if dry_run:
+                    summary[name] = {"status": "stale", "seconds": 0.0}
+                    continue
+                print(f"Running {name}...")
+                running[pool.submit(run_stage, stage)] = (stage, key)
+
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, key = running.pop(future)
+                result, seconds = future.result()
+                if verbose or result.returncode:
+                    print(result.stdout + result.stderr, end="")
+                if result.returncode:
+                    summary[stage.name] = {"status": "failed", "seconds": seconds}
+                    print(f"{stage.name} failed (exit code {result.returncode})")
+                    continue
+                summary[stage.name] = {"status": "ran", "seconds": seconds}
+                state["stages"][stage.name] = {"key": key, "outputs": fingerprints.artifacts(stage.outputs),
+                                               "seconds": seconds, "finished": time.time()}
+                save_state(state)
+                print(f"{stage.name} done in {seconds:.1f}s")
+
+    elapsed = time.perf_counter() - start
+    if not dry_run:
+        # Forget the hashes of files that no longer exist
+        state["files"] = {location: entry for location, entry in state["files"].items() if os.path.exists(location)}
+        save_state(state)
+    return summary, elapsed
+
+
+def print_summary(stages, summary, elapsed):
+    print(f"\n{'stage':<30} {'status':<8} {'seconds':>8}")
+    for stage in stages:
+        if stage.name in summary:
+            entry = summary[stage.name]
+            print(f"{stage.name:<30} {entry['status']:<8} {entry['seconds']:>8.1f}")
+    busy = sum(entry["seconds"] for entry in summary.values())
+    print(f"{'total':<30} {'':<8} {elapsed:>8.1f}  (stage time {busy:.1f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the pipeline stages whose inputs changed")
+    parser.add_argument("stages", nargs="*", help="Stages to bring up to date, with their upstream stages (default: all)")
+    parser.add_argument("--engine", default="pandas", help="Feature engineering engine (see feature_engineering.py)")
+    parser.add_argument("--workers", type=int, default=None, help="Stages run at once (default: all cores)")
+    parser.add_argument("--force", action="store_true",
+                        help="Run the named stages (default: all) even if they are current; their upstream "
+                             "stages still only run when stale")
+    parser.add_argument("--dry-run", action="store_true", help="Only report which stages are stale")
+    parser.add_argument("--verbose", action="store_true", help="Print the output of every stage")
+    parser.add_argument("--generate", action="store_true",
+                        help="Also (re)generate the raw data when the generation code or options change")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", default=None)
+    parser.add_argument("--list", action="store_true", help="List the stages and their dependencies")
+    args = parser.parse_args()
+
+    generate = {"scale": args.scale, "seed": args.seed, "as_of": args.as_of} if args.generate else None
+    stages = build_stages(args.engine, generate)
+    depends_on = dependencies(stages)
+    if args.list:
+        for stage in stages:
+            print(f"{stage.name:<30} after: {', '.join(depends_on[stage.name]) or '-'}")
+        return
+
+    unknown = [name for name in args.stages if name not in depends_on]
+    if unknown:
+        parser.error(f"Unknown stage(s): {', '.join(unknown)}")
+    if args.stages:
+        selected = upstream(args.stages, depends_on)
+        stages = [stage for stage in stages if stage.name in selected]
+    force = set(args.stages or depends_on) if args.force else set()
+
+    summary, elapsed = run_pipeline(stages, args.workers, force, args.dry_run, args.verbose)
+    print_summary(stages, summary, elapsed)
+    if any(entry["status"] in ("failed", "blocked") for entry in summary.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Compact in-memory types for every table. Pipeline scripts load tables
+# through storage.read_table(..., compact=True), which applies the schema
+# below:
+#   "uuid"          36-character UUID text as 16-byte fixed-width binary
+#   "category"      enumerations as pandas categories
+#   int / float     downcast numbers (int8, int16, int32, float32)
+# Every conversion is lossless: a column whose values do not fit (missing
+# values in an integer column, out-of-range numbers, malformed UUIDs) keeps
+# its type. UUIDs go back to text when a table is written, so the files
+# and every reader of them are unchanged.
+# Amounts in cents and other fractional values stay float64: float32 only
+# keeps about 7 significant digits.
+
+UUID = "uuid"
+CATEGORY = "category"
+
+_CUSTOMER_COLUMNS = {
+    "CustomerID": UUID,
+    "Age": "int8",
+    "Gender": CATEGORY,
+    "Income": "int32",
+    "CreditScore": "int16",
+    "RiskProfile": CATEGORY,
+    "RelationshipLength": "int8",
+    "MaritalStatus": CATEGORY,
+}
+
+TABLES = {
+    "customers": _CUSTOMER_COLUMNS,
+    "products": {
+        "CustomerID": UUID,
+        "ProductType": CATEGORY,
+        "ActiveStatus": CATEGORY,
+        # Whole currency units, so float32 holds them exactly
+        "CreditLimit": "float32",
+    },
+    "transactions": {
+        "TransactionID": UUID,
+        "CustomerID": UUID,
+        "TransactionType": CATEGORY,
+        "Category": CATEGORY,
+        "Channel": CATEGORY,
+    },
+    "loans": {
+        "LoanID": UUID,
+        "CustomerID": UUID,
+        "LoanType": CATEGORY,
+        "Amount": "int32",
+        "TermYears": "int8",
+        "Status": CATEGORY,
+    },
+    "campaign_responses": {
+        "CustomerID": UUID,
+        "CampaignID": UUID,
+        "Channel": CATEGORY,
+        "Response": CATEGORY,
+    },
+    "support_interactions": {
+        "InteractionID": UUID,
+        "CustomerID": UUID,
+        "InteractionType": CATEGORY,
+        "IssueType": CATEGORY,
+        "ResolutionStatus": CATEGORY,
+        "NPSScore": "int8",
+        "NPSBucket": CATEGORY,
+    },
+    "enhanced_customers": {
+        **_CUSTOMER_COLUMNS,
+        "AgeGroup": CATEGORY,
+        "IncomeBracket": CATEGORY,
+        "RiskScore": CATEGORY,
+        "ProductCount": "int8",
+        "ActiveProductCount": "int8",
+        "TransactionFrequency": "int32",
+        "HighRiskLoan": "int8",
+        "SupportFrequency": "int32",
+    },
+}
+
+# Prefixes and suffixes of derived tables that share a schema
+_TABLE_PREFIXES = ["cleaned_"]
+_TABLE_SUFFIXES = ["_changes"]
+
+# Hex digits of a UUID sit in these [start, end) spans of its 36-character
+# text, with dashes in between
+_UUID_SPANS = [(0, 8), (9, 13), (14, 18), (19, 23), (24, 36)]
+_UUID_DASH_COLUMNS = [8, 13, 18, 23]
+
+
+# Column types of a table (an empty dict for tables without a schema)
+def table_schema(name):
+    for prefix in _TABLE_PREFIXES:
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    for suffix in _TABLE_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return TABLES.get(name, {})
+
+
+# ---------------------
+# UUIDs
+# ---------------------
+
+def uuid_dtype():
+    import pyarrow as pa
+
+    return pd.ArrowDtype(pa.binary(16))
+
+
+def is_uuid_column(series):
+    return isinstance(series.dtype, pd.ArrowDtype) and series.dtype == uuid_dtype()
+
+
+# (n, 36) byte matrix of the canonical text of 16-byte UUIDs
+def uuid_text(raw):
+    raw = np.asarray(raw, dtype=np.uint8)
+    digits = np.frombuffer(raw.tobytes().hex().encode(), dtype=np.uint8).reshape(-1, 32)
+    text = np.full((len(digits), 36), ord("-"), dtype=np.uint8)
+    position = 0
+    for start, end in _UUID_SPANS:
+        text[:, start:end] = digits[:, position:position + end - start]
+        position += end - start
+    return text
+
+
+# Arrow string array of UUID text as 16-byte binary, or None unless every
+# non-missing value is a lowercase canonical UUID (so decoding gives back the
+# same text)
+def encode_uuid_array(array):
+    import pyarrow as pa
+
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    if not pa.types.is_string(array.type) and not pa.types.is_large_string(array.type):
+        return None
+
+    filled = array.fill_null("00000000-0000-0000-0000-000000000000") if array.null_count else array
+    offset_type = np.int64 if pa.types.is_large_string(filled.type) else np.int32
+    offsets = np.frombuffer(filled.buffers()[1], dtype=offset_type)[filled.offset:filled.offset + len(filled) + 1]
+    if len(filled) and not (np.diff(offsets) == 36).all():
+        return None
+    text = np.frombuffer(filled.buffers()[2], dtype=np.uint8)[offsets[0]:offsets[-1]].reshape(-1, 36)
+    if not (text[:, _UUID_DASH_COLUMNS] == ord("-")).all():
+        return None
+
+    # Decode the hex digits in one go, then check they encode back to the
+    # same text (lowercase, no stray characters)
+    digits = np.concatenate([text[:, start:end] for start, end in _UUID_SPANS], axis=1).tobytes()
+    try:
+        raw = bytes.fromhex(digits.decode("ascii"))
+    except (UnicodeDecodeError, ValueError):
+        return None
+    if raw.hex().encode() != digits:
+        return None
+
+    validity = array.is_valid().buffers()[1] if array.null_count else None
+    return pa.FixedSizeBinaryArray.from_buffers(pa.binary(16), len(text), [validity, pa.py_buffer(raw)],
+                                                null_count=array.null_count)
+
+
+# UUID text column as 16-byte binary, or None (see encode_uuid_array)
+def encode_uuids(series):
+    import pyarrow as pa
+
+    if not (pd.api.types.is_string_dtype(series.dtype) or series.dtype == object):
+        return None
+    try:
+        binary = encode_uuid_array(pa.array(series, from_pandas=True))
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None
+    if binary is None:
+        return None
+    return pd.Series(pd.arrays.ArrowExtensionArray(binary), index=series.index, name=series.name)
+
+
+# Arrow table or record batch with the UUID columns of its schema as 16-byte
+# binary, so the text keys are never converted to pandas (used by readers
+# batch by batch)
+def encode_arrow_uuids(data, name):
+    for col, dtype in table_schema(name).items():
+        if dtype != UUID or col not in data.column_names:
+            continue
+        binary = encode_uuid_array(data.column(col))
+        if binary is not None:
+            data = data.set_column(data.schema.get_field_index(col), col, binary)
+    return data
+
+
+# (n, 2) uint64 view of the bytes of a 16-byte binary UUID column without
+# missing values
+def uuid_words(series):
+    import pyarrow as pa
+
+    array = pa.array(series)
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    raw = np.frombuffer(array.buffers()[1], dtype=np.uint8)[array.offset * 16:(array.offset + len(array)) * 16]
+    return raw.view(np.uint64).reshape(-1, 2)
+
+
+# 16-byte binary UUID column back to canonical text
+def decode_uuids(series):
+    import pyarrow as pa
+
+    array = pa.array(series)
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks()
+    raw = np.frombuffer(array.buffers()[1], dtype=np.uint8)[array.offset * 16:(array.offset + len(array)) * 16]
+    text = uuid_text(raw)
+    offset_type = pa.int64() if len(text) * 36 >= 2 ** 31 else pa.int32()
+    offsets = pa.array(np.arange(0, (len(text) + 1) * 36, 36), type=offset_type)
+    string_type = pa.large_string() if offset_type == pa.int64() else pa.string()
+    validity = array.is_valid().buffers()[1] if array.null_count else None
+    strings = pa.Array.from_buffers(string_type, len(text), [validity, offsets.buffers()[1], pa.py_buffer(text)],
+                                    null_count=array.null_count)
+    restored = pa.chunked_array([strings]).to_pandas()
+    restored.index, restored.name = series.index, series.name
+    return restored
+
+
+# ---------------------
+# Numbers
+# ---------------------
+
+# Lossless cast of a numeric column to a smaller integer or float type, or
+# None when some value would change
+def downcast(series, dtype):
+    dtype = np.dtype(dtype)
+    if not pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+        return None
+    if series.dtype == dtype:
+        return series
+    values = series.to_numpy(dtype=float, na_value=np.nan)
+
+    if dtype.kind in "iu":
+        info = np.iinfo(dtype)
+        if len(values) and (np.isnan(values).any() or (values != np.round(values)).any()
+                            or values.min() < info.min or values.max() > info.max):
+            return None
+        return series.astype(dtype)
+
+    cast = values.astype(dtype)
+    same = (cast.astype(float) == values) | (np.isnan(cast) & np.isnan(values))
+    return series.astype(dtype) if same.all() else None
+
+
+# ---------------------
+# Tables
+# ---------------------
+
+# Table with the compact types of its schema. Labels become categories only
+# when categorical is true (code that edits labels reads them as plain text).
+def compact(df, name, categorical=True):
+    df = df.copy(deep=False)
+    for col, dtype in table_schema(name).items():
+        if col not in df.columns:
+            continue
+        series = df[col]
+        if dtype == UUID:
+            converted = series if is_uuid_column(series) else encode_uuids(series)
+        elif dtype == CATEGORY:
+            if not categorical or isinstance(series.dtype, pd.CategoricalDtype):
+                continue
+            converted = series.astype("category")
+        else:
+            converted = downcast(series, dtype)
+        if converted is not None:
+            df[col] = converted
+    return df
+
+
+# Table with UUID columns back as text, for writing or for code that needs
+# the text keys
+def restore(df):
+    uuid_columns = [col for col in df.columns if is_uuid_column(df[col])]
+    if not uuid_columns:
+        return df
+    df = df.copy(deep=False)
+    for col in uuid_columns:
+        df[col] = decode_uuids(df[col])
+    return df
+
+
+# ---------------------
+# Memory report
+# ---------------------
+
+def _megabytes(size):
+    return f"{size / 2 ** 20:,.1f} MB"
+
+
+# Table as a default load gives it: labels as text, 64-bit numbers
+def _plain(df):
+    df = df.copy(deep=False)
+    for col in df.columns:
+        if pd.api.types.is_bool_dtype(df[col].dtype):
+            continue
+        if pd.api.types.is_integer_dtype(df[col].dtype):
+            df[col] = df[col].astype(np.int64)
+        elif pd.api.types.is_float_dtype(df[col].dtype):
+            df[col] = df[col].astype(np.float64)
+    return df
+
+
+# In-memory bytes of each stored table before (plain labels, default types)
+# and after the compact schema
+def memory_report(tables):
+    import storage
+
+    rows = []
+    for name, stage in tables:
+        if not storage.table_exists(name, stage):
+            continue
+        before = _plain(storage.read_table(name, stage, categorical=False))
+        after = compact(before, name)
+        rows.append({
+            "table": name,
+            "stage": stage,
+            "rows": len(before),
+            "before": int(before.memory_usage(deep=True).sum()),
+            "after": int(after.memory_usage(deep=True).sum()),
+        })
+    return pd.DataFrame(rows, columns=["table", "stage", "rows", "before", "after"])
+
+
+def main():
+    import storage
+
+    parser = argparse.ArgumentParser(description="Report the in-memory size of every table with and without the compact schema")
+    parser.add_argument("--stage", action="append", choices=list(storage.STAGE_DIRS),
+                        help="Stage to report (repeatable; default: all)")
+    args = parser.parse_args()
+
+    stages = args.stage or list(storage.STAGE_DIRS)
+    names = {
+        "raw": [name for name in TABLES if name != "enhanced_customers"],
+        "cleaned": [f"cleaned_{name}" for name in TABLES if name != "enhanced_customers"],
+        "processed": ["enhanced_customers"],
+    }
+    report = memory_report([(name, stage) for stage in stages for name in names[stage]])
+    if report.empty:
+        print("No tables found")
+        return
+
+    print(f"{'table':<38} {'rows':>12} {'before':>12} {'after':>12} {'saved':>7}")
+    for row in report.itertuples():
+        saved = 1 - row.after / row.before if row.before else 0
+        print(f"{row.stage + '/' + row.table:<38} {row.rows:>12,} {_megabytes(row.before):>12} "
+              f"{_megabytes(row.after):>12} {saved:>7.0%}")
+    total_before, total_after = report["before"].sum(), report["after"].sum()
+    print(f"{'total':<38} {report['rows'].sum():>12,} {_megabytes(total_before):>12} "
+          f"{_megabytes(total_after):>12} {1 - total_after / total_before:>7.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import model_bundle
+import storage
+
+# Load generator for scoring_service.py: many concurrent keep-alive
+# connections post single-customer requests as fast as they are answered,
+# then client-side and server-side latency and throughput are reported.
+
+
+# Request bodies built from real enhanced customers, or random values when
+# the processed table is not available
+def sample_bodies(features, count, seed=0):
+    try:
+        df = storage.read_table("enhanced_customers", "processed", columns=features)
+        rows = df.sample(count, replace=True, random_state=seed).to_numpy(dtype=float)
+    except FileNotFoundError:
+        rows = np.random.default_rng(seed).uniform(0, 1000, size=(count, len(features)))
+    return [json.dumps(dict(zip(features, row))).encode() for row in rows]
+
+
+async def request(reader, writer, host, method, path, body=b""):
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    )
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n")[1:]:
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    return status, await reader.readexactly(length)
+
+
+async def worker(host, port, bodies, deadline, latencies, failures):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, host, "POST", "/score", bodies[i % len(bodies)])
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                failures.append(status)
+            i += 1
+    finally:
+        writer.close()
+
+
+async def fetch_json(host, port, path):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, body = await request(reader, writer, host, "GET", path)
+        return json.loads(body)
+    finally:
+        writer.close()
+
+
+async def wait_until_up(host, port, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            return await fetch_json(host, port, "/health")
+        except OSError:
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def run(args):
+    health = await wait_until_up(args.host, args.port)
+    bundle_features = model_bundle.load_bundle(health["model_version"]).features
+    bodies = sample_bodies(bundle_features, 10_000)
+
+    latencies, failures = [], []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*[worker(args.host, args.port, bodies, deadline, latencies, failures)
+                           for _ in range(args.concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array(latencies) * 1000
+    print(f"{len(latencies):,} requests from {args.concurrency} connections in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed:,.0f} requests/s, {len(failures)} failed)")
+    print(f"client latency p50 {np.percentile(latencies, 50):.2f} ms, p99 {np.percentile(latencies, 99):.2f} ms")
+
+    metrics = await fetch_json(args.host, args.port, "/metrics")
+    print(f"server latency p50 {metrics['latency_p50_ms']:.2f} ms, p99 {metrics['latency_p99_ms']:.2f} ms, "
+          f"mean batch {metrics['mean_batch_size']:.1f}, throughput {metrics['throughput_rps']:,.0f} requests/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the online scoring service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--concurrency", type=int, default=64, help="Concurrent connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of load")
+    parser.add_argument("--spawn", action="store_true", help="Start a local scoring service for the test")
+    parser.add_argument("--window-ms", type=float, default=None, help="Batching window of the spawned service")
+    parser.add_argument("--engine", choices=model_bundle.INFERENCE_ENGINES, default=None,
+                        help="Scoring engine of the spawned service")
+    args = parser.parse_args()
+
+    service = None
+    if args.spawn:
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "scoring_service.py"),
+                   "--host", args.host, "--port", str(args.port)]
+        if args.window_ms is not None:
+            command += ["--window-ms", str(args.window_ms)]
+        if args.engine is not None:
+            command += ["--engine", args.engine]
+        service = subprocess.Popen(command)
+    try:
+        asyncio.run(run(args))
+    finally:
+        if service is not None:
+            service.terminate()
+            service.wait()
+
+
+if __name__ == "__main__":
+    main()
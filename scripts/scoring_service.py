@@ -0,0 +1,236 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+import model_bundle
+
+# Online scoring over HTTP. The model bundle is loaded once; concurrent
+# requests are queued and scored together in micro-batches, so one booster
+# call serves every request that arrived within the batching window. The
+# prediction runs on a worker thread, so the event loop keeps reading
+# requests (and filling the next batch) while a batch is scored.
+#
+#   POST /score    {"LoanBurdenScore": ..., "AvgLoanAmount": ..., ...}
+#                  -> {"probability": ..., "decision": 0/1, "model_version": ...}
+#   GET  /metrics  latency percentiles, throughput and batch sizes
+#   GET  /health
+
+DEFAULT_WINDOW_MS = 2.0
+DEFAULT_MAX_BATCH = 512
+# Latencies kept for the percentiles, and the span throughput is measured over
+LATENCY_SAMPLES = 100_000
+THROUGHPUT_WINDOW_S = 10.0
+
+MAX_BODY_BYTES = 64 * 1024
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large",
+                500: "Internal Server Error"}
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.completed = deque()
+        self.requests = 0
+        self.errors = 0
+        self.batches = 0
+
+    def record_batch(self, latencies):
+        now = time.perf_counter()
+        self.batches += 1
+        self.requests += len(latencies)
+        self.latencies.extend(latencies)
+        self.completed.append((now, len(latencies)))
+        while self.completed and self.completed[0][0] < now - THROUGHPUT_WINDOW_S:
+            self.completed.popleft()
+
+    def snapshot(self):
+        now = time.perf_counter()
+        latencies = np.array(self.latencies) * 1000
+        p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (0.0, 0.0)
+        span = min(THROUGHPUT_WINDOW_S, now - self.started)
+        recent = sum(n for t, n in self.completed if t >= now - THROUGHPUT_WINDOW_S)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "batches": self.batches,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "latency_p50_ms": float(p50),
+            "latency_p99_ms": float(p99),
+            "throughput_rps": recent / span if span > 0 else 0.0,
+            "uptime_s": now - self.started,
+        }
+
+
+# Collects queued requests for up to window seconds (or max_batch requests)
+# and scores them with a single prediction call
+class MicroBatcher:
+    def __init__(self, bundle, window, max_batch, metrics):
+        self.bundle = bundle
+        self.window = window
+        self.max_batch = max_batch
+        self.metrics = metrics
+        self.queue = asyncio.Queue()
+
+    async def score(self, row):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((row, future, time.perf_counter()))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            await self.score_batch(batch)
+
+    async def score_batch(self, batch):
+        rows = np.array([row for row, _, _ in batch], dtype=np.float32)
+        try:
+            probabilities = await asyncio.get_running_loop().run_in_executor(None, self.bundle.predict_rows, rows)
+        except Exception as error:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(error)
+            self.metrics.errors += len(batch)
+            return
+        decisions = self.bundle.decide(probabilities)
+
+        now = time.perf_counter()
+        for (_, future, queued), probability, decision in zip(batch, probabilities, decisions):
+            if not future.done():
+                future.set_result({
+                    "probability": float(probability),
+                    "decision": int(decision),
+                    "model_version": self.bundle.version,
+                })
+        self.metrics.record_batch([now - queued for _, _, queued in batch])
+
+
+class ScoringService:
+    def __init__(self, bundle, window=DEFAULT_WINDOW_MS / 1000, max_batch=DEFAULT_MAX_BATCH):
+        self.bundle = bundle
+        self.metrics = Metrics()
+        self.batcher = MicroBatcher(bundle, window, max_batch, self.metrics)
+
+    # Feature vector of a request body, in the model's feature order
+    def parse_row(self, body):
+        payload = json.loads(body)
+        missing = [f for f in self.bundle.features if f not in payload]
+        if missing:
+            raise ValueError(f"Missing features: {', '.join(missing)}")
+        return [float(payload[f]) for f in self.bundle.features]
+
+    async def route(self, method, path, body):
+        if method == "POST" and path == "/score":
+            try:
+                row = self.parse_row(body)
+            except (ValueError, TypeError) as error:
+                self.metrics.errors += 1
+                return 400, {"error": str(error)}
+            try:
+                return 200, await self.batcher.score(row)
+            except Exception as error:
+                return 500, {"error": str(error)}
+        if method == "GET" and path == "/metrics":
+            return 200, self.metrics.snapshot()
+        if method == "GET" and path == "/health":
+            return 200, {"status": "ok", "model_version": self.bundle.version}
+        return 404, {"error": f"No route for {method} {path}"}
+
+    # Minimal HTTP/1.1 with keep-alive: one request at a time per connection
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                headers = dict(line.split(":", 1) for line in lines[1:] if ":" in line)
+                headers = {k.strip().lower(): v.strip() for k, v in headers.items()}
+                try:
+                    method, path, _ = lines[0].split(" ", 2)
+                except ValueError:
+                    method, path = None, None
+                try:
+                    length = int(headers.get("content-length", 0))
+                except ValueError:
+                    length = -1
+
+                # The body of a bad request is not read, so the connection
+                # cannot be reused
+                if method is None:
+                    status, payload = 400, {"error": "Malformed request"}
+                    headers["connection"] = "close"
+                elif length < 0:
+                    status, payload = 400, {"error": "Invalid Content-Length"}
+                    headers["connection"] = "close"
+                elif length > MAX_BODY_BYTES:
+                    status, payload = 413, {"error": "Request body too large"}
+                    headers["connection"] = "close"
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    status, payload = await self.route(method, path, body)
+
+                data = json.dumps(payload).encode()
+                close = headers.get("connection", "").lower() == "close"
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                    f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        batcher = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"Scoring model {self.bundle.version} on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the loan risk model over HTTP with micro-batching")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--version", default=None, help="Model bundle version (default: latest)")
+    parser.add_argument("--window-ms", type=float, default=DEFAULT_WINDOW_MS,
+                        help="How long a micro-batch waits for more requests")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="Largest micro-batch")
+    parser.add_argument("--engine", choices=model_bundle.INFERENCE_ENGINES, default=None,
+                        help="Scoring engine (default: BANKIQ_INFERENCE_ENGINE or xgboost)")
+    args = parser.parse_args()
+
+    bundle = model_bundle.load_bundle(args.version, args.engine)
+    service = ScoringService(bundle, args.window_ms / 1000, args.max_batch)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import math
+
+import numpy as np
+
+# Default compactor size; the sketch keeps O(k log(n/k)) values and answers
+# rank queries within roughly 1.7 / k of the exact rank
+DEFAULT_K = 200
+
+
+# Mergeable approximate quantile sketch (KLL). Values are added in bulk with
+# update(), sketches built on separate batches combine with merge(), and the
+# whole state round-trips through to_dict()/from_dict() as plain JSON.
+class QuantileSketch:
+    def __init__(self, k=DEFAULT_K):
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        # Alternating compaction offset keeps the sketch deterministic
+        self._offset = 0
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2 / 3) ** depth)))
+
+    # Halve any level over capacity by promoting every other sorted value
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            values = self.levels[level]
+            if len(values) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                values = np.sort(values)
+                keep = values[: len(values) % 2]
+                paired = values[len(values) % 2:]
+                promoted = paired[self._offset::2]
+                self._offset ^= 1
+                self.levels[level] = keep
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                # Capacities shrink as the sketch grows, so start over from the bottom
+                level = 0
+                continue
+            level += 1
+
+    # Add a batch of values (NaNs are ignored)
+    def update(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.count += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    # Fold another sketch into this one
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, values in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], values])
+        self.count += other.count
+        self._compress()
+        return self
+
+    # Stored values with their weights, sorted by value
+    def weighted_values(self):
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(v), 2 ** level, dtype=float)
+                                  for level, v in enumerate(self.levels)])
+        order = np.argsort(values, kind="stable")
+        return values[order], weights[order]
+
+    # Approximate value at quantile q (0..1); NaN for an empty sketch
+    def quantile(self, q):
+        return float(self.quantiles([q])[0])
+
+    def quantiles(self, qs):
+        qs = np.asarray(qs, dtype=float)
+        if self.count == 0:
+            return np.full(qs.shape, np.nan)
+        values, weights = self.weighted_values()
+        cumulative = np.cumsum(weights)
+        positions = np.searchsorted(cumulative, qs * cumulative[-1], side="left")
+        return values[np.minimum(positions, len(values) - 1)]
+
+    # Approximate fraction of values <= x
+    def cdf(self, xs):
+        xs = np.asarray(xs, dtype=float)
+        if self.count == 0:
+            return np.full(xs.shape, np.nan)
+        values, weights = self.weighted_values()
+        cumulative = np.concatenate([[0.0], np.cumsum(weights)])
+        return cumulative[np.searchsorted(values, xs, side="right")] / cumulative[-1]
+
+    def median(self):
+        return self.quantile(0.5)
+
+    def to_dict(self):
+        return {
+            "k": self.k,
+            "count": self.count,
+            "offset": self._offset,
+            "levels": [v.tolist() for v in self.levels],
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        sketch = cls(k=state["k"])
+        sketch.count = state["count"]
+        sketch._offset = state.get("offset", 0)
+        sketch.levels = [np.asarray(v, dtype=float) for v in state["levels"]] or [np.empty(0)]
+        return sketch
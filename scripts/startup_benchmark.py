@@ -0,0 +1,139 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import model_bundle
+
+# Cold-start benchmark. Each scenario runs in fresh interpreters under
+# python -X importtime; its start-up time (wall time over a bare interpreter)
+# must stay within a budget, and heavy libraries it has no use for must not
+# be imported at all. The import log names the modules that cost the most.
+# Exits with status 1 when a scenario is over budget or imports a banned
+# module, so it can gate changes to the import graph.
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Libraries that take from a tenth of a second to seconds to import
+HEAVY_MODULES = ["pandas", "pyarrow", "xgboost", "sklearn", "shap", "matplotlib", "faker", "polars", "numba",
+                 "streamlit"]
+
+# name: (code, budget in seconds, modules it must not import, needs a bundle)
+SCENARIOS = {
+    # Online scoring: the service and the flat trees, no data stack
+    "scoring": (
+        "import scoring_service, tree_inference",
+        0.4, HEAVY_MODULES, False,
+    ),
+    # Open the latest bundle with the flat engine and score one row
+    "first_score": (
+        "import numpy as np, model_bundle\n"
+        "bundle = model_bundle.load_bundle(engine='flat')\n"
+        "bundle.predict_rows(np.zeros((1, len(bundle.features)), dtype=np.float32))",
+        1.5, [m for m in HEAVY_MODULES if m != "numba"], True,
+    ),
+    # Pipeline modules imported as libraries: data stack only, no models
+    "pipeline_modules": (
+        "import storage, generator, data_cleaning, features, aggregation, feature_engineering, train_model, "
+        "window_features, loan_math, drift_monitor, pipeline",
+        1.5, ["xgboost", "sklearn", "shap", "matplotlib", "faker", "polars", "numba", "streamlit"], False,
+    ),
+}
+
+
+# Wall seconds of one interpreter running code, and its import log as
+# (self us, cumulative us, depth, module) entries
+def run_once(code):
+    start = time.perf_counter()
+    # Scripts import each other by name; the working directory is kept so
+    # relative data and model folders resolve as for the caller
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [SCRIPTS_DIR, os.environ.get("PYTHONPATH")])))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                            capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"Scenario failed:\n{result.stderr[-2000:]}")
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        imports.append((int(own), int(cumulative), (len(name) - len(name.lstrip())) // 2, name.strip()))
+    return elapsed, imports
+
+
+# Median start-up seconds over runs (after a warm-up run that fills the OS
+# file cache and any on-disk caches) and the import log of the last run
+def measure(code, runs, baseline=0.0):
+    run_once(code)
+    times = []
+    for _ in range(runs):
+        elapsed, imports = run_once(code)
+        times.append(elapsed - baseline)
+    return statistics.median(times), imports
+
+
+def banned_imports(imports, banned):
+    loaded = {name.split(".")[0] for _, _, _, name in imports}
+    return sorted(loaded & set(banned))
+
+
+# Costliest modules imported by the scenario's own code: the top-level
+# entries of the import log (depth 0) by cumulative time, leaving out those
+# every interpreter imports at start-up
+def heaviest(imports, startup_modules, count=5):
+    top = sorted((entry for entry in imports if entry[2] == 0 and entry[3] not in startup_modules),
+                 key=lambda entry: -entry[1])
+    return [(name, cumulative / 1e6) for _, cumulative, _, name in top[:count]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check cold-start time and imports against budgets")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), default=None,
+                        help="Scenario to run (repeatable; default: all)")
+    parser.add_argument("--runs", type=int, default=5, help="Timed runs per scenario")
+    parser.add_argument("--budget-scale", type=float, default=1.0,
+                        help="Multiply every budget, e.g. on slower machines")
+    parser.add_argument("--output", default=None, help="Also write the results as JSON to this path")
+    args = parser.parse_args()
+
+    baseline, startup_imports = measure("pass", args.runs)
+    startup_modules = {name for _, _, _, name in startup_imports}
+    print(f"Bare interpreter: {baseline * 1000:.0f} ms (subtracted)\n")
+
+    results, failed = [], False
+    for name in args.scenario or list(SCENARIOS):
+        code, budget, banned, needs_bundle = SCENARIOS[name]
+        budget *= args.budget_scale
+        if needs_bundle:
+            try:
+                model_bundle.latest_version()
+            except FileNotFoundError:
+                print(f"{name:<18} skipped (no model bundle in {model_bundle.MODEL_DIR})\n")
+                continue
+        seconds, imports = measure(code, args.runs, baseline)
+        banned_found = banned_imports(imports, banned)
+        ok = seconds <= budget and not banned_found
+        failed |= not ok
+        status = "ok" if ok else "OVER BUDGET" if seconds > budget else "BANNED IMPORTS"
+        print(f"{name:<18} {seconds * 1000:7.0f} ms  (budget {budget * 1000:.0f} ms)  {status}")
+        if banned_found:
+            print(f"{'':<18} imports {', '.join(banned_found)}")
+        for module, cumulative in heaviest(imports, startup_modules):
+            print(f"{'':<18} {cumulative * 1000:7.1f} ms  {module}")
+        print()
+        results.append({"scenario": name, "seconds": seconds, "budget": budget,
+                        "banned_imports": banned_found, "ok": ok})
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"baseline_seconds": baseline, "results": results}, f, indent=2)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
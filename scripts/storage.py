@@ -0,0 +1,343 @@
+import glob
+import os
+
+import pandas as pd
+
+import instrumentation
+import schema
+
+# Root folder for every stage; override with BANKIQ_DATA_DIR
+DATA_DIR = os.environ.get("BANKIQ_DATA_DIR", "data")
+
+# Sub-folder of each pipeline stage
+STAGE_DIRS = {
+    "raw": "",
+    "cleaned": "cleaned",
+    "processed": "processed",
+}
+
+# Default on-disk format; override with BANKIQ_STORAGE_FORMAT=csv
+DEFAULT_FORMAT = os.environ.get("BANKIQ_STORAGE_FORMAT", "parquet")
+
+FORMATS = ["parquet", "csv"]
+
+# Repeated labels stored dictionary-encoded (pandas category)
+CATEGORICAL_COLUMNS = [
+    "Gender", "RiskProfile", "MaritalStatus",
+    "ProductType", "ActiveStatus",
+    "TransactionType", "Category", "Channel",
+    "LoanType", "Status",
+    "Response",
+    "InteractionType", "IssueType", "ResolutionStatus",
+    "AgeGroup", "IncomeBracket", "RiskScore", "NPSBucket",
+]
+
+# Columns stored as typed dates instead of YYYY-MM-DD text
+DATE_COLUMNS = ["Date", "OpenDate", "StartDate", "EndDate"]
+
+# Rows per Parquet row group: small enough that point lookups (see
+# customer_index.py) decode little, large enough for fast scans
+ROW_GROUP_SIZE = 128 * 1024
+
+# Filter operators understood by read_table, e.g. [("HighRiskLoan", "not null")]
+FILTER_OPERATORS = ["==", "!=", "<", "<=", ">", ">=", "in", "not in", "is null", "not null"]
+
+
+# Folder holding the tables of a stage
+def stage_dir(stage):
+    if stage not in STAGE_DIRS:
+        raise ValueError(f"Unknown stage: {stage}")
+    return os.path.join(DATA_DIR, STAGE_DIRS[stage])
+
+
+# Path of the single-file form of a table
+def table_path(name, stage="raw", fmt=None):
+    fmt = fmt or DEFAULT_FORMAT
+    return os.path.join(stage_dir(stage), f"{name}.{fmt}")
+
+
+# Files making up a table in a given format: the main file plus any
+# part files in a folder of the same name (written by streaming jobs)
+def table_files(name, stage="raw", fmt=None):
+    fmt = fmt or DEFAULT_FORMAT
+    path = table_path(name, stage, fmt)
+    files = [path] if os.path.exists(path) else []
+    files += sorted(glob.glob(os.path.join(stage_dir(stage), name, f"part-*.{fmt}")))
+    return files
+
+
+# Format a table is stored in, preferring the default format
+def find_format(name, stage="raw"):
+    for fmt in [DEFAULT_FORMAT] + [f for f in FORMATS if f != DEFAULT_FORMAT]:
+        if table_files(name, stage, fmt):
+            return fmt
+    raise FileNotFoundError(f"No {stage} table named {name!r} in {stage_dir(stage)}")
+
+
+def table_exists(name, stage="raw"):
+    try:
+        find_format(name, stage)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+# Give known columns their storage types: categories for labels, dates for dates
+def apply_storage_types(df):
+    df = df.copy()
+    for col in df.columns:
+        if col in CATEGORICAL_COLUMNS and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+        elif col in DATE_COLUMNS and not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = pd.to_datetime(df[col], format="%Y-%m-%d")
+    return df
+
+
+# Write a whole table, replacing whatever was stored before
+@instrumentation.traced(category="io")
+def write_table(df, name, stage="raw", fmt=None):
+    fmt = fmt or DEFAULT_FORMAT
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    os.makedirs(stage_dir(stage), exist_ok=True)
+    remove_table(name, stage, fmt)
+
+    path = table_path(name, stage, fmt)
+    # Compact in-memory keys are stored as text (see schema.py)
+    df = schema.restore(df)
+    if fmt == "parquet":
+        df = apply_storage_types(df)
+        df.to_parquet(path, index=False, engine="pyarrow", row_group_size=ROW_GROUP_SIZE)
+    else:
+        df.to_csv(path, index=False)
+    print(f"Data saved to {path}")
+    return path
+
+
+# Export a stored table as CSV (for spreadsheets and other tools)
+def export_csv(name, stage="raw", path=None):
+    df = read_table(name, stage)
+    path = path or table_path(name, stage, "csv")
+    df.to_csv(path, index=False)
+    print(f"Data exported to {path}")
+    return path
+
+
+# Translate [(column, op, value)] filters into a pyarrow dataset expression
+def _arrow_expression(filters):
+    import pyarrow.dataset as ds
+
+    expression = None
+    for flt in filters:
+        col, op = flt[0], flt[1]
+        value = flt[2] if len(flt) > 2 else None
+        field = ds.field(col)
+        if op == "==":
+            term = field == value
+        elif op == "!=":
+            term = field != value
+        elif op == "<":
+            term = field < value
+        elif op == "<=":
+            term = field <= value
+        elif op == ">":
+            term = field > value
+        elif op == ">=":
+            term = field >= value
+        elif op == "in":
+            term = field.isin(list(value))
+        elif op == "not in":
+            term = ~field.isin(list(value))
+        elif op == "is null":
+            term = field.is_null()
+        elif op == "not null":
+            term = field.is_valid()
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        expression = term if expression is None else expression & term
+    return expression
+
+
+# Same filters applied to a pandas DataFrame (CSV has no pushdown)
+def _pandas_mask(df, filters):
+    mask = pd.Series(True, index=df.index)
+    for flt in filters:
+        col, op = flt[0], flt[1]
+        value = flt[2] if len(flt) > 2 else None
+        series = df[col]
+        if op == "==":
+            term = series == value
+        elif op == "!=":
+            term = series != value
+        elif op == "<":
+            term = series < value
+        elif op == "<=":
+            term = series <= value
+        elif op == ">":
+            term = series > value
+        elif op == ">=":
+            term = series >= value
+        elif op == "in":
+            term = series.isin(list(value))
+        elif op == "not in":
+            term = ~series.isin(list(value))
+        elif op == "is null":
+            term = series.isna()
+        elif op == "not null":
+            term = series.notna()
+        else:
+            raise ValueError(f"Unsupported filter operator: {op}")
+        mask &= term.fillna(False).astype(bool)
+    return mask
+
+
+def _read_parquet(files, columns, filters, categorical, compact=None):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(files, format="parquet")
+    expression = _arrow_expression(filters) if filters else None
+    if compact is None:
+        table = dataset.to_table(columns=columns, filter=expression)
+    else:
+        # Compact UUID keys batch by batch, so the text keys of the whole
+        # table are never held at once
+        batches = [schema.encode_arrow_uuids(batch, compact)
+                   for batch in dataset.to_batches(columns=columns, filter=expression)]
+        if batches and all(batch.schema == batches[0].schema for batch in batches):
+            table = pa.Table.from_batches(batches)
+        else:
+            table = dataset.to_table(columns=columns, filter=expression)
+
+    return arrow_to_pandas(table, categorical)
+
+
+# Arrow table to pandas, with dictionary columns as categories or plain labels
+def arrow_to_pandas(table, categorical=True):
+    import pyarrow as pa
+
+    if not categorical:
+        # Plain labels for code that edits values (e.g. filling in missing labels)
+        fields = [pa.field(f.name, f.type.value_type) if pa.types.is_dictionary(f.type) else f
+                  for f in table.schema]
+        table = table.cast(pa.schema(fields))
+    # Binary UUIDs (see schema.py) stay Arrow-backed instead of becoming bytes objects
+    return table.to_pandas(date_as_object=False, types_mapper={pa.binary(16): pd.ArrowDtype(pa.binary(16))}.get)
+
+
+# Columns to return and pd.read_csv options for reading them
+def _csv_options(path, columns, filters, categorical):
+    header = pd.read_csv(path, nrows=0).columns
+    wanted = list(header if columns is None else columns)
+    # Filter columns are needed while filtering even when they are not returned
+    usecols = wanted + [f[0] for f in filters or [] if f[0] not in wanted]
+
+    dtypes = {}
+    if categorical:
+        dtypes = {col: "category" for col in usecols if col in CATEGORICAL_COLUMNS}
+    dates = [col for col in usecols if col in DATE_COLUMNS]
+    return wanted, {"usecols": usecols, "dtype": dtypes, "parse_dates": dates}
+
+
+def _read_csv(files, columns, filters, categorical):
+    wanted, options = _csv_options(files[0], columns, filters, categorical)
+    frames = [pd.read_csv(f, **options) for f in files]
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    if filters:
+        df = df[_pandas_mask(df, filters)].reset_index(drop=True)
+    return df[wanted]
+
+
+# Read specific files of one format (a table or some of its partitions).
+# compact names the table whose compact in-memory types (schema.py) to apply.
+def read_files(files, columns=None, filters=None, categorical=True, compact=None):
+    formats = {os.path.splitext(f)[1].lstrip(".") for f in files}
+    if len(formats) != 1:
+        raise ValueError(f"Expected files of a single format, got {sorted(formats)}")
+    columns = list(columns) if columns is not None else None
+
+    if formats == {"parquet"}:
+        df = _read_parquet(files, columns, filters, categorical, compact)
+    else:
+        df = _read_csv(files, columns, filters, categorical)
+    return df if compact is None else schema.compact(df, compact, categorical)
+
+
+# Read a table. columns selects a subset of columns (projection) and filters
+# keeps only matching rows; with Parquet both are pushed down to the reader so
+# skipped columns and row groups are never decoded. compact applies the
+# table's compact in-memory types (schema.py).
+@instrumentation.traced(category="io")
+def read_table(name, stage="raw", columns=None, filters=None, fmt=None, categorical=True, compact=False):
+    fmt = fmt or find_format(name, stage)
+    files = table_files(name, stage, fmt)
+    if not files:
+        raise FileNotFoundError(f"No {stage} table named {name!r} stored as {fmt}")
+    return read_files(files, columns, filters, categorical, name if compact else None)
+
+
+# Read a table as a stream of DataFrames of at most batch_size rows, so tables
+# larger than memory can be processed chunk by chunk. Takes the same columns
+# and filters (and compact option) as read_table.
+def iter_table(name, stage="raw", columns=None, filters=None, batch_size=1_000_000, fmt=None,
+               categorical=True, compact=False):
+    fmt = fmt or find_format(name, stage)
+    files = table_files(name, stage, fmt)
+    if not files:
+        raise FileNotFoundError(f"No {stage} table named {name!r} stored as {fmt}")
+    columns = list(columns) if columns is not None else None
+
+    if fmt == "parquet":
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+
+        dataset = ds.dataset(files, format="parquet")
+        expression = _arrow_expression(filters) if filters else None
+        for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size):
+            if batch.num_rows:
+                if compact:
+                    batch = schema.encode_arrow_uuids(batch, name)
+                df = arrow_to_pandas(pa.Table.from_batches([batch]), categorical)
+                yield schema.compact(df, name, categorical) if compact else df
+        return
+
+    for path in files:
+        wanted, options = _csv_options(path, columns, filters, categorical)
+        for df in pd.read_csv(path, chunksize=batch_size, **options):
+            if filters:
+                df = df[_pandas_mask(df, filters)]
+            if len(df):
+                df = df[wanted].reset_index(drop=True)
+                yield schema.compact(df, name, categorical) if compact else df
+
+
+# Every file of a table in the format read_table() would read; each one is a
+# partition that incremental jobs can process on its own. Copies in another
+# format are left out, so they are not processed twice.
+def list_partitions(name, stage="raw"):
+    if not table_exists(name, stage):
+        return []
+    return table_files(name, stage, find_format(name, stage))
+
+
+# Append one partition to a table without touching the existing files
+@instrumentation.traced(category="io")
+def write_part(df, name, stage, part, fmt=None):
+    fmt = fmt or DEFAULT_FORMAT
+    directory = os.path.join(stage_dir(stage), name)
+    os.makedirs(directory, exist_ok=True)
+
+    path = os.path.join(directory, f"part-{part}.{fmt}")
+    df = schema.restore(df)
+    if fmt == "parquet":
+        apply_storage_types(df).to_parquet(path, index=False, engine="pyarrow", row_group_size=ROW_GROUP_SIZE)
+    else:
+        df.to_csv(path, index=False)
+    print(f"Data saved to {path}")
+    return path
+
+
+# Delete the stored files of a table (in one format, or in all of them)
+def remove_table(name, stage="raw", fmt=None):
+    for path in [f for each in ([fmt] if fmt else FORMATS) for f in table_files(name, stage, each)]:
+        os.remove(path)
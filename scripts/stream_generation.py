@@ -0,0 +1,145 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import generator
+import storage
+
+# Rows per chunk; each chunk is one CSV part or one Parquet row group
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Tables that can be streamed, with their generator and baseline size
+STREAM_TABLES = {
+    "transactions": (generator.generate_transactions, generator.NUM_TRANSACTIONS),
+    "loans": (generator.generate_loans, generator.NUM_LOANS),
+    "campaign_responses": (generator.generate_campaign_responses, generator.NUM_CAMPAIGNS),
+    "support_interactions": (generator.generate_support_interactions, generator.NUM_SUPPORT),
+}
+
+# Customer IDs shared with every worker process (set by the pool initializer)
+_customer_ids = None
+
+
+def _init_worker(customer_ids):
+    global _customer_ids
+    _customer_ids = customer_ids
+
+
+# Split num_rows into (chunk_index, rows) pairs of at most chunk_size rows
+def plan_chunks(num_rows, chunk_size):
+    return [(index, min(chunk_size, num_rows - start))
+            for index, start in enumerate(range(0, num_rows, chunk_size))]
+
+
+# Build one chunk from its own seeded substream, so the output does not
+# depend on how many workers there are or which worker ran the chunk
+def generate_chunk(table, chunk_index, num_rows, seed, as_of):
+    generate, _ = STREAM_TABLES[table]
+    rng = generator.table_rng(seed, table, chunk_index)
+    return generate(num_rows, _customer_ids, as_of=as_of, rng=rng)
+
+
+# Worker task for CSV output: the worker writes its own part file
+def _write_csv_part(chunk_index, num_rows, table, seed, as_of, directory):
+    df = generate_chunk(table, chunk_index, num_rows, seed, as_of)
+    df.to_csv(os.path.join(directory, f"part-{chunk_index:05d}.csv"), index=False)
+    return num_rows
+
+
+# Worker task for Parquet output: the parent appends the row group in order
+def _arrow_chunk(chunk_index, num_rows, table, seed, as_of):
+    import pyarrow as pa
+
+    df = generate_chunk(table, chunk_index, num_rows, seed, as_of)
+    return pa.Table.from_pandas(storage.apply_storage_types(df), preserve_index=False)
+
+
+# Run tasks on the pool keeping at most max_pending chunks in flight, and
+# hand the results back in chunk order
+def _run_bounded(pool, task, chunks, args, max_pending, on_result):
+    pending = deque()
+    for chunk_index, num_rows in chunks:
+        pending.append(pool.submit(task, chunk_index, num_rows, *args))
+        if len(pending) >= max_pending:
+            on_result(pending.popleft().result())
+    while pending:
+        on_result(pending.popleft().result())
+
+
+# Generate one table chunk by chunk across a process pool, writing each chunk
+# as soon as it is ready. CSV chunks go to data/<table>/part-NNNNN.csv and
+# Parquet chunks become row groups of data/<table>.parquet. Whatever was stored
+# for the table before, in either format, is removed first so no stale copy
+# is read alongside (or instead of) the new one.
+def stream_table(table, num_rows, customer_ids, seed=generator.DEFAULT_SEED, as_of=None,
+                 chunk_size=DEFAULT_CHUNK_SIZE, workers=None, file_format="csv"):
+    if table not in STREAM_TABLES:
+        raise ValueError(f"Unknown table for streaming: {table}")
+    if file_format not in ("csv", "parquet"):
+        raise ValueError(f"Unsupported format: {file_format}")
+
+    workers = workers or os.cpu_count() or 1
+    data_dir = storage.stage_dir("raw")
+    as_of = str(generator.resolve_as_of(as_of))
+    chunks = plan_chunks(num_rows, chunk_size)
+    max_pending = workers * 2
+    start = time.perf_counter()
+
+    storage.remove_table(table)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(customer_ids,)) as pool:
+        if file_format == "csv":
+            directory = os.path.join(data_dir, table)
+            os.makedirs(directory, exist_ok=True)
+            _run_bounded(pool, _write_csv_part, chunks, (table, seed, as_of, directory),
+                         max_pending, lambda rows: None)
+            output = directory
+        else:
+            import pyarrow.parquet as pq
+
+            output = os.path.join(data_dir, f"{table}.parquet")
+            writer = None
+
+            def write_row_group(arrow_table):
+                nonlocal writer
+                if writer is None:
+                    writer = pq.ParquetWriter(output, arrow_table.schema)
+                writer.write_table(arrow_table, row_group_size=chunk_size)
+
+            os.makedirs(data_dir, exist_ok=True)
+            try:
+                _run_bounded(pool, _arrow_chunk, chunks, (table, seed, as_of),
+                             max_pending, write_row_group)
+            finally:
+                if writer is not None:
+                    writer.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Data saved to {output} ({num_rows:,} rows in {len(chunks)} chunks, "
+          f"{num_rows / max(elapsed, 1e-9):,.0f} rows/s)")
+    return output
+
+
+# Command line options for streaming mode
+def add_streaming_args(parser):
+    parser.add_argument("--stream", action="store_true",
+                        help="Generate the transactional tables in chunks across a process pool")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk in streaming mode")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--format", choices=storage.FORMATS, default=storage.DEFAULT_FORMAT,
+                        help="Streaming output: CSV part files or Parquet row groups")
+    parser.add_argument("--transactions", type=int, default=None,
+                        help="Override the number of transactions (e.g. 100000000)")
+    return parser
+
+
+# Stream every transactional table for the parsed command line options
+def stream_all(args, customer_ids):
+    for table, (_, base_rows) in STREAM_TABLES.items():
+        num_rows = generator.scaled(base_rows, args.scale)
+        if table == "transactions" and args.transactions:
+            num_rows = args.transactions
+        print(f"Streaming {table.replace('_', ' ')} data...")
+        stream_table(table, num_rows, customer_ids, seed=args.seed, as_of=args.as_of,
+                     chunk_size=args.chunk_size, workers=args.workers, file_format=args.format)
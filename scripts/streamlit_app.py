@@ -1,83 +1,161 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import shap
-import matplotlib.pyplot as plt
-from xgboost import XGBClassifier
-from sklearn.model_selection import train_test_split
 import streamlit.components.v1 as components
 
+import customer_index
+import explanations
+import instrumentation
+import model_bundle
+
 # Page config
 st.set_page_config(page_title="Loan Default Risk Predictor", layout="wide")
 
 st.title("💼 BankIQ: Loan Default Risk Predictor")
 st.markdown("This app uses an XGBoost model to predict high-risk loans and explain the decisions using SHAP.")
 
-# Load data
-@st.cache_data
-def load_data():
-    df = pd.read_csv("/Users/devanshudixit/Desktop/projects/BankIQ/data/processed/enhanced_customers.csv")
-    df = df.dropna(subset=["HighRiskLoan"])
-    return df
-
-df = load_data()
+# Load the trained model bundle (written by scripts/03_train_model.py) once
+# per server process instead of training at startup
+@st.cache_resource
+def load_model():
+    return model_bundle.load_bundle()
 
-# Feature list
-features = [
-    "LoanBurdenScore", "AvgLoanAmount", "AvgEMItoIncomeRatio",
-    "CreditScore", "Income", "Age"
-]
-target = "HighRiskLoan"
+try:
+    bundle = load_model()
+except FileNotFoundError as error:
+    st.error(str(error))
+    st.stop()
 
-X = df[features]
-y = df[target]
+features = bundle.features
 
-# Train model
+# Indexed access to the processed customers (CustomerID and filter indexes,
+# built by scripts/customer_index.py or on first use). The index is
+# memory-mapped and shared by every session; sessions only fetch the rows
+# they show, so their memory stays flat however many customers there are.
 @st.cache_resource
-def train_model(X, y):
-    scale_pos_weight = (y == 0).sum() / (y == 1).sum()
-    model = XGBClassifier(scale_pos_weight=scale_pos_weight, use_label_encoder=False, eval_metric="logloss")
-    model.fit(X, y)
-    explainer = shap.Explainer(model, X)
-    shap_values = explainer(X)
-    return model, explainer, shap_values
-
-model, explainer, shap_values = train_model(X, y)
+def load_index():
+    return customer_index.open_index()
+
+try:
+    index = load_index()
+    if not index.is_current():
+        load_index.clear()
+        index = load_index()
+except FileNotFoundError as error:
+    st.error(str(error))
+    st.stop()
+
+# Precomputed SHAP values of the bundle (built by scripts/03_train_model.py or
+# scripts/explanations.py), looked up by CustomerID; None if not built
+@st.cache_resource
+def load_shap_matrix(version):
+    matrix = explanations.load_shap_matrix(bundle)
+    if matrix is None or matrix[1] is None:
+        return None
+    shap_index = pd.Index(matrix[0])
+    return (shap_index, matrix[1], matrix[2]) if shap_index.is_unique else None
+
+shap_matrix = load_shap_matrix(bundle.version)
+
+# SHAP values of one customer: the stored row while it was computed on the
+# same feature values, else computed (the features were rebuilt since)
+@instrumentation.traced(category="app")
+def shap_values_of(customer_id, X_row):
+    if shap_matrix is not None:
+        shap_index, hashes, values = shap_matrix
+        row = shap_index.get_indexer([customer_id])[0]
+        if row >= 0 and hashes[row] == explanations.feature_hashes(X_row, features)[0]:
+            return np.asarray(values[row])
+    return bundle.contributions(X_row)[0]
+
+# Global explanation of the bundle: mean |SHAP| over every customer and a
+# stratified sample for the beeswarm, built once per model version
+@st.cache_resource
+def global_summary(version):
+    summary = explanations.load_global_summary(bundle)
+    if summary is None:
+        explanations.build_global_summary(bundle)
+        summary = explanations.load_global_summary(bundle)
+    return summary
+
+# Rendered force plots, shared by every session of this server process
+@st.cache_resource
+def force_plot_cache(version):
+    return explanations.HtmlCache()
 
-# User selection
+# User selection: filter, page through the matching customers, pick one
 st.sidebar.header("🔍 Select a customer to explain")
-index = st.sidebar.slider("Customer Index", 0, len(X) - 1, 0)
+filters = {col: st.sidebar.multiselect(col, index.labels(col)) for col in customer_index.FILTER_COLUMNS}
+page_size = st.sidebar.selectbox("Customers per page", [25, 50, 100], index=1)
+num_matching = len(index.matching_rows(filters))
+if num_matching == 0:
+    st.warning("No customers match the selected filters.")
+    st.stop()
+num_pages = (num_matching - 1) // page_size + 1
+page = st.sidebar.number_input(f"Page (of {num_pages:,})", min_value=1, max_value=num_pages, value=1) - 1
+
+page_df, _ = index.page(filters, page, page_size,
+                        columns=["CustomerID"] + customer_index.FILTER_COLUMNS + features)
+st.sidebar.caption(f"{num_matching:,} matching customers")
+customer_id = st.sidebar.selectbox("Customer", page_df["CustomerID"])
+lookup = st.sidebar.text_input("Or look up a CustomerID").strip()
+if lookup:
+    if index.row_of(lookup) is None:
+        st.sidebar.error(f"Unknown CustomerID {lookup}")
+    else:
+        customer_id = lookup
+
+st.subheader("📋 Customers")
+st.dataframe(page_df, hide_index=True)
 
 # Show customer input features
+X_row = index.customer(customer_id, columns=features)
 st.subheader("📌 Selected Customer Details")
-st.dataframe(X.iloc[[index]])
+st.dataframe(X_row)
 
 # Show prediction
-pred_prob = model.predict_proba(X.iloc[[index]])[0, 1]
+pred_prob = bundle.predict_proba(X_row)[0]
 st.metric("Risk Score (Probability of Default)", f"{pred_prob:.2%}")
 
 st.subheader("🧠 SHAP Force Plot (Local Explanation)")
-shap.initjs()
-# Create the force plot
-force_plot = shap.force_plot(
-    base_value=explainer.expected_value,
-    shap_values=explainer(X.iloc[[index]])[0].values,
-    features=X.iloc[[index]],
-    matplotlib=False
-)
-
-# Save as HTML and load the content
-shap_html_path = "/tmp/shap_force_plot.html"
-shap.save_html(shap_html_path, force_plot)
-
-with open(shap_html_path, "r") as f:
-    html_content = f.read()
+# Render the force plot in memory, once per customer, feature values and
+# model version
+with instrumentation.span("app.force_plot", category="app"):
+    html_content = force_plot_cache(bundle.version).get(
+        (bundle.version, customer_id, int(explanations.feature_hashes(X_row, features)[0])),
+        lambda: explanations.force_plot_html(bundle.expected_value, shap_values_of(customer_id, X_row), X_row),
+    )
 
 # Display in Streamlit
 components.html(html_content, height=300)
 
-# SHAP summary plot (optional)
+# SHAP summary plot (optional). shap and matplotlib take seconds to import,
+# so they are only loaded once the plot is asked for.
 if st.checkbox("Show SHAP Summary Plot (Global Explanation)"):
+    import matplotlib.pyplot as plt
+    import shap
+
+    with instrumentation.span("app.global_summary", category="app"):
+        summary = global_summary(bundle.version)
+
+    st.subheader("📊 Feature Importance (mean |SHAP| over all customers)")
+    importances = pd.Series(summary["importances"], index=features).sort_values()
+    fig_importance, ax = plt.subplots(figsize=(10, 4))
+    importances.plot.barh(ax=ax)
+    st.pyplot(fig_importance)
+
     st.subheader("📊 SHAP Summary Plot")
+    sample_target = summary["sample_target"]
+    st.caption(
+        f"Stratified sample of {len(sample_target):,} of {int(summary['rows']):,} customers; "
+        f"high-risk loans are {sample_target.mean():.0%} of the sample "
+        f"vs {int(summary['positives']) / max(int(summary['rows']), 1):.0%} overall."
+    )
     fig_summary, ax = plt.subplots(figsize=(10, 6))
-    shap.plots.beeswarm(shap_values, max_display=6, show=False)
+    shap.plots.beeswarm(shap.Explanation(
+        values=summary["sample_values"],
+        base_values=bundle.expected_value,
+        data=summary["sample_data"],
+        feature_names=features,
+    ), max_display=6, show=False)
     st.pyplot(fig_summary)
\ No newline at end of file
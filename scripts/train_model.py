@@ -0,0 +1,76 @@
+import drift_monitor
+import explanations
+import model_bundle
+import storage
+
+# Model inputs and label.
+# Label leak: the generator derives EMI from the interest rate (annuity
+# formula), so AvgEMItoIncomeRatio carries the InterestRate that defines
+# HighRiskLoan (> 10%). On synthetic data this lifts AUC from about 0.875 to
+# 0.913; judge the model on data where EMI is not derived from the rate.
+FEATURES = [
+    "LoanBurdenScore", "AvgLoanAmount", "AvgEMItoIncomeRatio",
+    "CreditScore", "Income", "Age"
+]
+TARGET = "HighRiskLoan"
+
+
+# Model columns of the enhanced customers with a known target
+def load_training_data():
+    df = storage.read_table(
+        "enhanced_customers", "processed",
+        columns=FEATURES + [TARGET],
+        filters=[(TARGET, "not null")],
+        compact=True,
+    )
+    print(f"Loaded {len(df):,} training rows")
+    return df[FEATURES], df[TARGET]
+
+
+def train_model(X, y):
+    from xgboost import XGBClassifier
+
+    scale_pos_weight = (y == 0).sum() / (y == 1).sum()
+    model = XGBClassifier(scale_pos_weight=scale_pos_weight, eval_metric="logloss")
+    model.fit(X, y)
+    return model.get_booster(), scale_pos_weight
+
+
+# Base log-odds of the exact tree SHAP values: the bias column of pred_contribs,
+# which is the same for every row
+def expected_value(booster, X):
+    import xgboost as xgb
+
+    contribs = booster.predict(xgb.DMatrix(X.iloc[:1]), pred_contribs=True)
+    return float(contribs[0, -1])
+
+
+# Save a trained booster as the latest model bundle, with its explanations
+def publish(booster, scale_pos_weight, X, y, **extra):
+    version = model_bundle.save_bundle(
+        booster, FEATURES, TARGET, scale_pos_weight, expected_value(booster, X),
+        training_rows=len(X), positive_rate=float(y.mean()), **extra,
+    )
+    # Training-time feature and raw-table distributions, the reference of
+    # drift_monitor.py
+    drift_monitor.save_feature_baseline(version, X)
+    drift_monitor.save_raw_baseline(version)
+    print("Precomputing SHAP values...")
+    bundle = model_bundle.load_bundle(version)
+    explanations.build_shap_matrix(bundle)
+    explanations.build_global_summary(bundle)
+    # Serving switches over only now that every artifact exists
+    model_bundle.promote(version)
+    return version
+
+
+def main():
+    print("Starting model training...")
+    X, y = load_training_data()
+    booster, scale_pos_weight = train_model(X, y)
+    version = publish(booster, scale_pos_weight, X, y)
+    print(f"Model training completed successfully! (version {version})")
+
+
+if __name__ == "__main__":
+    main()
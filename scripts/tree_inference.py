@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import model_bundle
+
+# Flattened tree ensemble for low-latency scoring. The boosted trees of a
+# bundle are exported once from XGBoost's JSON dump into a few flat arrays
+# (split feature, threshold, children, default direction, leaf value; one
+# entry per node of every tree) and evaluated without going through the
+# booster, which costs a fixed overhead of tens of microseconds per call.
+#
+# Evaluation follows XGBoost exactly: inputs and thresholds are float32, a
+# row goes left when x < threshold, missing values (NaN) take the node's
+# default direction, and the probability is the sigmoid of the summed leaf
+# values plus base_score as a logit. The arrays are saved next to the model
+# (flat_trees.npz) on first use, so later processes load them without
+# importing xgboost. Two kernels:
+#   numba   compiled loop over rows and trees (used when numba is installed)
+#   numpy   every row walks all trees level by level with array gathers
+# Check parity and latency against the booster with
+#   python scripts/tree_inference.py
+
+ENGINES = ["auto", "numba", "numpy"]
+FOREST_FILE = "flat_trees.npz"
+FOREST_ARRAYS = ["roots", "children", "feature", "threshold", "default_left", "value"]
+# Rows evaluated at once by the NumPy kernel (bounds the node matrix)
+NUMPY_BLOCK_ROWS = 16_384
+# Probabilities must match the booster within this absolute difference
+TOLERANCE = 1e-5
+LOGISTIC_OBJECTIVES = ["binary:logistic", "reg:logistic"]
+
+
+# ---------------------
+# Export
+# ---------------------
+
+class FlatForest:
+    def __init__(self, roots, children, feature, threshold, default_left, value, base_margin, depth):
+        self.roots = roots
+        # (nodes, 2): left and right child of each node
+        self.children = children
+        self.feature = feature
+        self.threshold = threshold
+        self.default_left = default_left
+        self.value = value
+        self.base_margin = base_margin
+        self.depth = depth
+
+    @classmethod
+    def from_booster(cls, booster):
+        learner = json.loads(bytes(booster.save_raw(raw_format="json")))["learner"]
+        objective = learner["objective"]["name"]
+        if objective not in LOGISTIC_OBJECTIVES:
+            raise ValueError(f"Unsupported objective {objective!r}; expected one of {LOGISTIC_OBJECTIVES}")
+        gbtree = learner["gradient_booster"]
+        if gbtree["name"] != "gbtree":
+            raise ValueError(f"Unsupported booster {gbtree['name']!r}")
+        trees = gbtree["model"]["trees"]
+        if any(tree["categories_nodes"] for tree in trees):
+            raise ValueError("Categorical splits are not supported")
+
+        # base_score is stored as a probability, e.g. "[5E-1]"
+        base_score = float(learner["learner_model_param"]["base_score"].strip("[]"))
+        base_margin = float(np.log(base_score / (1 - base_score)))
+
+        offsets = np.cumsum([0] + [len(tree["left_children"]) for tree in trees])
+        left = np.concatenate([np.asarray(tree["left_children"], dtype=np.int32) for tree in trees])
+        right = np.concatenate([np.asarray(tree["right_children"], dtype=np.int32) for tree in trees])
+        is_leaf = left == -1
+        node_offsets = np.repeat(offsets[:-1], np.diff(offsets)).astype(np.int32)
+        # Children as global node numbers; leaves point to themselves, so a
+        # row that reached its leaf stays there in the level-by-level kernel
+        own = np.arange(len(left), dtype=np.int32)
+        children = np.column_stack([np.where(is_leaf, own, left + node_offsets),
+                                    np.where(is_leaf, own, right + node_offsets)])
+        # XGBoost keeps the leaf value in split_conditions
+        conditions = np.concatenate([np.asarray(tree["split_conditions"], dtype=np.float32) for tree in trees])
+        feature = np.concatenate([np.asarray(tree["split_indices"], dtype=np.int32) for tree in trees])
+
+        depth = 0
+        for tree in trees:
+            parents = np.asarray(tree["parents"], dtype=np.int64)
+            levels = np.zeros(len(parents), dtype=np.int64)
+            # Nodes are numbered after their parent
+            for node in range(1, len(parents)):
+                levels[node] = levels[parents[node]] + 1
+            depth = max(depth, int(levels.max()) if len(levels) else 0)
+
+        return cls(
+            roots=offsets[:-1].astype(np.int32),
+            children=np.ascontiguousarray(children, dtype=np.int32),
+            feature=np.where(is_leaf, 0, feature).astype(np.int32),
+            threshold=np.where(is_leaf, np.float32(0), conditions).astype(np.float32),
+            default_left=np.concatenate([np.asarray(tree["default_left"], dtype=bool) for tree in trees]),
+            value=np.where(is_leaf, conditions, np.float32(0)).astype(np.float32),
+            base_margin=base_margin,
+            depth=depth,
+        )
+
+    def save(self, path):
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, base_margin=self.base_margin, depth=self.depth,
+                     **{name: getattr(self, name) for name in FOREST_ARRAYS})
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(base_margin=float(arrays["base_margin"]), depth=int(arrays["depth"]),
+                       **{name: arrays[name] for name in FOREST_ARRAYS})
+
+    def __len__(self):
+        return len(self.roots)
+
+    # Summed leaf values plus the base margin of each row
+    def predict_margin(self, X, engine="auto"):
+        rows = as_float32_rows(X)
+        if engine == "auto":
+            engine = "numba" if numba_kernel() is not None else "numpy"
+        if engine == "numba":
+            kernel = numba_kernel()
+            if kernel is None:
+                raise ImportError("numba is not installed")
+            margin = np.empty(len(rows), dtype=np.float64)
+            kernel(rows, self.roots, self.children.ravel(), self.feature, self.threshold,
+                   self.default_left, self.value, self.depth, margin)
+        else:
+            margin = np.concatenate([self._numpy_margin(rows[start:start + NUMPY_BLOCK_ROWS])
+                                     for start in range(0, len(rows), NUMPY_BLOCK_ROWS)] or [np.empty(0)])
+        return margin + self.base_margin
+
+    # Probability of the positive class, as float32 like the booster
+    def predict_proba(self, X, engine="auto"):
+        return (1 / (1 + np.exp(-self.predict_margin(X, engine)))).astype(np.float32)
+
+    # Level by level over every tree at once: (rows, trees) current nodes
+    def _numpy_margin(self, rows):
+        nodes = np.broadcast_to(self.roots, (len(rows), len(self.roots))).copy()
+        row_index = np.arange(len(rows))[:, None]
+        for _ in range(self.depth):
+            x = rows[row_index, self.feature[nodes]]
+            go_right = (x >= self.threshold[nodes]) | (np.isnan(x) & ~self.default_left[nodes])
+            nodes = self.children[nodes, go_right.view(np.int8)]
+        return self.value[nodes].sum(axis=1, dtype=np.float64)
+
+
+# Flattened trees of a bundle, exported from its booster on first use
+def load_forest(version):
+    path = os.path.join(model_bundle.bundle_dir(version), FOREST_FILE)
+    if os.path.exists(path):
+        return FlatForest.load(path)
+    with open(os.path.join(model_bundle.bundle_dir(version), model_bundle.METADATA_FILE)) as f:
+        features = json.load(f)["features"]
+    forest = FlatForest.from_booster(model_bundle.load_booster(version, features))
+    forest.save(path)
+    return forest
+
+
+# 2-D contiguous float32 array of a DataFrame or array of feature rows
+def as_float32_rows(X):
+    # DataFrames (pandas is not imported here, to keep scoring start-up light)
+    if hasattr(X, "to_numpy"):
+        X = X.to_numpy(dtype=np.float32, na_value=np.nan)
+    rows = np.ascontiguousarray(X, dtype=np.float32)
+    return rows.reshape(1, -1) if rows.ndim == 1 else rows
+
+
+# ---------------------
+# Numba kernel
+# ---------------------
+
+_KERNEL = {}
+
+
+# Compiled scoring loop, or None without numba. Compiled on first use and
+# cached on disk by numba, so only the first process pays the compile time.
+# Blocks of rows descend each tree level by level in lockstep: the rows are
+# independent, so their node lookups overlap instead of waiting on one
+# another, and the child is picked without a branch.
+def numba_kernel():
+    if "numba" not in _KERNEL:
+        try:
+            import numba
+        except ImportError:
+            _KERNEL["numba"] = None
+            return None
+
+        @numba.njit(cache=True, nogil=True)
+        def predict_margin(rows, roots, children, feature, threshold, default_left, value, depth, out):
+            block = 64
+            nodes = np.empty(block, dtype=np.int64)
+            for start in range(0, rows.shape[0], block):
+                size = min(block, rows.shape[0] - start)
+                for i in range(size):
+                    out[start + i] = 0.0
+                for tree in range(roots.shape[0]):
+                    for i in range(size):
+                        nodes[i] = roots[tree]
+                    for _ in range(depth):
+                        for i in range(size):
+                            node = nodes[i]
+                            x = rows[start + i, feature[node]]
+                            go_right = (x >= threshold[node]) | ((x != x) & (not default_left[node]))
+                            nodes[i] = children[2 * node + go_right]
+                    for i in range(size):
+                        out[start + i] += value[nodes[i]]
+
+        _KERNEL["numba"] = predict_margin
+    return _KERNEL["numba"]
+
+
+# ---------------------
+# Parity and latency harness
+# ---------------------
+
+# Feature rows to check: enhanced customers (or random rows without them),
+# with a share of the values blanked out to exercise the missing branches
+def sample_rows(features, count, missing_share=0.05, seed=0):
+    import storage
+
+    rng = np.random.default_rng(seed)
+    try:
+        df = storage.read_table("enhanced_customers", "processed", columns=features)
+        rows = df.sample(count, replace=len(df) < count, random_state=seed).to_numpy(dtype=np.float32)
+    except FileNotFoundError:
+        rows = rng.uniform(0, 1000, size=(count, len(features))).astype(np.float32)
+    rows[rng.random(rows.shape) < missing_share] = np.nan
+    return rows
+
+
+# Median seconds per call of score(batch) over the given batches
+def time_calls(score, batches):
+    score(batches[0])
+    times = []
+    for batch in batches:
+        start = time.perf_counter()
+        score(batch)
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the flattened model against XGBoost and time both")
+    parser.add_argument("--version", default=None, help="Model bundle version (default: latest)")
+    parser.add_argument("--rows", type=int, default=100_000, help="Rows of the parity check and batch benchmark")
+    parser.add_argument("--single-calls", type=int, default=2000, help="Single-row calls timed per engine")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    import pandas as pd
+
+    bundle = model_bundle.load_bundle(args.version, engine="xgboost")
+    start = time.perf_counter()
+    forest = FlatForest.from_booster(bundle.booster)
+    print(f"Exported {len(forest)} trees ({len(forest.value):,} nodes, depth {forest.depth}) "
+          f"in {time.perf_counter() - start:.3f}s")
+
+    rows = sample_rows(bundle.features, args.rows)
+    reference = bundle.booster.inplace_predict(rows)
+    engines = ["numpy"] + (["numba"] if numba_kernel() is not None else [])
+    failed = False
+    for engine in engines:
+        start = time.perf_counter()
+        forest.predict_proba(rows[:1], engine)
+        warmup = time.perf_counter() - start
+        difference = float(np.max(np.abs(forest.predict_proba(rows, engine) - reference)))
+        ok = difference <= args.tolerance
+        failed |= not ok
+        print(f"{engine:<6} max |p - xgboost| = {difference:.2e} over {len(rows):,} rows "
+              f"({'ok' if ok else 'MISMATCH'}; first call {warmup * 1000:.0f} ms)")
+
+    singles = [rows[i:i + 1] for i in range(min(args.single_calls, len(rows)))]
+    frame = pd.DataFrame(rows[:1], columns=bundle.features)
+    scorers = {"xgboost": bundle.booster.inplace_predict}
+    for engine in engines:
+        scorers[f"flat-{engine}"] = lambda batch, engine=engine: forest.predict_proba(batch, engine)
+
+    print(f"\n{'engine':<14} {'1 row (us)':>11} {'batch (ms)':>11} {'rows/s':>12}")
+    for name, score in scorers.items():
+        single = time_calls(score, singles)
+        batch = time_calls(score, [rows] * 5)
+        print(f"{name:<14} {single * 1e6:11.1f} {batch * 1000:11.1f} {len(rows) / batch:12,.0f}")
+    # One-row DataFrame through ModelBundle.predict_proba, as the app scores
+    flat_bundle = model_bundle.ModelBundle(bundle.booster, bundle.metadata, forest)
+    for name, scoring in [("xgboost", bundle), ("flat", flat_bundle)]:
+        print(f"{'app/' + name:<14} {time_calls(scoring.predict_proba, [frame] * len(singles)) * 1e6:11.1f}")
+
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import aggregation
+import instrumentation
+import storage
+
+# Rolling behavioural features as of snapshot dates, for backtesting. For
+# each snapshot and each window (30/90/365 days ending on the snapshot,
+# inclusive), per customer:
+#   Transactions{w}d, Spend{w}d, Deposits{w}d   transaction count and amounts
+#   Category<label>Share{w}d                     share of the transactions per
+#   Channel<label>Share{w}d                      category / channel
+#   SupportContacts{w}d, AvgNPS{w}d              support interactions
+# and the recency as of the snapshot: DaysSinceLastTransaction,
+# DaysSinceLastSupport, LastNPSScore. Only events dated on or before the
+# snapshot count, so a snapshot never sees its future.
+#
+# Each table's events are sorted once by (customer, day) into a single int64
+# key. A window of a customer is then a contiguous slice of the sorted events
+# whose bounds come from one np.searchsorted on the key, and every windowed
+# sum or count (also per category and channel) is a difference of prefix sums
+# over the sorted events. Sorting and prefix sums are paid once however many
+# snapshots are asked for; each snapshot costs one searchsorted per customer
+# and window bound, and a few gathers.
+
+WINDOWS = [30, 90, 365]
+# Outgoing transaction types counted as spend; deposits are summed apart
+SPEND_TYPES = ["Withdrawal", "Payment", "Transfer", "Fee"]
+DEPOSIT_TYPES = ["Deposit"]
+
+TRANSACTION_COLUMNS = ["CustomerID", "Date", "Amount", "TransactionType", "Category", "Channel"]
+SUPPORT_COLUMNS = ["CustomerID", "Date", "NPSScore"]
+
+
+# Days since the epoch of a date column (typed dates or YYYY-MM-DD text)
+def epoch_days(dates):
+    return pd.to_datetime(dates).to_numpy().astype("datetime64[D]").astype(np.int64)
+
+
+# Events of one table sorted by (customer, day); events of unknown customers
+# or without a date are dropped
+class EventIndex:
+    def __init__(self, codes, days, num_customers):
+        keep = (codes >= 0) & (days != np.datetime64("NaT").astype(np.int64))
+        codes, days = codes[keep], days[keep]
+        self.keep = keep
+        self.first_day = int(days.min()) if len(days) else 0
+        # Key stride: one slot per day of the history
+        self.span = int(days.max()) - self.first_day + 1 if len(days) else 1
+        keys = codes * self.span + (days - self.first_day)
+        self.order = np.argsort(keys, kind="stable")
+        self.keys = keys[self.order]
+        self.days = days[self.order]
+        self.customer_keys = np.arange(num_customers, dtype=np.int64) * self.span
+        # Position of each customer's first event
+        self.starts = np.searchsorted(self.keys, self.customer_keys - 1, side="right")
+
+    def __len__(self):
+        return len(self.keys)
+
+    # Values of the kept events in sorted order
+    def sorted(self, values):
+        return np.asarray(values)[self.keep][self.order]
+
+    # Prefix sums in sorted order of each column of values (rows: events):
+    # window sums are differences of two rows. Keeping the measures of an
+    # event in one row makes each window bound a single memory access.
+    def prefix_sums(self, values, dtype=np.float64):
+        values = self.sorted(values)
+        values = values.reshape(len(values), -1)
+        prefix = np.zeros((len(values) + 1, values.shape[1]), dtype=dtype)
+        np.cumsum(values, axis=0, dtype=dtype, out=prefix[1:])
+        return prefix
+
+    # (labels, prefix counts of each label) of a label column
+    def label_prefix_counts(self, labels):
+        codes, uniques = pd.factorize(labels, sort=True)
+        return list(uniques), self.prefix_sums(codes[:, None] == np.arange(len(uniques)), np.int32)
+
+    # Sorted-event position just past each customer's events on or before
+    # each bound day (rows: bounds, columns: customers). Offsets are clamped
+    # so a bound never leaves the customer's own block.
+    def positions(self, bound_days):
+        offsets = np.clip(np.asarray(bound_days, dtype=np.int64) - self.first_day, -1, self.span - 1)
+        return np.searchsorted(self.keys, self.customer_keys[None, :] + offsets[:, None], side="right")
+
+    # Days from each customer's last event on or before the snapshot to the
+    # snapshot, and the position of that event (-1 without one)
+    def recency(self, end, snapshot_day):
+        last = np.where(end > self.starts, end - 1, -1)
+        if not len(self):
+            return np.full(len(last), np.nan, dtype=np.float32), last
+        return np.where(last >= 0, snapshot_day - self.days[last], np.nan).astype(np.float32), last
+
+
+# 1 / count as float32 (0 for empty windows), to turn counts into shares
+def shares_of(count):
+    return np.where(count > 0, 1 / np.maximum(count, 1), 0).astype(np.float32)
+
+
+def safe_ratio(numerator, denominator, empty=0.0):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = numerator / np.where(denominator > 0, denominator, 1)
+    return np.where(denominator > 0, ratio, empty).astype(np.float32)
+
+
+# Transaction features of every customer at one snapshot. amounts holds the
+# prefix sums of spend and deposits, labels (names, prefix counts) per column.
+def transaction_block(events, amounts, labels, snapshot_day, windows):
+    positions = events.positions([snapshot_day] + [snapshot_day - w for w in windows])
+    end = positions[0]
+    amounts_end = np.take(amounts, end, axis=0)
+    labels_end = {column: np.take(counts, end, axis=0) for column, (_, counts) in labels.items()}
+    block = {}
+    for i, w in enumerate(windows):
+        count = end - positions[i + 1]
+        block[f"Transactions{w}d"] = count.astype(np.int32)
+        inverse_count = shares_of(count)
+        spend_deposits = amounts_end - np.take(amounts, positions[i + 1], axis=0)
+        block[f"Spend{w}d"] = spend_deposits[:, 0]
+        block[f"Deposits{w}d"] = spend_deposits[:, 1]
+        for column, (names, counts) in labels.items():
+            shares = (labels_end[column] - np.take(counts, positions[i + 1], axis=0)).astype(np.float32)
+            shares *= inverse_count[:, None]
+            for k, label in enumerate(names):
+                block[f"{column}{str(label).replace(' ', '')}Share{w}d"] = shares[:, k]
+    block["DaysSinceLastTransaction"], _ = events.recency(end, snapshot_day)
+    return block
+
+
+# Support features of every customer at one snapshot. nps holds the prefix
+# sums of the NPS scores and of their count.
+def support_block(events, nps, nps_sorted, snapshot_day, windows):
+    positions = events.positions([snapshot_day] + [snapshot_day - w for w in windows])
+    end = positions[0]
+    nps_end = np.take(nps, end, axis=0)
+    block = {}
+    for i, w in enumerate(windows):
+        block[f"SupportContacts{w}d"] = (end - positions[i + 1]).astype(np.int32)
+        sums = nps_end - np.take(nps, positions[i + 1], axis=0)
+        block[f"AvgNPS{w}d"] = safe_ratio(sums[:, 0], sums[:, 1], np.nan)
+    block["DaysSinceLastSupport"], last = events.recency(end, snapshot_day)
+    nps_last = nps_sorted[last] if len(events) else np.nan
+    block["LastNPSScore"] = np.where(last >= 0, nps_last, np.nan).astype(np.float32)
+    return block
+
+
+# Windowed features of every customer at every snapshot: one row per
+# (SnapshotDate, CustomerID), snapshots in the given order
+@instrumentation.traced()
+def window_features(customers, transactions, support_interactions, snapshots, windows=WINDOWS):
+    windows = sorted(windows)
+    lookup = aggregation.CustomerLookup(customers["CustomerID"])
+    num_customers = len(lookup)
+
+    print("Sorting transaction history...")
+    transaction_events = EventIndex(lookup.codes(transactions["CustomerID"]),
+                                    epoch_days(transactions["Date"]), num_customers)
+    amount = transactions["Amount"].to_numpy(dtype=float)
+    transaction_type = transactions["TransactionType"]
+    amounts = transaction_events.prefix_sums(np.column_stack([
+        np.where(transaction_type.isin(SPEND_TYPES), amount, 0.0),
+        np.where(transaction_type.isin(DEPOSIT_TYPES), amount, 0.0),
+    ]))
+    labels = {column: transaction_events.label_prefix_counts(transactions[column]) for column in ["Category", "Channel"]}
+
+    print("Sorting support history...")
+    support_events = EventIndex(lookup.codes(support_interactions["CustomerID"]),
+                                epoch_days(support_interactions["Date"]), num_customers)
+    nps = support_interactions["NPSScore"].to_numpy(dtype=float)
+    nps_prefix = support_events.prefix_sums(np.column_stack([np.nan_to_num(nps), ~np.isnan(nps)]))
+    nps_sorted = support_events.sorted(nps)
+
+    # Columns are gathered snapshot by snapshot and the frame is built once
+    snapshot_days = [int(np.datetime64(snapshot, "D").astype(np.int64)) for snapshot in pd.to_datetime(snapshots)]
+    columns = {}
+    for day in snapshot_days:
+        print(f"Computing windows as of {np.datetime64(day, 'D')}...")
+        block = transaction_block(transaction_events, amounts, labels, day, windows)
+        block.update(support_block(support_events, nps_prefix, nps_sorted, day, windows))
+        for name, values in block.items():
+            columns.setdefault(name, []).append(values)
+
+    result = pd.DataFrame({
+        "SnapshotDate": np.repeat(np.array(snapshot_days, dtype="datetime64[D]"), num_customers).astype("datetime64[s]"),
+        "CustomerID": customers["CustomerID"].take(np.tile(np.arange(num_customers), len(snapshot_days))).array,
+    })
+    for name, values in columns.items():
+        result[name] = np.concatenate(values)
+    return result
+
+
+def load_history():
+    return {
+        "customers": storage.read_table("cleaned_customers", "cleaned", columns=["CustomerID"], compact=True),
+        "transactions": storage.read_table("cleaned_transactions", "cleaned", columns=TRANSACTION_COLUMNS,
+                                           compact=True),
+        "support_interactions": storage.read_table("cleaned_support_interactions", "cleaned",
+                                                   columns=SUPPORT_COLUMNS, compact=True),
+    }
+
+
+# Stored CustomerIDs of a processed table that do not join with
+# enhanced_customers, which backtests merge the windows onto (none when that
+# table is not built yet)
+def unmatched_customers(name):
+    if not storage.table_exists("enhanced_customers", "processed"):
+        return 0
+    stored = storage.read_table(name, "processed", columns=["CustomerID"])["CustomerID"].drop_duplicates()
+    enhanced = storage.read_table("enhanced_customers", "processed", columns=["CustomerID"])
+    return int((~stored.isin(enhanced["CustomerID"])).sum())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolling 30/90/365-day customer features as of snapshot dates")
+    parser.add_argument("--snapshot", action="append", default=None,
+                        help="Snapshot date, YYYY-MM-DD (repeatable; default: the latest transaction date)")
+    parser.add_argument("--start", default=None, help="First snapshot of a series (with --end and --freq)")
+    parser.add_argument("--end", default=None, help="Last snapshot of a series")
+    parser.add_argument("--freq", default="MS", help="Spacing of the series, a pandas offset alias (default: MS)")
+    parser.add_argument("--windows", type=int, nargs="+", default=WINDOWS, help="Window lengths in days")
+    parser.add_argument("--output", default="customer_window_features", help="Name of the processed output table")
+    args = parser.parse_args()
+
+    history = load_history()
+    snapshots = list(args.snapshot or [])
+    if args.start or args.end:
+        if not (args.start and args.end):
+            parser.error("--start and --end go together")
+        snapshots += list(pd.date_range(args.start, args.end, freq=args.freq))
+    if not snapshots:
+        snapshots = [pd.to_datetime(history["transactions"]["Date"]).max()]
+
+    start = time.perf_counter()
+    result = window_features(**history, snapshots=snapshots, windows=args.windows)
+    print(f"{len(snapshots)} snapshots x {len(history['customers']):,} customers "
+          f"in {time.perf_counter() - start:.2f}s")
+    storage.write_table(result, args.output, "processed")
+    unmatched = unmatched_customers(args.output)
+    if unmatched:
+        print(f"Warning: {unmatched:,} customers of {args.output} are missing from enhanced_customers")
+
+
+if __name__ == "__main__":
+    main()
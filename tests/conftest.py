@@ -0,0 +1,56 @@
+import pytest
+
+import data_cleaning
+import feature_engineering
+import generator
+import model_bundle
+import schema
+import storage
+
+AS_OF = "2025-06-01"
+
+
+# Data folders of every stage under tmp_path, for this test only
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    directory = str(tmp_path / "data")
+    monkeypatch.setenv("BANKIQ_DATA_DIR", directory)
+    monkeypatch.setattr(storage, "DATA_DIR", directory)
+    return directory
+
+
+# The raw tables at scale 1 with a fixed seed and reference date, as written
+# by generator.py
+@pytest.fixture
+def raw_data(data_dir):
+    options = {"seed": generator.DEFAULT_SEED, "as_of": AS_OF}
+    customers = generator.generate_customers(generator.NUM_CUSTOMERS, seed=generator.DEFAULT_SEED)
+    customer_ids = customers["CustomerID"].to_numpy()
+    storage.write_table(customers, "customers")
+    storage.write_table(generator.generate_products(customer_ids, **options), "products")
+    storage.write_table(generator.generate_transactions(generator.NUM_TRANSACTIONS, customer_ids, **options),
+                        "transactions")
+    storage.write_table(generator.generate_loans(generator.NUM_LOANS, customer_ids, **options), "loans")
+    storage.write_table(generator.generate_campaign_responses(generator.NUM_CAMPAIGNS, customer_ids, **options),
+                        "campaign_responses")
+    storage.write_table(generator.generate_support_interactions(generator.NUM_SUPPORT, customer_ids, **options),
+                        "support_interactions")
+    return customer_ids
+
+
+# Cleaned tables and processed/enhanced_customers built from raw_data
+@pytest.fixture
+def enhanced_data(raw_data):
+    data_cleaning.clean_tables(list(data_cleaning.CLEANERS))
+    enhanced = feature_engineering.feature_engineering(**feature_engineering.load_cleaned_data())
+    storage.write_table(schema.compact(enhanced, "enhanced_customers"), "enhanced_customers", "processed")
+    return enhanced
+
+
+# Model bundles under tmp_path, for this test only
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    directory = str(tmp_path / "models")
+    monkeypatch.setenv("BANKIQ_MODEL_DIR", directory)
+    monkeypatch.setattr(model_bundle, "MODEL_DIR", directory)
+    return directory
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import aggregation
+import generator
+import schema
+
+NUM_CUSTOMERS = 200
+
+
+@pytest.fixture
+def customer_ids():
+    return pd.Series(generator.random_uuids(np.random.default_rng(0), NUM_CUSTOMERS), dtype="string[pyarrow]")
+
+
+# Keys with repeats, unknown customers and missing values, and their rows in
+# the customers table (-1 for unknown and missing keys)
+def lookup_keys(customer_ids):
+    rng = np.random.default_rng(1)
+    rows = rng.integers(0, NUM_CUSTOMERS, 1000)
+    keys = customer_ids.iloc[rows].tolist()
+    expected = rows.copy()
+    unknown = generator.random_uuids(np.random.default_rng(2), 10)
+    keys[:10], expected[:10] = list(unknown), -1
+    return keys, expected
+
+
+KEY_TYPES = {
+    "text": lambda keys: pd.Series(keys, dtype="string[pyarrow]"),
+    "object": lambda keys: pd.Series(keys, dtype=object),
+    "binary": lambda keys: schema.encode_uuids(pd.Series(keys, dtype="string[pyarrow]")),
+}
+
+
+@pytest.mark.parametrize("key_type", sorted(KEY_TYPES))
+def test_codes_of_known_unknown_and_repeated_keys(customer_ids, key_type):
+    convert = KEY_TYPES[key_type]
+    lookup = aggregation.CustomerLookup(convert(customer_ids.tolist()))
+    keys, expected = lookup_keys(customer_ids)
+    keys = convert(keys)
+    if key_type != "object":
+        # UUID keys take the packed path
+        assert lookup.packed_codes(keys) is not None
+    np.testing.assert_array_equal(lookup.codes(keys), expected)
+
+
+@pytest.mark.parametrize("key_type", sorted(KEY_TYPES))
+def test_codes_of_missing_keys(customer_ids, key_type):
+    convert = KEY_TYPES[key_type]
+    lookup = aggregation.CustomerLookup(convert(customer_ids.tolist()))
+    keys, expected = lookup_keys(customer_ids)
+    keys[10:20], expected[10:20] = [None] * 5 + [np.nan] * 5, -1
+    np.testing.assert_array_equal(lookup.codes(convert(keys)), expected)
+
+
+def test_duplicate_customers_are_rejected(customer_ids):
+    with pytest.raises(ValueError):
+        aggregation.CustomerLookup(pd.concat([customer_ids, customer_ids.head(1)], ignore_index=True))
+
+
+def test_group_operations_match_groupby():
+    rng = np.random.default_rng(3)
+    codes = rng.integers(-1, 20, 500)
+    values = rng.normal(size=500)
+    values[rng.random(500) < 0.2] = np.nan
+    # Customer 19 has no rows at all
+    codes[codes == 19] = -1
+
+    known = pd.DataFrame({"code": codes, "value": values})[codes >= 0]
+    grouped = known.groupby("code")["value"]
+    customers = np.arange(20)
+    np.testing.assert_array_equal(aggregation.group_sum(codes, 20),
+                                  known.groupby("code").size().reindex(customers, fill_value=0))
+    np.testing.assert_allclose(aggregation.group_sum(codes, 20, np.nan_to_num(values)),
+                               grouped.sum().reindex(customers, fill_value=0))
+    np.testing.assert_array_equal(aggregation.group_count(codes, 20, values),
+                                  grouped.count().reindex(customers, fill_value=0))
+    np.testing.assert_allclose(aggregation.group_mean(codes, 20, values), grouped.mean().reindex(customers))
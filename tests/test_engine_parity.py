@@ -0,0 +1,20 @@
+import pandas as pd
+import pytest
+
+import check_engine_parity
+import data_cleaning
+
+
+@pytest.fixture
+def cleaned_data(raw_data):
+    data_cleaning.clean_tables(list(data_cleaning.CLEANERS))
+
+
+@pytest.mark.parametrize("engine", ["fused", "lazy"])
+def test_engine_matches_pandas(cleaned_data, engine):
+    if engine == "lazy":
+        pytest.importorskip("polars")
+    expected = check_engine_parity.run_engine("pandas")
+    actual = check_engine_parity.run_engine(engine)
+    assert len(actual) > 0
+    pd.testing.assert_frame_equal(actual, expected, check_exact=False, rtol=1e-9)
@@ -0,0 +1,23 @@
+import numpy as np
+
+import explanations
+import model_bundle
+import storage
+import train_model
+
+
+def test_stored_shap_rows_go_stale_with_the_features(enhanced_data, model_dir):
+    X, y = train_model.load_training_data()
+    booster, scale_pos_weight = train_model.train_model(X, y)
+    bundle = model_bundle.load_bundle(train_model.publish(booster, scale_pos_weight, X, y))
+    customer_ids, hashes, values = explanations.load_shap_matrix(bundle)
+
+    stored = storage.read_table("enhanced_customers", "processed", filters=explanations.explained_filters(bundle))
+    assert (stored["CustomerID"].to_numpy() == customer_ids.to_numpy()).all()
+    assert (explanations.feature_hashes(stored, bundle.features) == hashes).all()
+    np.testing.assert_allclose(values[:5], bundle.contributions(stored.head(5)), atol=1e-5)
+
+    # Rebuilt features without retraining: only the edited customer is stale
+    stored.loc[0, "Income"] += 1000
+    stale = explanations.feature_hashes(stored, bundle.features) != hashes
+    assert stale.tolist() == [True] + [False] * (len(stored) - 1)
@@ -0,0 +1,74 @@
+import pandas as pd
+
+import feature_engineering
+import feature_store
+import generator
+import incremental_cleaning
+import schema
+import storage
+
+
+# Enhanced customers as stored by the pandas engine of feature_engineering.py
+def engineered(name):
+    enhanced = feature_engineering.feature_engineering(**feature_engineering.load_cleaned_data())
+    storage.write_table(schema.compact(enhanced, "enhanced_customers"), name, "processed")
+    return storage.read_table(name, "processed")
+
+
+# Enhanced customers as stored by feature_store.py
+def materialized(name, rebuild=False):
+    aggregates, _ = feature_store.refresh(rebuild=rebuild)
+    storage.write_table(schema.compact(feature_store.materialize(aggregates), name), name, "processed")
+    return storage.read_table(name, "processed")
+
+
+def by_customer(df):
+    return df.sort_values("CustomerID", ignore_index=True)
+
+
+def test_refresh_stores_customer_ids_as_uuid_text(raw_data):
+    incremental_cleaning.main()
+    stored = materialized("enhanced_customers")
+    expected = engineered("expected_customers")
+
+    assert pd.api.types.is_string_dtype(stored["CustomerID"])
+    assert stored["CustomerID"].str.len().eq(36).all()
+    pd.testing.assert_series_equal(by_customer(stored)["CustomerID"], by_customer(expected)["CustomerID"])
+    # Reloaded store keeps the compact keys
+    _, aggregates = feature_store.load_store()
+    assert aggregates.index.dtype == schema.uuid_dtype()
+
+
+# A second batch of activity for the same customers, appended as new raw
+# partitions
+def append_activity(customer_ids):
+    options = {"seed": 7, "as_of": "2025-07-01"}
+    storage.write_part(generator.generate_transactions(2000, customer_ids, **options),
+                       "transactions", "raw", "000001")
+    storage.write_part(generator.generate_loans(100, customer_ids, **options), "loans", "raw", "000001")
+    storage.write_part(generator.generate_support_interactions(300, customer_ids, **options),
+                       "support_interactions", "raw", "000001")
+
+
+def test_incremental_refresh_matches_full_feature_engineering(raw_data):
+    incremental_cleaning.main()
+    materialized("enhanced_customers")
+
+    append_activity(raw_data[:50])
+    incremental_cleaning.main()
+    aggregates, changed = feature_store.refresh()
+    assert changed and changed <= set(schema.encode_uuids(pd.Series(raw_data[:50], dtype="str")))
+
+    stored = materialized("enhanced_customers")
+    expected = engineered("expected_customers")
+    pd.testing.assert_frame_equal(by_customer(stored), by_customer(expected), check_exact=False, rtol=1e-9)
+
+    # --changed-only: the same rows, for the changed customers only
+    changes = feature_store.materialize(aggregates, changed)
+    storage.write_table(schema.compact(changes, "enhanced_customers_changes"), "enhanced_customers_changes",
+                        "processed")
+    changes = storage.read_table("enhanced_customers_changes", "processed")
+    assert len(changes) == len(changed)
+    pd.testing.assert_frame_equal(by_customer(changes),
+                                  by_customer(expected[expected["CustomerID"].isin(changes["CustomerID"])]),
+                                  check_exact=False, rtol=1e-9)
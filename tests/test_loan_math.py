@@ -0,0 +1,41 @@
+import datetime
+
+import numpy as np
+
+import loan_math
+
+
+def days(dates):
+    return np.array(dates, dtype="datetime64[D]").astype(np.int64)
+
+
+# Whole months from start to as_of, counted one calendar date at a time
+def reference_months(start, as_of):
+    months = (as_of.year - start.year) * 12 + as_of.month - start.month
+    return months - (as_of.day < start.day)
+
+
+def test_months_between_as_of_before_first_start():
+    starts = days(["2024-03-15", "2024-12-30"])
+    assert loan_math.months_between(starts, "2024-03-01").tolist() == [-1, -10]
+
+
+def test_months_between_matches_reference():
+    rng = np.random.default_rng(0)
+    base = datetime.date(2020, 1, 1)
+    starts = [base + datetime.timedelta(days=int(d)) for d in rng.integers(0, 2000, 200)]
+    for offset in [-400, 0, 31, 900, 2500]:
+        as_of = base + datetime.timedelta(days=offset)
+        expected = [reference_months(start, as_of) for start in starts]
+        assert loan_math.months_between(days([str(s) for s in starts]), str(as_of)).tolist() == expected
+
+
+def test_amortize_before_start_has_no_payments():
+    import pandas as pd
+
+    loans = pd.DataFrame({"Amount": [1200.0], "InterestRate": [0.0], "TermYears": [1],
+                          "StartDate": pd.to_datetime(["2024-03-15"]), "Status": ["Active"]})
+    schedule = loan_math.amortize(loans, np.datetime64("2024-01-01"))
+    assert schedule["PaymentsMade"].tolist() == [0]
+    assert schedule["MonthsRemaining"].tolist() == [12]
+    assert schedule["RemainingBalance"].tolist() == [1200.0]
@@ -0,0 +1,28 @@
+import os
+
+import pytest
+
+import explanations
+import model_bundle
+import train_model
+
+
+def test_publish_promotes_only_complete_bundles(enhanced_data, model_dir, monkeypatch):
+    X, y = train_model.load_training_data()
+    booster, scale_pos_weight = train_model.train_model(X, y)
+
+    def fail(bundle):
+        raise RuntimeError("SHAP failed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(explanations, "build_shap_matrix", fail)
+        with pytest.raises(RuntimeError):
+            train_model.publish(booster, scale_pos_weight, X, y)
+    with pytest.raises(FileNotFoundError):
+        model_bundle.latest_version()
+
+    version = train_model.publish(booster, scale_pos_weight, X, y)
+    assert model_bundle.latest_version() == version
+    directory = model_bundle.bundle_dir(version)
+    for name in [explanations.SHAP_VALUES_FILE, explanations.SHAP_CUSTOMERS_FILE, "drift_baseline.json"]:
+        assert os.path.exists(os.path.join(directory, name))
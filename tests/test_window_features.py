@@ -0,0 +1,20 @@
+import pandas as pd
+
+import storage
+import window_features
+
+from conftest import AS_OF
+
+
+# Backtests merge the windows onto enhanced_customers by CustomerID, so every
+# stored row has to find its customer
+def test_window_features_join_enhanced_customers(enhanced_data):
+    snapshots = [pd.Timestamp(AS_OF) - pd.DateOffset(months=3), pd.Timestamp(AS_OF)]
+    result = window_features.window_features(**window_features.load_history(), snapshots=snapshots)
+    storage.write_table(result, "customer_window_features", "processed")
+
+    assert window_features.unmatched_customers("customer_window_features") == 0
+    stored = storage.read_table("customer_window_features", "processed")
+    enhanced = storage.read_table("enhanced_customers", "processed", columns=["CustomerID"])
+    merged = stored.merge(enhanced, on="CustomerID", how="inner", validate="many_to_one")
+    assert len(merged) == len(stored) == len(snapshots) * len(enhanced)